@@ -0,0 +1,236 @@
+# auto_upload_kml_v3.py
+#
+# Persistent SFTP uploader. One long-lived authenticated paramiko Transport
+# (with keepalives) is shared by every upload instead of a new SSHClient per
+# file. Files are handed over through a bounded queue and uploaded by a
+# worker thread, so the scanner loop never waits on the network; when the
+# link drops the worker reconnects with exponential backoff and retries.
+# Failed uploads back off the same way (reset by the next successful upload),
+# and a file is never queued more than once.
+#
+# As a script it watches KML_FOLDER like v2 did, but over one connection:
+#   SCP_PASSWORD=... python3 auto_upload_kml_v3.py
+
+import os
+import time
+import queue
+import random
+import posixpath
+import threading
+import paramiko
+
+# ===== Settings =====
+SERVER_IP = "134.199.213.125"
+SERVER_PORT = 22
+USERNAME = "sk123"
+PASSWORD = os.environ.get("SCP_PASSWORD", "")
+REMOTE_FOLDER = "/home/sk123/uploads/"
+KML_FOLDER = "detections"
+
+QUEUE_SIZE = 256          # pending uploads before new ones are dropped
+MAX_RETRIES = 5           # attempts per file before giving up
+BACKOFF_START_S = 1.0
+BACKOFF_MAX_S = 60.0
+KEEPALIVE_S = 30
+
+
+class SftpUploader:
+
+    def __init__(self, host=SERVER_IP, username=USERNAME, password=PASSWORD, remote_folder=REMOTE_FOLDER,
+                 port=SERVER_PORT, queue_size=QUEUE_SIZE, max_retries=MAX_RETRIES,
+                 backoff_start_s=BACKOFF_START_S, backoff_max_s=BACKOFF_MAX_S):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.remote_folder = remote_folder
+        self.max_retries = max_retries
+        self.backoff_start_s = backoff_start_s
+        self.backoff_max_s = backoff_max_s
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._pending = set()          # local paths queued but not yet uploaded
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._transport = None
+        self._sftp = None
+        self._backoff = backoff_start_s
+        self._ever_connected = False
+        self._thread = threading.Thread(target=self._run, name="sftp-uploader", daemon=True)
+
+        # Stats
+        self.started_at = time.time()
+        self.uploaded = 0
+        self.failed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.reconnects = 0
+        self.bytes_uploaded = 0
+        self.upload_time_s = 0.0
+        self.max_queue_depth = 0
+
+    # ===== Connection =====
+
+    def _connect(self):
+        transport = paramiko.Transport((self.host, self.port))
+        transport.set_keepalive(KEEPALIVE_S)
+        transport.connect(username=self.username, password=self.password)
+        self._transport = transport
+        self._sftp = paramiko.SFTPClient.from_transport(transport)
+
+    def _connected(self):
+        return self._sftp is not None and self._transport is not None and self._transport.is_active()
+
+    def _disconnect(self):
+        for obj in (self._sftp, self._transport):
+            try:
+                if obj is not None:
+                    obj.close()
+            except Exception:
+                pass
+        self._sftp = None
+        self._transport = None
+
+    def _retry_delay(self):
+        # Jittered exponential backoff, capped; shared by reconnects and
+        # failed uploads, so a server that is down (or refusing writes) isn't hammered
+        delay = self._backoff * (0.5 + random.random())
+        self._backoff = min(self._backoff * 2, self.backoff_max_s)
+        return delay
+
+    def _ensure_connected(self):
+        while not self._connected() and not self._stop.is_set():
+            try:
+                self._connect()
+                if self._ever_connected:
+                    self.reconnects += 1
+                self._ever_connected = True
+                print(f"🔐 SFTP connected to {self.host}")
+            except Exception as e:
+                self._disconnect()
+                delay = self._retry_delay()
+                print(f"❌ SFTP connect failed ({e}), retrying in {delay:.1f}s")
+                self._stop.wait(delay)
+        return self._connected()
+
+    # ===== Queue =====
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, local_path, remote_name=None):
+        # Never blocks. Returns False if the file was dropped (queue full).
+        # A path that is already waiting is not queued twice, so a file that
+        # is rewritten repeatedly is uploaded once with its latest content.
+        with self._lock:
+            if local_path in self._pending:
+                self.coalesced += 1
+                return True
+            try:
+                self.queue.put_nowait((local_path, remote_name, 0))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending.add(local_path)
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return True
+
+    def _upload(self, local_path, remote_name):
+        remote_path = posixpath.join(self.remote_folder, remote_name or os.path.basename(local_path))
+        t0 = time.perf_counter()
+        with self._lock:
+            # Content written after this point gets a fresh queue entry
+            self._pending.discard(local_path)
+        attrs = self._sftp.put(local_path, remote_path)
+        self.upload_time_s += time.perf_counter() - t0
+        self.bytes_uploaded += attrs.st_size or 0
+        self.uploaded += 1
+        self._backoff = self.backoff_start_s
+        print(f"✅ SFTP Upload Successful: {os.path.basename(local_path)}")
+
+    def _run(self):
+        while not self._stop.is_set() or not self.queue.empty():
+            try:
+                local_path, remote_name, attempt = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if not os.path.exists(local_path):
+                    print(f"❌ No file to upload: {local_path}")
+                    with self._lock:
+                        self._pending.discard(local_path)
+                    self.failed += 1
+                    continue
+                if not self._ensure_connected():
+                    break
+                self._upload(local_path, remote_name)
+            except Exception as e:
+                self._disconnect()
+                if attempt + 1 < self.max_retries and not self._stop.is_set():
+                    delay = self._retry_delay()
+                    print(f"❌ SFTP upload failed: {os.path.basename(local_path)}: {e}, retrying in {delay:.1f}s")
+                    with self._lock:
+                        # Resubmitted meanwhile: that entry is the retry
+                        if local_path not in self._pending:
+                            try:
+                                self.queue.put_nowait((local_path, remote_name, attempt + 1))
+                                self._pending.add(local_path)
+                            except queue.Full:
+                                self.dropped += 1
+                    self._stop.wait(delay)
+                else:
+                    print(f"❌ SFTP upload failed: {os.path.basename(local_path)}: {e}")
+                    self.failed += 1
+            finally:
+                self.queue.task_done()
+        self._disconnect()
+
+    def stop(self, drain=True, timeout=10.0):
+        # drain=True gives queued files up to `timeout` seconds to go out
+        if drain:
+            deadline = time.time() + timeout
+            while not self.queue.empty() and time.time() < deadline and self._thread.is_alive():
+                time.sleep(0.1)
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def stats(self):
+        elapsed = max(1e-9, time.time() - self.started_at)
+        return {
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "reconnects": self.reconnects,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "bytes_uploaded": self.bytes_uploaded,
+            "files_per_s": round(self.uploaded / elapsed, 3),
+            "avg_upload_ms": round(1e3 * self.upload_time_s / self.uploaded, 1) if self.uploaded else None,
+            "connected": self._connected(),
+        }
+
+
+if __name__ == "__main__":
+    uploader = SftpUploader().start()
+    seen = {}
+    reported = 0
+    print("\n✨ Auto-uploading KMLs enabled (persistent SFTP)!")
+    try:
+        while True:
+            for entry in os.scandir(KML_FOLDER):
+                if entry.name.endswith(".kml"):
+                    mtime = entry.stat().st_mtime
+                    if seen.get(entry.name) != mtime:
+                        seen[entry.name] = mtime
+                        uploader.submit(entry.path)
+            time.sleep(2)
+            if uploader.uploaded != reported:
+                reported = uploader.uploaded
+                print(f"📊 {uploader.stats()}")
+    except KeyboardInterrupt:
+        print("\n⏹️ Stopped auto-uploader.")
+    finally:
+        uploader.stop()
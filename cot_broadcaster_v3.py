@@ -0,0 +1,273 @@
+# cot_broadcaster_v3.py
+#
+# CoT broadcaster as an object instead of a socket + f-string per event:
+#   - one long-lived UDP socket (connected, so no per-send address lookup)
+#   - the static XML is pre-encoded once as a bytes %-template; only the
+#     numbers are formatted per event, and time/stale strings are cached per
+#     second
+#   - send_event() only enqueues; a background thread flushes the queue in
+#     batches under a per-second rate cap (token bucket), dropping the oldest
+#     events if the queue overflows
+#
+# TrackCotPublisher sits in front of either sink (this UDP broadcaster or
+# cot_sender.CotTcpSender) and keys events by rf_tracker track uid, so every
+# emitter is its own ATAK marker and is only re-sent when it changes or is
+# about to go stale.
+#
+# Module-level send_event() keeps the v1/v2 call signature working.
+
+import math
+import time
+import socket
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+# Settings
+ATAK_BROADCAST_IP = "134.199.213.125"  # WebTAK server IP
+ATAK_BROADCAST_PORT = 4242             # Standard ATAK port
+DEVICE_UID = "rf-sensor-001"           # Unique ID for your device
+STALE_S = 60                           # how long ATAK keeps the marker
+MAX_RATE = 200                         # events per second cap
+QUEUE_SIZE = 2000                      # pending events before the oldest are dropped
+FLUSH_INTERVAL_S = 0.05
+
+# Per-track delta updates (TrackCotPublisher)
+FREQ_TOL_MHZ = 0.05                    # re-send when the centre moves more than this
+POWER_TOL_DB = 3.0                     # ... or the power changes more than this
+POSITION_TOL_M = 25.0                  # ... or the position moves more than this
+REFRESH_MARGIN_S = 10                  # re-send this long before the marker goes stale
+
+COT_TEMPLATE = (
+    b'<event version="2.0" uid="%s" type="b-r-f" how="m-g" time="%s" start="%s" stale="%s">\n'
+    b'  <point lat="%.6f" lon="%.6f" hae="10.0" ce="50.0" le="9999.0"/>\n'
+    b'  <detail>\n'
+    b'    <contact callsign="RF %.2fMHz %.2fdB"/>\n'
+    b'    <remarks>RF detection at %.2f MHz with strength %.2f dB</remarks>\n'
+    b'    <takv device="RF Scanner" version="1.0" platform="Pi"/>\n'
+    b'    <__group role="Team Member" name="RF Detection"/>\n'
+    b'  </detail>\n'
+    b'</event>'
+)
+
+
+class CotEncoder:
+
+    def __init__(self, uid=DEVICE_UID, stale_s=STALE_S, template=COT_TEMPLATE):
+        self.uid = uid
+        self.stale_s = stale_s
+        self.template = template
+        self._uids = {}
+        self._second = None
+        self._time_b = self._stale_b = b""
+
+    def _uid(self, uid):
+        b = self._uids.get(uid)
+        if b is None:
+            b = self._uids[uid] = uid.replace('"', '').encode()
+        return b
+
+    def _times(self, now):
+        second = int(now)
+        if second != self._second:
+            t = datetime.fromtimestamp(second, timezone.utc)
+            self._time_b = t.strftime("%Y-%m-%dT%H:%M:%SZ").encode()
+            self._stale_b = (t + timedelta(seconds=self.stale_s)).strftime("%Y-%m-%dT%H:%M:%SZ").encode()
+            self._second = second
+        return self._time_b, self._stale_b
+
+    def encode(self, lat, lon, freq_mhz, power_dbm, uid=None, now=None):
+        t, stale = self._times(time.time() if now is None else now)
+        freq_mhz, power_dbm = float(freq_mhz), float(power_dbm)
+        return self.template % (self._uid(uid or self.uid), t, t, stale, lat, lon,
+                                freq_mhz, power_dbm, freq_mhz, power_dbm)
+
+
+class CotBroadcaster:
+
+    def __init__(self, host=ATAK_BROADCAST_IP, port=ATAK_BROADCAST_PORT, uid=DEVICE_UID, stale_s=STALE_S,
+                 max_rate=MAX_RATE, queue_size=QUEUE_SIZE, flush_interval_s=FLUSH_INTERVAL_S):
+        self.addr = (host, port)
+        self.encoder = CotEncoder(uid, stale_s)
+        self.max_rate = max_rate
+        self.flush_interval_s = flush_interval_s
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sock.connect(self.addr)
+
+        self._queue = deque()
+        self._queue_size = queue_size
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._tokens = float(max_rate)
+        self._last_refill = time.monotonic()
+        self._thread = None
+
+        # Stats
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._rate_window = deque()     # send times within the last second
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cot-broadcaster", daemon=True)
+            self._thread.start()
+        return self
+
+    def send_event(self, lat, lon, freq_mhz, power_dbm, uid=None):
+        # Encode now (cheap) and enqueue; never blocks the capture thread
+        data = self.encoder.encode(lat, lon, freq_mhz, power_dbm, uid)
+        with self._cond:
+            if len(self._queue) >= self._queue_size:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(data)
+            self.queued += 1
+            self._cond.notify()
+
+    def send_now(self, lat, lon, freq_mhz, power_dbm, uid=None):
+        # Synchronous send, bypassing the queue and rate cap
+        self._send(self.encoder.encode(lat, lon, freq_mhz, power_dbm, uid))
+
+    def _send(self, data):
+        try:
+            self.bytes_sent += self.sock.send(data)
+            self.sent += 1
+            now = time.monotonic()
+            with self._cond:
+                # stats() reads the window from other threads
+                self._rate_window.append(now)
+                while now - self._rate_window[0] > 1.0:
+                    self._rate_window.popleft()
+        except OSError as e:
+            self.errors += 1
+            if self.errors == 1 or self.errors % 100 == 0:
+                print(f"❌ CoT send failed ({self.errors} errors): {e}")
+
+    def _take_batch(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_rate, self._tokens + (now - self._last_refill) * self.max_rate)
+        self._last_refill = now
+        n = min(len(self._queue), int(self._tokens))
+        self._tokens -= n
+        return [self._queue.popleft() for _ in range(n)]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._queue:
+                    if self._stop.is_set():
+                        break
+                    self._cond.wait(self.flush_interval_s)
+                batch = self._take_batch()
+            for data in batch:
+                self._send(data)
+            if self._queue:
+                # Rate-capped: let the bucket refill before the next batch
+                time.sleep(self.flush_interval_s)
+
+    def close(self, drain=True, timeout=2.0):
+        if self._thread is not None:
+            if not drain:
+                with self._cond:
+                    self.dropped += len(self._queue)
+                    self._queue.clear()
+            self._stop.set()
+            with self._cond:
+                self._cond.notify()
+            self._thread.join(timeout)
+        self.sock.close()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            recent = list(self._rate_window)
+        send_rate = sum(now - t <= 1.0 for t in recent)
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending": len(self._queue),
+            "send_rate": send_rate,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+class TrackCotPublisher:
+
+    def __init__(self, sink, lat, lon, freq_tol_mhz=FREQ_TOL_MHZ, power_tol_db=POWER_TOL_DB,
+                 position_tol_m=POSITION_TOL_M, refresh_margin_s=REFRESH_MARGIN_S):
+        self.sink = sink
+        self.lat = lat
+        self.lon = lon
+        self.freq_tol_mhz = freq_tol_mhz
+        self.power_tol_db = power_tol_db
+        self.position_tol_m = position_tol_m
+        self.refresh_after_s = max(0.0, sink.encoder.stale_s - refresh_margin_s)
+        self._last = {}           # uid -> (freq_mhz, power_db, lat, lon, sent_at)
+
+        # Stats
+        self.sent = 0
+        self.refreshes = 0
+        self.suppressed = 0
+
+    def _moved_m(self, lat0, lon0, lat1, lon1):
+        # Equirectangular approximation, plenty for tens of metres
+        dy = math.radians(lat1 - lat0)
+        dx = math.radians(lon1 - lon0) * math.cos(math.radians(0.5 * (lat0 + lat1)))
+        return 6371000.0 * math.hypot(dx, dy)
+
+    def update(self, track, lat=None, lon=None, now=None):
+        # Sends the track if it is new, changed beyond a tolerance, or due for
+        # a refresh. Returns True when an event was sent.
+        now = time.time() if now is None else now
+        lat = getattr(track, "lat", self.lat) if lat is None else lat
+        lon = getattr(track, "lon", self.lon) if lon is None else lon
+        last = self._last.get(track.uid)
+        if last is not None:
+            freq, power, last_lat, last_lon, sent_at = last
+            changed = (abs(track.center_mhz - freq) > self.freq_tol_mhz or
+                       abs(track.peak_db - power) > self.power_tol_db or
+                       self._moved_m(last_lat, last_lon, lat, lon) > self.position_tol_m)
+            if not changed:
+                if now - sent_at < self.refresh_after_s:
+                    self.suppressed += 1
+                    return False
+                self.refreshes += 1
+        self.sink.send_event(lat, lon, track.center_mhz, track.peak_db, track.uid)
+        self._last[track.uid] = (track.center_mhz, track.peak_db, lat, lon, now)
+        self.sent += 1
+        return True
+
+    def publish(self, tracks, now=None):
+        # Call once per frame with the currently active tracks; tracks that
+        # are gone are forgotten and their markers left to go stale
+        now = time.time() if now is None else now
+        sent = [t for t in tracks if self.update(t, now=now)]
+        live = {t.uid for t in tracks}
+        for uid in [uid for uid in self._last if uid not in live]:
+            del self._last[uid]
+        return sent
+
+    def stats(self):
+        return {
+            "tracked": len(self._last),
+            "sent": self.sent,
+            "refreshes": self.refreshes,
+            "suppressed": self.suppressed,
+        }
+
+
+_default = None
+
+
+def send_event(lat, lon, freq_mhz, power_dbm):
+    # Drop-in for cot_broadcaster.send_event(), on a shared broadcaster
+    global _default
+    if _default is None:
+        _default = CotBroadcaster().start()
+    _default.send_event(lat, lon, freq_mhz, power_dbm)
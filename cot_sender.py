@@ -0,0 +1,345 @@
+# cot_sender.py
+#
+# Reliable CoT-over-TCP streaming sink for a TAK server. Unlike the UDP
+# broadcasters it keeps one TCP connection open and writes events back to back
+# as a stream, so nothing is silently lost when the network is congested:
+#
+#   - send_event() never blocks: events go to a bounded in-memory queue; when
+#     that is full (burst, or server unreachable) they spill to an on-disk
+#     spool file and are replayed from it in order once the queue drains
+#   - a worker thread batches queued events into one sendall(); on failure the
+#     batch goes back to the head of the queue and the connection is rebuilt
+#     with jittered exponential backoff
+#   - a spool left over from a previous run is replayed first
+#
+# Same interface as cot_broadcaster_v3.CotBroadcaster (start / send_event /
+# close / stats). As a script it measures throughput and latency against a
+# local stand-in TCP listener:
+#   python3 cot_sender.py 20000
+
+import os
+import sys
+import time
+import errno
+import random
+import select
+import socket
+import struct
+import tempfile
+import threading
+from collections import deque
+
+from cot_broadcaster_v3 import CotEncoder, DEVICE_UID, STALE_S
+
+# ===== Settings =====
+TAK_SERVER_IP = "134.199.213.125"
+TAK_SERVER_PORT = 8087                 # TAK server streaming (plain TCP) input
+MEMORY_EVENTS = 1000                   # in-memory queue before spilling to disk
+SPOOL_PATH = os.path.join("detections", "cot_spool.bin")
+SPOOL_MAX_BYTES = 64 * 1024 * 1024     # newest events are dropped beyond this
+BATCH_EVENTS = 64                      # events per sendall()
+CONNECT_TIMEOUT_S = 5.0
+SEND_TIMEOUT_S = 10.0
+BACKOFF_START_S = 0.5
+BACKOFF_MAX_S = 30.0
+
+_RECORD = struct.Struct("<dI")         # enqueue time, payload length
+
+
+class CotTcpSender:
+
+    def __init__(self, host=TAK_SERVER_IP, port=TAK_SERVER_PORT, uid=DEVICE_UID, stale_s=STALE_S,
+                 memory_events=MEMORY_EVENTS, spool_path=SPOOL_PATH, spool_max_bytes=SPOOL_MAX_BYTES,
+                 batch_events=BATCH_EVENTS, backoff_start_s=BACKOFF_START_S, backoff_max_s=BACKOFF_MAX_S):
+        self.addr = (host, port)
+        self.encoder = CotEncoder(uid, stale_s)
+        self.memory_events = memory_events
+        self.spool_path = spool_path
+        self.spool_max_bytes = spool_max_bytes
+        self.batch_events = batch_events
+        self.backoff_start_s = backoff_start_s
+        self.backoff_max_s = backoff_max_s
+
+        self._mem = deque()                # (enqueue_time, bytes), oldest first
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._sock = None
+        self._backoff = backoff_start_s
+        self._ever_connected = False
+        self._thread = None
+        self._worker_done = False
+        self._close_requested = False
+
+        # Spool: records are appended at the end and read from _spool_read;
+        # while it holds unread records every new event goes there too, so
+        # order is kept. Reset to empty once fully replayed.
+        folder = os.path.dirname(spool_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._spool = open(spool_path, "a+b")
+        self._spool_read = 0
+        self._spool_size = self._spool.seek(0, os.SEEK_END)
+
+        # Stats
+        self.started_at = time.time()
+        self.queued = 0
+        self.sent = 0
+        self.spilled = 0
+        self.replayed = self._count_spooled()
+        self.dropped = 0
+        self.reconnects = 0
+        self.send_errors = 0
+        self.bytes_sent = 0
+        self.latency_sum_s = 0.0
+        self.latency_max_s = 0.0
+
+    def _count_spooled(self):
+        count, offset = 0, 0
+        self._spool.seek(0)
+        while offset + _RECORD.size <= self._spool_size:
+            _, length = _RECORD.unpack(self._spool.read(_RECORD.size))
+            offset += _RECORD.size + length
+            self._spool.seek(offset)
+            count += 1
+        return count
+
+    # ===== Queue =====
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cot-tcp-sender", daemon=True)
+            self._thread.start()
+        return self
+
+    def send_event(self, lat, lon, freq_mhz, power_dbm, uid=None):
+        self.send_raw(self.encoder.encode(lat, lon, freq_mhz, power_dbm, uid))
+
+    def send_raw(self, data):
+        now = time.time()
+        with self._cond:
+            self.queued += 1
+            if self._spool_size > self._spool_read or len(self._mem) >= self.memory_events:
+                self._spill(now, data)
+            else:
+                self._mem.append((now, data))
+            self._cond.notify()
+
+    def _spill(self, now, data):
+        if self._spool_size + _RECORD.size + len(data) > self.spool_max_bytes:
+            self.dropped += 1
+            return
+        self._spool.seek(0, os.SEEK_END)
+        self._spool.write(_RECORD.pack(now, len(data)))
+        self._spool.write(data)
+        self._spool_size += _RECORD.size + len(data)
+        self.spilled += 1
+
+    def _refill(self):
+        # Move spooled records back into memory (called with the lock held,
+        # only when memory is empty, so the spool holds the oldest events)
+        self._spool.flush()
+        self._spool.seek(self._spool_read)
+        while len(self._mem) < self.memory_events and self._spool_read < self._spool_size:
+            ts, length = _RECORD.unpack(self._spool.read(_RECORD.size))
+            self._mem.append((ts, self._spool.read(length)))
+            self._spool_read += _RECORD.size + length
+        if self._spool_read >= self._spool_size:
+            self._spool.truncate(0)
+            self._spool_read = self._spool_size = 0
+
+    def _take_batch(self):
+        with self._cond:
+            if not self._mem and self._spool_size > self._spool_read:
+                self._refill()
+            if not self._mem and not self._stop.is_set():
+                self._cond.wait(0.5)
+            return [self._mem.popleft() for _ in range(min(self.batch_events, len(self._mem)))]
+
+    def _requeue(self, batch):
+        with self._cond:
+            self._mem.extendleft(reversed(batch))
+
+    # ===== Connection =====
+
+    def _connect(self):
+        sock = socket.create_connection(self.addr, timeout=CONNECT_TIMEOUT_S)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.settimeout(SEND_TIMEOUT_S)
+        self._sock = sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+    def _peer_closed(self):
+        # The server never sends anything we need; a readable socket that
+        # returns b"" (or an error) means it went away
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            while readable:
+                if not self._sock.recv(4096, socket.MSG_DONTWAIT):
+                    return True
+                readable, _, _ = select.select([self._sock], [], [], 0)
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        return False
+
+    def _ensure_connected(self):
+        if self._sock is not None and self._peer_closed():
+            self._disconnect()
+        while self._sock is None and not self._stop.is_set():
+            try:
+                self._connect()
+                if self._ever_connected:
+                    self.reconnects += 1
+                self._ever_connected = True
+                self._backoff = self.backoff_start_s
+                print(f"🔗 CoT TCP connected to {self.addr[0]}:{self.addr[1]}")
+            except OSError as e:
+                self._disconnect()
+                delay = self._backoff * (0.5 + random.random())
+                print(f"❌ CoT TCP connect failed ({e}), retrying in {delay:.1f}s")
+                self._stop.wait(delay)
+                self._backoff = min(self._backoff * 2, self.backoff_max_s)
+        return self._sock is not None
+
+    # ===== Worker =====
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self._stop.is_set():
+                    break
+                continue
+            if not self._ensure_connected():
+                self._requeue(batch)
+                break
+            try:
+                self._sock.sendall(b"".join(data for _, data in batch))
+            except OSError as e:
+                self.send_errors += 1
+                if e.errno not in (errno.EPIPE, errno.ECONNRESET):
+                    print(f"❌ CoT TCP send failed: {e}")
+                self._disconnect()
+                self._requeue(batch)
+                continue
+            now = time.time()
+            self.sent += len(batch)
+            self.bytes_sent += sum(len(data) for _, data in batch)
+            for ts, _ in batch:
+                self.latency_sum_s += now - ts
+            self.latency_max_s = max(self.latency_max_s, now - batch[0][0])
+        self._disconnect()
+        with self._cond:
+            self._worker_done = True
+            if self._close_requested:
+                # close() gave up waiting for us; the spool is ours to close
+                self._close_spool()
+
+    def close(self, drain=True, timeout=5.0):
+        # drain=True gives pending events up to `timeout` seconds to go out;
+        # whatever is left in memory is spooled to disk for the next run
+        if self._thread is not None and drain:
+            deadline = time.time() + timeout
+            while self.pending() and time.time() < deadline and self._thread.is_alive():
+                time.sleep(0.05)
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._cond:
+            # A worker still stuck in sendall() may touch the spool yet; it
+            # closes it itself on the way out
+            self._close_requested = True
+            if self._thread is None or self._worker_done:
+                self._close_spool()
+
+    def _close_spool(self):
+        # Spool what is left in memory and close the file (lock held)
+        if self._spool.closed:
+            return
+        leftover = list(self._mem)
+        self._mem.clear()
+        if leftover:
+            # Keep them ahead of anything already spooled
+            self._spool.seek(self._spool_read)
+            rest = self._spool.read()
+            self._spool.truncate(0)
+            self._spool_read = self._spool_size = 0
+            for ts, data in leftover:
+                self._spill(ts, data)
+            self._spool.write(rest)
+            self._spool_size += len(rest)
+        self._spool.close()
+
+    def pending(self):
+        return len(self._mem) + (self._spool_size > self._spool_read)
+
+    def stats(self):
+        elapsed = max(1e-9, time.time() - self.started_at)
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "spilled": self.spilled,
+            "replayed_from_previous_run": self.replayed,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "send_errors": self.send_errors,
+            "pending_memory": len(self._mem),
+            "pending_spool_bytes": self._spool_size - self._spool_read,
+            "bytes_sent": self.bytes_sent,
+            "events_per_s": round(self.sent / elapsed, 1),
+            "avg_latency_ms": round(1e3 * self.latency_sum_s / self.sent, 2) if self.sent else None,
+            "max_latency_ms": round(1e3 * self.latency_max_s, 2),
+            "connected": self._sock is not None,
+        }
+
+
+def _stand_in_server():
+    # Local TCP listener that counts received events
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    received = {"events": 0}
+
+    def serve():
+        conn, _ = server.accept()
+        tail = b""
+        while True:
+            chunk = conn.recv(1 << 16)
+            if not chunk:
+                break
+            data = tail + chunk
+            received["events"] += data.count(b"</event>")
+            tail = data[-7:]          # a "</event>" split across recv()s
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1], received
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    port, received = _stand_in_server()
+    with tempfile.TemporaryDirectory() as tmp:
+        sender = CotTcpSender("127.0.0.1", port, spool_path=os.path.join(tmp, "spool.bin")).start()
+        t0 = time.perf_counter()
+        for i in range(count):
+            sender.send_event(38.9, -77.0, 900 + (i % 1000) * 0.1, -40.0, f"rf-track-{i % 50:05d}")
+        enqueue_s = time.perf_counter() - t0
+        while sender.sent < count and time.perf_counter() - t0 < 60:
+            time.sleep(0.01)
+        total_s = time.perf_counter() - t0
+        time.sleep(0.2)
+        sender.close()
+    print(f"📊 {count} events: enqueue {1e6 * enqueue_s / count:.1f} us/event, "
+          f"{count / total_s:.0f} events/s end to end, server got {received['events']}")
+    print(f"📊 {sender.stats()}")
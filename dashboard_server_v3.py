@@ -0,0 +1,355 @@
+import os
+import json
+import base64
+from datetime import datetime, timezone
+from flask import Flask, Response, send_from_directory, render_template_string, request, jsonify
+from detection_index import DetectionIndex, record_from_row
+from detection_store import DetectionStore, CSV_HEADER, csv_time, cursor
+from waterfall_stream import WaterfallRelay
+
+app = Flask(__name__)
+
+DETECTIONS_FOLDER = "detections"
+PAGE_SIZE = 10
+KEEPALIVE_S = 15         # SSE comment line so proxies keep the stream open
+
+# Detections live in SQLite; an old CSV log is imported once
+store = DetectionStore(os.path.join(DETECTIONS_FOLDER, "detections.db"))
+legacy_csv = os.path.join(DETECTIONS_FOLDER, "detections_log.csv")
+if store.count() == 0 and os.path.exists(legacy_csv):
+    print(f"📥 Imported {store.import_csv(legacy_csv)} detections from {legacy_csv}")
+
+# Kept current by inotify (or polling), so requests never touch the folder
+index = DetectionIndex(DETECTIONS_FOLDER, store=store).start()
+
+# Live waterfall rows from the scanner (waterfall_stream.WaterfallPublisher)
+waterfall = WaterfallRelay().start()
+
+HTML_TEMPLATE = """
+<!doctype html>
+<title>🛰️ RF Detection Dashboard</title>
+<h1>📡 Latest RF Snapshots <small id="status"></small></h1>
+<p><a href="/waterfall">🌊 Live waterfall</a></p>
+<h2>📋 <a href="/detections/detections_log.csv" download>Download Detections Log (CSV)</a></h2>
+<table id="detections" border="1" cellpadding="4" style="border-collapse:collapse; margin-bottom:20px;">
+  <tr><th>Timestamp</th><th>Frequency (MHz)</th><th>Power (dB)</th></tr>
+{% for d in detections %}
+  <tr><td>{{ d.timestamp }}</td><td>{{ "%.3f"|format(d.freq_mhz) }}</td><td>{{ "%.2f"|format(d.power_db) }}</td></tr>
+{% endfor %}
+</table>
+<div id="snapshots">
+{% for file in images %}
+  <div style="margin-bottom:20px;">
+    <img src="/detections/{{ file.name }}" width="600" loading="lazy"><br>
+    {{ file.name }}
+  </div>
+{% endfor %}
+</div>
+{% if next_cursor %}<p><a href="/?before={{ next_cursor }}">Older snapshots →</a></p>{% endif %}
+{% if live %}
+<script>
+  // New detections are pushed over Server-Sent Events and appended in place
+  const MAX_ITEMS = {{ page_size }};
+  const status = document.getElementById("status");
+  const events = new EventSource("/api/stream");
+  events.onopen = () => { status.textContent = "🟢 live"; };
+  events.onerror = () => { status.textContent = "🔴 reconnecting"; };
+  events.addEventListener("snapshot", (e) => {
+    const file = JSON.parse(e.data);
+    const div = document.createElement("div");
+    div.style.marginBottom = "20px";
+    const img = document.createElement("img");
+    img.src = "/detections/" + encodeURIComponent(file.name);
+    img.width = 600;
+    div.append(img, document.createElement("br"), file.name);
+    const list = document.getElementById("snapshots");
+    list.prepend(div);
+    while (list.children.length > MAX_ITEMS) list.lastElementChild.remove();
+  });
+  events.addEventListener("detection", (e) => {
+    const d = JSON.parse(e.data);
+    const table = document.getElementById("detections");
+    const row = table.insertRow(1);
+    for (const text of [d.timestamp, d.freq_mhz.toFixed(3), d.power_db.toFixed(2)]) {
+      row.insertCell().textContent = text;
+    }
+    while (table.rows.length > MAX_ITEMS + 1) table.deleteRow(-1);
+  });
+</script>
+{% endif %}
+"""
+
+WATERFALL_TEMPLATE = """
+<!doctype html>
+<title>🌊 Live RF Waterfall</title>
+<h1>🌊 Live RF Waterfall <small id="status"></small></h1>
+<div id="axis" style="font-family:monospace;"></div>
+<canvas id="waterfall" width="1024" height="{{ height }}" style="width:100%; max-width:1024px; image-rendering:pixelated;"></canvas>
+<p><a href="/">📡 Detections</a></p>
+<script>
+  // Rows arrive as base64 frames (see waterfall_stream.py for the layout)
+  const HEADER = 36, FLAG_DELTA = 1, FLAG_ZLIB = 2;
+  const canvas = document.getElementById("waterfall");
+  const ctx = canvas.getContext("2d");
+  const status = document.getElementById("status");
+
+  // 256-entry viridis lookup table (RGBA)
+  const STOPS = [[68, 1, 84], [59, 82, 139], [33, 145, 140], [94, 201, 98], [253, 231, 37]];
+  const LUT = new Uint8Array(256 * 4);
+  for (let i = 0; i < 256; i++) {
+    const x = i / 255 * (STOPS.length - 1), k = Math.min(Math.floor(x), STOPS.length - 2), f = x - k;
+    for (let c = 0; c < 3; c++) LUT[4 * i + c] = STOPS[k][c] + f * (STOPS[k + 1][c] - STOPS[k][c]);
+    LUT[4 * i + 3] = 255;
+  }
+
+  let prev = null, prevSeq = -1, image = null, chain = Promise.resolve();
+
+  async function inflate(bytes) {
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("deflate"));
+    return new Uint8Array(await new Response(stream).arrayBuffer());
+  }
+
+  async function paint(b64) {
+    const bytes = Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+    const view = new DataView(bytes.buffer);
+    const flags = bytes[5], bins = view.getUint16(6, true), seq = view.getUint32(8, true);
+    let row = bytes.subarray(HEADER);
+    if (flags & FLAG_ZLIB) row = await inflate(row);
+    if (flags & FLAG_DELTA) {
+      if (!prev || seq !== prevSeq + 1) return;   // wait for the next keyframe
+      const out = new Uint8Array(bins);
+      for (let i = 0; i < bins; i++) out[i] = (prev[i] + row[i]) & 255;
+      row = out;
+    }
+    prev = row; prevSeq = seq;
+    if (canvas.width !== bins) { canvas.width = bins; image = null; }
+    if (!image) {
+      image = ctx.createImageData(bins, 1);
+      const start = view.getFloat32(28, true), stop = view.getFloat32(32, true);
+      document.getElementById("axis").textContent =
+        `${start.toFixed(3)} MHz … ${stop.toFixed(3)} MHz  (${view.getFloat32(20, true)} … ${view.getFloat32(24, true)} dB)`;
+    }
+    for (let i = 0; i < bins; i++) image.data.set(LUT.subarray(4 * row[i], 4 * row[i] + 4), 4 * i);
+    ctx.drawImage(canvas, 0, 1);     // scroll down one row
+    ctx.putImageData(image, 0, 0);   // newest row on top
+  }
+
+  const events = new EventSource("/api/waterfall");
+  events.onopen = () => { status.textContent = "🟢 live"; };
+  events.onerror = () => { status.textContent = "🔴 reconnecting"; prev = null; };
+  events.onmessage = (e) => { chain = chain.then(() => paint(e.data)).catch(console.error); };
+</script>
+"""
+
+
+def _cursor(item):
+    return f"{item['mtime']!r}:{item['name']}" if item else None
+
+
+def _parse_cursor(text):
+    # "mtime:name" -> (mtime, name)
+    if not text:
+        return None
+    mtime, _, name = text.partition(":")
+    try:
+        return float(mtime), name
+    except ValueError:
+        raise ApiError(f"bad cursor: {text!r}")
+
+
+def _detection_cursor(row):
+    # "ts:id" keyset cursor for filtered detection pages
+    return "%r:%d" % cursor(row)
+
+
+def _parse_detection_cursor(text):
+    if not text:
+        return None
+    ts, _, row_id = text.partition(":")
+    try:
+        return float(ts), int(row_id)
+    except ValueError:
+        raise ApiError(f"bad cursor: {text!r}")
+
+
+def _limit():
+    return max(1, min(request.args.get("limit", PAGE_SIZE, type=int), 500))
+
+
+class ApiError(ValueError):
+    pass
+
+
+@app.errorhandler(ApiError)
+def api_error(e):
+    return jsonify(error=str(e)), 400
+
+
+def _time(text):
+    # Epoch seconds or ISO 8601 ("2025-04-27T08:08:22Z"; naive means UTC)
+    try:
+        return float(text)
+    except ValueError:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+FILTERS = {"start": _time, "end": _time, "freq_min": float, "freq_max": float,
+           "power_min": float, "power_max": float, "uid": str}
+
+
+def _filters():
+    # Query-string filters for the detection store (see detection_store.build_where)
+    filters = {}
+    for name, parse in FILTERS.items():
+        value = request.args.get(name)
+        if value:
+            try:
+                filters[name] = parse(value)
+            except ValueError:
+                raise ApiError(f"bad value for {name}: {value!r}")
+    return filters
+
+
+def _export(rows_to_text, mimetype, filename, header="", **filters):
+    # Streams the store in (ts, id)-ordered chunks, one response write per chunk
+    def chunks():
+        if header:
+            yield header
+        for rows in store.iter_chunks(**filters):
+            yield rows_to_text(rows)
+
+    return Response(chunks(), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+def _csv_rows(rows):
+    return "".join(f"{csv_time(r['ts'])},{r['freq_mhz']:.3f},{r['power_db']:.2f}\n" for r in rows)
+
+
+def _ndjson_rows(rows):
+    return "".join(json.dumps(r) + "\n" for r in rows)
+
+
+@app.route("/")
+def home():
+    before = _parse_cursor(request.args.get("before"))
+    images = index.latest_files(".png", PAGE_SIZE, before)
+    next_cursor = _cursor(images[-1]) if len(images) == PAGE_SIZE else None
+    return render_template_string(HTML_TEMPLATE, images=images, next_cursor=next_cursor,
+                                  detections=index.latest_detections(PAGE_SIZE), live=before is None,
+                                  page_size=PAGE_SIZE)
+
+
+@app.route("/api/snapshots")
+def api_snapshots():
+    limit = _limit()
+    items = index.latest_files(request.args.get("ext", ".png"), limit, _parse_cursor(request.args.get("before")))
+    return jsonify(items=items, next=_cursor(items[-1]) if len(items) == limit else None)
+
+
+@app.route("/api/detections")
+def api_detections():
+    # Newest first. Filters: start, end (epoch or ISO), freq_min, freq_max
+    # (MHz), power_min, power_max (dB), uid. Page with before=<next>.
+    limit = _limit()
+    filters = _filters()
+    if not filters:
+        items = index.latest_detections(limit, request.args.get("before", type=int))
+        return jsonify(items=items, next=items[-1]["seq"] if len(items) == limit else None)
+    # Filtered: (ts, id) order, so the ts / freq indexes serve the page directly
+    rows = store.query(limit, before=_parse_detection_cursor(request.args.get("before")), **filters)
+    items = [record_from_row(row) for row in rows]
+    return jsonify(items=items, next=_detection_cursor(rows[-1]) if len(rows) == limit else None)
+
+
+@app.route("/api/detections/aggregate")
+def api_aggregate():
+    # ?by=time&bucket=60 (seconds) | by=freq&bucket=0.1 (MHz) | by=uid, plus filters
+    by = request.args.get("by", "time")
+    try:
+        buckets = store.aggregate(by, request.args.get("bucket", 60.0, type=float), **_filters())
+    except ValueError as e:
+        raise ApiError(str(e))
+    return jsonify(by=by, buckets=buckets)
+
+
+@app.route("/api/detections/export.<fmt>")
+def api_export(fmt):
+    # Oldest first, whole matching history, streamed
+    filters = _filters()
+    if fmt == "csv":
+        return _export(_csv_rows, "text/csv", "detections.csv", ",".join(CSV_HEADER) + "\n", **filters)
+    if fmt == "ndjson":
+        return _export(_ndjson_rows, "application/x-ndjson", "detections.ndjson", **filters)
+    raise ApiError("format must be csv or ndjson")
+
+
+@app.route("/api/stream")
+def api_stream():
+    # Server-Sent Events: one frame per new snapshot / detection. Browsers
+    # reconnect on their own and send Last-Event-ID, so nothing is missed.
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    sub = index.subscribe(last_id)
+
+    def stream():
+        try:
+            yield "retry: 2000\n\n"
+            while not sub.lagged:
+                event = sub.get(timeout=KEEPALIVE_S)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                event_id, kind, data = event
+                yield f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n"
+        finally:
+            index.unsubscribe(sub)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/waterfall")
+def waterfall_page():
+    return render_template_string(WATERFALL_TEMPLATE, height=300)
+
+
+@app.route("/api/waterfall")
+def api_waterfall():
+    # SSE stream of waterfall frames, relayed as-is (base64)
+    sub = waterfall.subscribe()
+
+    def stream():
+        try:
+            yield "retry: 2000\n\n"
+            while not sub.lagged:
+                frame = sub.get(timeout=KEEPALIVE_S)
+                if frame is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {base64.b64encode(frame).decode()}\n\n"
+        finally:
+            waterfall.unsubscribe(sub)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/stats")
+def api_stats():
+    return jsonify(index=index.stats(), waterfall=waterfall.stats())
+
+
+@app.route("/detections/detections_log.csv")
+def detections_csv():
+    # Same layout as the old CSV log, streamed from the store
+    return _export(_csv_rows, "text/csv", "detections_log.csv", ",".join(CSV_HEADER) + "\n")
+
+
+@app.route("/detections/<path:filename>")
+def detections(filename):
+    return send_from_directory(DETECTIONS_FOLDER, filename)
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
@@ -0,0 +1,411 @@
+# detection_index.py
+#
+# In-memory index of the detections folder for the dashboard, so a page load
+# no longer lists the folder and stats every PNG. The index is built once with
+# os.scandir and then kept current by filesystem notifications:
+#
+#   inotify (Linux, via ctypes, no extra packages)  - IN_CLOSE_WRITE /
+#       IN_MOVED_TO / IN_DELETE / IN_MOVED_FROM on the folder
+#   polling fallback                                - scandir every POLL_S
+#
+# Files are kept per extension in lists sorted by (mtime, name), so "latest N"
+# is a slice off the end (O(N)) and pagination with a (mtime, name) cursor is
+# one bisect. detections_log.csv is tailed incrementally (only the bytes
+# appended since the last change are parsed) into a time-ordered list of
+# detection records paged by sequence number. When the scanners log to the
+# SQLite store (detection_store.py) instead, new rows are polled from it by id
+# and only the latest STORE_CACHE are held in memory; older pages come from
+# the store's indexes.
+#
+# New snapshots and detection rows are also pushed to subscribers (the
+# dashboard's Server-Sent Events stream). Each change is JSON-encoded once,
+# whatever the number of subscribers, and kept in a short replay buffer so a
+# client reconnecting with its last event id misses nothing.
+
+import os
+import csv
+import json
+import queue
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime, timezone
+
+# ===== Settings =====
+DETECTIONS_FOLDER = "detections"
+CSV_NAME = "detections_log.csv"
+POLL_S = 2.0                  # polling fallback interval
+MAX_DETECTIONS = 200000       # detection records kept in memory (CSV)
+STORE_CACHE = 1000            # latest detection records kept in memory (SQLite)
+STORE_POLL_S = 0.5            # how often the SQLite store is checked for new rows
+PUSH_EXTS = (".png",)         # new files of these types are pushed to subscribers
+REPLAY_EVENTS = 500           # recent events kept for reconnecting subscribers
+SUBSCRIBER_QUEUE = 256        # events a subscriber may lag before it is cut off
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+# No IN_MODIFY: files are only indexed once complete (closed or renamed in)
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM | IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+# CSV timestamps written by the scanners (v10 is UTC, older ones local time)
+TIME_FORMATS = [("%Y-%m-%dT%H-%M-%SZ", timezone.utc), ("%Y-%m-%d_%H-%M-%S", None)]
+
+
+def parse_timestamp(text):
+    for fmt, tz in TIME_FORMATS:
+        try:
+            dt = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return dt.replace(tzinfo=tz).timestamp() if tz else time.mktime(dt.timetuple())
+    return None
+
+
+def record_from_row(row):
+    # detection_store row -> the record shape served by the index (seq, time, timestamp, ...)
+    record = dict(row)
+    record["seq"] = record.pop("id")
+    record["time"] = record.pop("ts")
+    record["timestamp"] = datetime.fromtimestamp(record["time"], timezone.utc).strftime(TIME_FORMATS[0][0])
+    return record
+
+
+class Inotify:
+    # Minimal ctypes wrapper: one watch on one directory
+
+    def __init__(self, path, mask=WATCH_MASK):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+
+    def read(self, timeout=None):
+        # List of (mask, name) events; empty on timeout
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(buf):
+            _, mask, _, length = _EVENT.unpack_from(buf, offset)
+            offset += _EVENT.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Subscription:
+
+    def __init__(self, maxsize=SUBSCRIBER_QUEUE):
+        self.queue = queue.Queue(maxsize)
+        self.lagged = False       # set when events were lost; the client should reconnect
+
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class DetectionIndex:
+
+    def __init__(self, folder=DETECTIONS_FOLDER, csv_name=CSV_NAME, poll_s=POLL_S, use_inotify=True,
+                 max_detections=MAX_DETECTIONS, store=None):
+        self.folder = folder
+        self.csv_name = csv_name
+        self.poll_s = poll_s
+        self.store = store            # detection_store.DetectionStore, replaces the CSV
+        self.max_detections = STORE_CACHE if store is not None else max_detections
+        self._store_id = None         # last store row id seen
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._files = {}              # name -> (mtime, size)
+        self._by_ext = {}             # ".png" -> sorted [(mtime, name)]
+        self._detections = []         # dicts, oldest first
+        self._first_seq = 0           # seq of self._detections[0]
+        self._csv_offset = 0
+        self._csv_header = True
+
+        self._subscribers = []
+        self._recent = deque(maxlen=REPLAY_EVENTS)
+        self._event_id = 0
+        self._publishing = False      # off during the initial scan
+
+        self._inotify = None
+        if use_inotify:
+            try:
+                os.makedirs(folder, exist_ok=True)
+                self._inotify = Inotify(folder)
+            except OSError as e:
+                print(f"⚠️ inotify unavailable ({e}), polling every {poll_s}s")
+        self.backend = "inotify" if self._inotify else "polling"
+
+        # Stats
+        self.fs_events = 0
+        self.rescans = 0
+        self.events_published = 0
+        self.lagged_subscribers = 0
+        self.rescan()
+        self._poll_store()
+        self._publishing = True
+
+    # ===== Files =====
+
+    def _add(self, name, mtime, size):
+        old = self._files.get(name)
+        if old == (mtime, size):
+            return
+        ext = os.path.splitext(name)[1].lower()
+        order = self._by_ext.setdefault(ext, [])
+        if old is not None:
+            del order[bisect_left(order, (old[0], name))]
+        self._files[name] = (mtime, size)
+        if not order or order[-1] < (mtime, name):
+            order.append((mtime, name))   # the usual case: newest file
+        else:
+            insort(order, (mtime, name))
+        if old is None and ext in PUSH_EXTS:
+            self._publish("snapshot", {"name": name, "mtime": mtime, "size": size})
+
+    def _remove(self, name):
+        old = self._files.pop(name, None)
+        if old is not None:
+            order = self._by_ext[os.path.splitext(name)[1].lower()]
+            del order[bisect_left(order, (old[0], name))]
+
+    def _refresh(self, name):
+        try:
+            st = os.stat(os.path.join(self.folder, name))
+        except FileNotFoundError:
+            self._remove(name)
+            return
+        self._add(name, st.st_mtime, st.st_size)
+        if name == self.csv_name and self.store is None:
+            self._tail_csv(st.st_size)
+
+    def rescan(self):
+        # Full scandir pass: initial build, polling, and inotify queue overflow
+        self.rescans += 1
+        self._last_rescan = time.monotonic()
+        seen = {}
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        seen[entry.name] = (st.st_mtime, st.st_size)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            for name in [n for n in self._files if n not in seen]:
+                self._remove(name)
+            for name, (mtime, size) in seen.items():
+                self._add(name, mtime, size)
+            if self.csv_name in seen and self.store is None:
+                self._tail_csv(seen[self.csv_name][1])
+
+    # ===== Detections CSV =====
+
+    def _tail_csv(self, size):
+        if size < self._csv_offset:
+            # Truncated or replaced: start over
+            self._detections.clear()
+            self._first_seq = 0
+            self._csv_offset = 0
+            self._csv_header = True
+        if size == self._csv_offset:
+            return
+        with open(os.path.join(self.folder, self.csv_name), 'rb') as f:
+            f.seek(self._csv_offset)
+            data = f.read(size - self._csv_offset)
+        end = data.rfind(b"\n") + 1       # only complete lines
+        self._csv_offset += end
+        lines = data[:end].decode(errors="replace").splitlines()
+        for row in csv.reader(lines):
+            if self._csv_header:
+                self._csv_header = False
+                if row and row[0] == "Timestamp":
+                    continue
+            if len(row) < 3:
+                continue
+            try:
+                freq, power = float(row[1]), float(row[2])
+            except ValueError:
+                continue
+            self._append({
+                "seq": self._first_seq + len(self._detections),
+                "timestamp": row[0],
+                "time": parse_timestamp(row[0]),
+                "freq_mhz": freq,
+                "power_db": power,
+            })
+        self._trim()
+
+    def _append(self, record):
+        self._detections.append(record)
+        self._publish("detection", record)
+
+    def _trim(self):
+        excess = len(self._detections) - self.max_detections
+        if excess > self.max_detections // 4:
+            del self._detections[:excess]
+            self._first_seq += excess
+
+    # ===== Detections store =====
+
+    def _poll_store(self):
+        if self.store is None:
+            return
+        if self._store_id is None:
+            rows = self.store.query(self.max_detections, order="id")[::-1]
+        else:
+            rows = self.store.since(self._store_id, limit=self.max_detections)
+        if not rows:
+            return
+        with self._lock:
+            if not self._detections:
+                self._first_seq = rows[0]["id"]
+            for row in rows:
+                self._append(record_from_row(row))
+            self._store_id = rows[-1]["id"]
+            self._trim()
+
+    # ===== Push =====
+
+    def _publish(self, kind, data):
+        # Called with the lock held
+        if not self._publishing:
+            return
+        self._event_id += 1
+        event = (self._event_id, kind, json.dumps(data))
+        self._recent.append(event)
+        self.events_published += 1
+        for sub in self._subscribers:
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                sub.lagged = True
+        lagged = [sub for sub in self._subscribers if sub.lagged]
+        for sub in lagged:
+            self._subscribers.remove(sub)
+        self.lagged_subscribers += len(lagged)
+
+    def subscribe(self, last_id=None):
+        # Events are (id, type, json). Events after `last_id` still in the
+        # replay buffer are delivered first.
+        sub = Subscription()
+        with self._lock:
+            if last_id is not None:
+                for event in self._recent:
+                    if event[0] > last_id and not sub.queue.full():
+                        sub.queue.put_nowait(event)
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    # ===== Watching =====
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="detection-index", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        last_store_poll = time.monotonic()
+        while not self._stop.is_set():
+            if self.store is not None and time.monotonic() - last_store_poll >= STORE_POLL_S:
+                last_store_poll = time.monotonic()
+                self._poll_store()
+            timeout = STORE_POLL_S if self.store is not None else 1.0
+            if self._inotify is None:
+                self._stop.wait(min(self.poll_s, timeout))
+                if time.monotonic() - self._last_rescan >= self.poll_s:
+                    self.rescan()
+                continue
+            events = self._inotify.read(timeout=timeout)
+            if not events:
+                continue
+            self.fs_events += len(events)
+            if any(mask & (IN_Q_OVERFLOW | IN_DELETE_SELF) for mask, _ in events):
+                self.rescan()
+                continue
+            with self._lock:
+                for name in dict.fromkeys(name for _, name in events if name):
+                    self._refresh(name)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        if self._inotify is not None:
+            self._inotify.close()
+
+    # ===== Queries =====
+
+    def latest_files(self, ext=".png", limit=10, before=None):
+        # Newest first. `before` is a (mtime, name) cursor from a previous page.
+        with self._lock:
+            order = self._by_ext.get(ext, [])
+            end = len(order) if before is None else bisect_left(order, tuple(before))
+            page = order[max(0, end - limit):end]
+            return [{"name": name, "mtime": mtime, "size": self._files[name][1]} for mtime, name in reversed(page)]
+
+    def latest_detections(self, limit=10, before_seq=None):
+        # Newest first. `before_seq` pages back from a previous page's last seq.
+        if self.store is not None and before_seq is not None and before_seq <= self._first_seq + limit:
+            # Past the in-memory window: straight from the store's index
+            return [record_from_row(row) for row in self.store.query(limit, order="id", before_id=before_seq)]
+        with self._lock:
+            end = len(self._detections)
+            if before_seq is not None:
+                end = max(0, min(end, before_seq - self._first_seq))
+            return self._detections[max(0, end - limit):end][::-1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "files": {ext: len(order) for ext, order in self._by_ext.items()},
+                "detections": len(self._detections),
+                "fs_events": self.fs_events,
+                "rescans": self.rescans,
+                "subscribers": len(self._subscribers),
+                "events_published": self.events_published,
+                "lagged_subscribers": self.lagged_subscribers,
+            }
@@ -0,0 +1,312 @@
+# detection_store.py
+#
+# SQLite detection log replacing the append-only detections_log.csv. The
+# database runs in WAL mode, so the dashboard can read while the scanner
+# writes. add() only enqueues; a writer thread commits the queue in batched
+# transactions (one fsync per batch instead of an open/append/close per row).
+#
+# Indexed on timestamp and on frequency, so time-range and band queries stay
+# in milliseconds at millions of rows. export_csv() writes the old CSV layout
+# for anything that still expects it, and import_csv() migrates an old log.
+# aggregate() groups matching rows into time / frequency buckets (or per
+# track uid) in SQL, and iter_chunks() pages through large results with a
+# (ts, id) keyset cursor so exports never hold the whole history in memory.
+# Results come in (ts, id) order, which idx_detections_ts (ts, then rowid)
+# already provides, so LIMIT stops early instead of sorting every match.
+# From the command line:
+#   python3 detection_store.py import detections/detections_log.csv
+#   python3 detection_store.py export out.csv [start_epoch end_epoch]
+
+import os
+import csv
+import sys
+import time
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# ===== Settings =====
+DB_PATH = os.path.join("detections", "detections.db")
+QUEUE_SIZE = 10000          # pending rows before new ones are dropped
+BATCH_SIZE = 500            # rows per transaction, at most
+FLUSH_INTERVAL_S = 0.5      # max time a row waits in the queue
+SORT_LIMIT = 20000          # band queries: matches sorted in memory, at most
+CSV_HEADER = ["Timestamp", "Frequency_MHz", "Power_dB"]
+CSV_TIME_FORMAT = "%Y-%m-%dT%H-%M-%SZ"
+
+COLUMNS = ["id", "ts", "freq_mhz", "power_db", "bandwidth_khz", "snr_db", "uid", "event"]
+GROUP_BY = ("time", "freq", "uid")
+ORDERS = {"ts": ("ts", "id"), "id": ("id",)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    freq_mhz REAL NOT NULL,
+    power_db REAL NOT NULL,
+    bandwidth_khz REAL,
+    snr_db REAL,
+    uid TEXT,
+    event TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS idx_detections_freq ON detections (freq_mhz, ts);
+"""
+
+_INSERT = ("INSERT INTO detections (ts, freq_mhz, power_db, bandwidth_khz, snr_db, uid, event) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+
+def csv_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(CSV_TIME_FORMAT)
+
+
+def cursor(row):
+    # Keyset cursor for query(after= / before=) from a result row
+    return row["ts"], row["id"]
+
+
+def connect(path, readonly=False):
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def build_where(start=None, end=None, freq_min=None, freq_max=None, power_min=None, power_max=None,
+                uid=None, after_id=None, before_id=None, after=None, before=None):
+    # SQL WHERE clause + parameters for the usual filters. after / before are
+    # (ts, id) keyset cursors; after_id / before_id page in plain id order.
+    clauses, params = [], []
+    for column, op, value in (("ts", ">=", start), ("ts", "<", end),
+                              ("freq_mhz", ">=", freq_min), ("freq_mhz", "<=", freq_max),
+                              ("power_db", ">=", power_min), ("power_db", "<=", power_max),
+                              ("uid", "=", uid), ("id", ">", after_id), ("id", "<", before_id)):
+        if value is not None:
+            clauses.append(f"{column} {op} ?")
+            params.append(value)
+    for op, bound, cursor in ((">", ">=", after), ("<", "<=", before)):
+        if cursor is not None:
+            # The plain ts bound lets SQLite seek idx_detections_ts to the cursor
+            clauses.append(f"ts {bound} ? AND (ts, id) {op} (?, ?)")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class DetectionStore:
+
+    def __init__(self, path=DB_PATH, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval_s=FLUSH_INTERVAL_S):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = connect(path)
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._local = threading.local()   # one read connection per thread
+
+        # Stats
+        self.added = 0
+        self.written = 0
+        self.dropped = 0
+        self.transactions = 0
+        self.write_time_s = 0.0
+
+    # ===== Writing =====
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="detection-store", daemon=True)
+            self._thread.start()
+        return self
+
+    def add(self, ts, freq_mhz, power_db, bandwidth_khz=None, snr_db=None, uid=None, event=None):
+        # Never blocks. Returns False if the row was dropped (queue full).
+        try:
+            self.queue.put_nowait((ts, freq_mhz, power_db, bandwidth_khz, snr_db, uid, event))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.added += 1
+        return True
+
+    def add_track(self, event, track, ts=None):
+        # Feed rf_tracker events straight in
+        return self.add(track.last_seen if ts is None else ts, round(track.center_mhz, 4),
+                        round(track.peak_db, 2), round(track.bandwidth_khz, 1), round(track.snr_db, 2),
+                        track.uid, event)
+
+    def _run(self):
+        conn = connect(self.path)
+        while not self._stop.is_set() or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval_s)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            t0 = time.perf_counter()
+            try:
+                with conn:
+                    conn.executemany(_INSERT, batch)
+                self.written += len(batch)
+                self.transactions += 1
+            except sqlite3.Error as e:
+                self.dropped += len(batch)
+                print(f"❌ Detection store write failed ({len(batch)} rows): {e}")
+            self.write_time_s += time.perf_counter() - t0
+        conn.close()
+
+    def close(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # ===== Reading =====
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path, readonly=True)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def query(self, limit=1000, newest_first=True, order="ts", **filters):
+        # List of dicts. Filters: see build_where(). order="ts" sorts by
+        # (ts, id); page with after= / before=cursor(last row). order="id" is
+        # insertion order for tailing the log (after_id / before_id).
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {tuple(ORDERS)}")
+        where, params = build_where(**filters)
+        direction = " DESC" if newest_first else ""
+        keys = ", ".join(key + direction for key in ORDERS[order])
+        index = self._ts_order_index(filters) if order == "ts" else ""
+        sql = f"SELECT {', '.join(COLUMNS)} FROM detections{index}{where} ORDER BY {keys} LIMIT ?"
+        return [dict(row) for row in self._reader().execute(sql, params + [limit])]
+
+    def _ts_order_index(self, filters):
+        # A band filter makes SQLite pick idx_detections_freq, which can't
+        # give ts order, so every match is sorted before LIMIT applies. Fine
+        # for a narrow band; past SORT_LIMIT matches, walk idx_detections_ts
+        # in order instead (the band is then dense enough to fill LIMIT fast).
+        if filters.get("freq_min") is None and filters.get("freq_max") is None:
+            return ""
+        where, params = build_where(**{key: filters.get(key) for key in ("start", "end", "freq_min", "freq_max")})
+        probe = f"SELECT COUNT(*) FROM (SELECT 1 FROM detections INDEXED BY idx_detections_freq{where} LIMIT ?)"
+        matches = self._reader().execute(probe, params + [SORT_LIMIT]).fetchone()[0]
+        return " INDEXED BY idx_detections_freq" if matches < SORT_LIMIT else " INDEXED BY idx_detections_ts"
+
+    def iter_chunks(self, chunk_size=5000, **filters):
+        # Lists of rows, oldest first, paged by (ts, id) (one indexed seek each)
+        after = filters.pop("after", None)
+        while True:
+            rows = self.query(chunk_size, newest_first=False, after=after, **filters)
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            after = cursor(rows[-1])
+
+    def iter_rows(self, chunk_size=5000, **filters):
+        for rows in self.iter_chunks(chunk_size, **filters):
+            yield from rows
+
+    def aggregate(self, by="time", bucket=60.0, **filters):
+        # Count / power stats per bucket. by="time": bucket in seconds,
+        # by="freq": bucket in MHz, by="uid": per track.
+        if by not in GROUP_BY:
+            raise ValueError(f"by must be one of {GROUP_BY}")
+        if by != "uid" and not bucket > 0:
+            raise ValueError("bucket must be > 0")
+        where, params = build_where(**filters)
+        if by == "uid":
+            key, key_params = "uid", []
+        else:
+            column = "ts" if by == "time" else "freq_mhz"
+            key, key_params = f"CAST({column} / ? AS INTEGER) * ?", [bucket, bucket]
+        sql = (f"SELECT {key} AS bucket, COUNT(*) AS count, AVG(power_db) AS mean_db, "
+               f"MAX(power_db) AS max_db, MIN(freq_mhz) AS min_mhz, MAX(freq_mhz) AS max_mhz, "
+               f"MIN(ts) AS first_ts, MAX(ts) AS last_ts "
+               f"FROM detections{where} GROUP BY bucket ORDER BY bucket")
+        return [dict(row) for row in self._reader().execute(sql, key_params + params)]
+
+    def since(self, after_id, limit=1000):
+        return self.query(limit, newest_first=False, order="id", after_id=after_id)
+
+    def count(self, **filters):
+        where, params = build_where(**filters)
+        return self._reader().execute(f"SELECT COUNT(*) FROM detections{where}", params).fetchone()[0]
+
+    # ===== CSV =====
+
+    def export_csv(self, f, **filters):
+        # Old detections_log.csv layout
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        n = 0
+        for row in self.iter_rows(**filters):
+            writer.writerow([csv_time(row["ts"]), f"{row['freq_mhz']:.3f}", f"{row['power_db']:.2f}"])
+            n += 1
+        return n
+
+    def import_csv(self, csv_path):
+        # Synchronous bulk load of an old CSV log (rows without a parseable
+        # timestamp are skipped)
+        from detection_index import parse_timestamp
+        rows = []
+        with open(csv_path, newline='') as f:
+            for row in csv.reader(f):
+                if len(row) < 3 or row[0] == CSV_HEADER[0]:
+                    continue
+                ts = parse_timestamp(row[0])
+                try:
+                    rows.append((ts, float(row[1]), float(row[2]), None, None, None, None))
+                except (TypeError, ValueError):
+                    continue
+        rows = [r for r in rows if r[0] is not None]
+        conn = connect(self.path)
+        with conn:
+            conn.executemany(_INSERT, rows)
+        conn.close()
+        return len(rows)
+
+    def stats(self):
+        return {
+            "added": self.added,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self.queue.qsize(),
+            "transactions": self.transactions,
+            "avg_rows_per_txn": round(self.written / self.transactions, 1) if self.transactions else None,
+            "avg_txn_ms": round(1e3 * self.write_time_s / self.transactions, 2) if self.transactions else None,
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "export"):
+        print("usage: detection_store.py import <csv> | export <csv> [start_epoch end_epoch]")
+        sys.exit(1)
+    store = DetectionStore()
+    if sys.argv[1] == "import":
+        print(f"✅ Imported {store.import_csv(sys.argv[2])} detections into {store.path}")
+    else:
+        start = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        end = float(sys.argv[4]) if len(sys.argv) > 4 else None
+        with open(sys.argv[2], 'w', newline='') as f:
+            print(f"✅ Exported {store.export_csv(f, start=start, end=end)} detections to {sys.argv[2]}")
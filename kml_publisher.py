@@ -0,0 +1,179 @@
+# kml_publisher.py
+#
+# One rolling KML document instead of a tiny KML file per detection. The
+# publisher keeps an in-memory model of the emitters (one Placemark per
+# track uid), re-renders only the placemarks that changed, and rewrites the
+# document (atomically, at most every MIN_INTERVAL_S) only when something
+# changed. A small NetworkLink file points ATAK / Google Earth at the
+# document's URL so clients poll one URL instead of loading thousands of files.
+#
+# Placemarks carry a TimeSpan (begin = first seen, end once the track has
+# ended) and a style picked from power buckets (bigger, redder = stronger).
+# Ended emitters stay on the map for HISTORY_S and are then dropped.
+
+import os
+import time
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+# ===== Settings =====
+DOC_PATH = os.path.join("detections", "rf_detections.kml")
+LINK_PATH = os.path.join("detections", "rf_detections_link.kml")
+DOC_URL = "http://134.199.213.125/uploads/rf_detections.kml"   # where the uploaded document is served
+REFRESH_S = 5             # client poll interval in the NetworkLink
+MIN_INTERVAL_S = 1.0      # don't rewrite the document more often than this
+HISTORY_S = 600           # keep ended emitters this long
+
+# Power buckets (dBFS lower edges) -> (icon scale, KML colour aabbggrr)
+POWER_STYLES = [
+    (-200, 0.8, "ff00ff00"),
+    (-65, 1.0, "ff00ffaa"),
+    (-50, 1.2, "ff00ffff"),
+    (-35, 1.4, "ff0088ff"),
+    (-20, 1.7, "ff0000ff"),
+]
+
+
+def kml_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def power_style(power_db):
+    bucket = 0
+    for i, (edge, _, _) in enumerate(POWER_STYLES):
+        if power_db >= edge:
+            bucket = i
+    return f"pwr{bucket}"
+
+
+def _style_block():
+    parts = []
+    for i, (_, scale, color) in enumerate(POWER_STYLES):
+        parts.append(f'''    <Style id="pwr{i}">
+      <IconStyle>
+        <color>{color}</color>
+        <scale>{scale}</scale>
+        <Icon><href>http://maps.google.com/mapfiles/kml/shapes/target.png</href></Icon>
+      </IconStyle>
+      <LabelStyle><scale>0.8</scale></LabelStyle>
+    </Style>''')
+    return "\n".join(parts)
+
+
+class KmlPublisher:
+
+    def __init__(self, path=DOC_PATH, lat=37.823, lon=-122.441, name="RF Detections",
+                 min_interval_s=MIN_INTERVAL_S, history_s=HISTORY_S):
+        self.path = path
+        self.lat = lat
+        self.lon = lon
+        self.name = name
+        self.min_interval_s = min_interval_s
+        self.history_s = history_s
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.emitters = {}        # uid -> dict
+        self._fragments = {}      # uid -> rendered <Placemark>
+        self._header = f'''<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+  <Document>
+    <name>{escape(name)}</name>
+{_style_block()}
+'''
+        self._footer = "  </Document>\n</kml>\n"
+        self._dirty = False
+        self.last_write = 0.0
+        self.writes = 0
+        self.renders = 0
+
+    def upsert(self, uid, freq_mhz, power_db, first_seen, last_seen, lat=None, lon=None,
+               bandwidth_khz=None, snr_db=None, ended=False):
+        self.emitters[uid] = {
+            "uid": uid, "freq_mhz": float(freq_mhz), "power_db": float(power_db),
+            "first_seen": first_seen, "last_seen": last_seen,
+            "lat": self.lat if lat is None else lat, "lon": self.lon if lon is None else lon,
+            "bandwidth_khz": bandwidth_khz, "snr_db": snr_db, "ended": ended,
+        }
+        self._fragments[uid] = self._render(self.emitters[uid])
+        self._dirty = True
+
+    def update_track(self, event, track, lat=None, lon=None):
+        # Feed rf_tracker events straight in
+        self.upsert(track.uid, track.center_mhz, track.peak_db, track.first_seen, track.last_seen,
+                    lat, lon, track.bandwidth_khz, track.snr_db, ended=(event == "end"))
+
+    def _render(self, e):
+        self.renders += 1
+        details = [f"Power: {e['power_db']:.2f} dB"]
+        if e["bandwidth_khz"] is not None:
+            details.append(f"Bandwidth: {e['bandwidth_khz']:.0f} kHz")
+        if e["snr_db"] is not None:
+            details.append(f"SNR: {e['snr_db']:.1f} dB")
+        details.append(f"Last seen: {kml_time(e['last_seen'])}")
+        end = f"\n        <end>{kml_time(e['last_seen'])}</end>" if e["ended"] else ""
+        return f'''    <Placemark id="{escape(e['uid'])}">
+      <name>RF {e['freq_mhz']:.3f} MHz</name>
+      <description>{escape(" | ".join(details))}</description>
+      <styleUrl>#{power_style(e['power_db'])}</styleUrl>
+      <TimeSpan>
+        <begin>{kml_time(e['first_seen'])}</begin>{end}
+      </TimeSpan>
+      <Point>
+        <coordinates>{e['lon']},{e['lat']},0</coordinates>
+      </Point>
+    </Placemark>
+'''
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        old = [uid for uid, e in self.emitters.items() if e["ended"] and now - e["last_seen"] > self.history_s]
+        for uid in old:
+            del self.emitters[uid]
+            del self._fragments[uid]
+        if old:
+            self._dirty = True
+        return len(old)
+
+    def render(self):
+        return self._header + "".join(self._fragments.values()) + self._footer
+
+    def publish(self, now=None, force=False):
+        # Rewrites the document if it changed and the rate limit allows.
+        # Returns True when a new file was written (i.e. worth uploading).
+        now = time.time() if now is None else now
+        self.prune(now)
+        if not self._dirty and not force:
+            return False
+        if not force and now - self.last_write < self.min_interval_s:
+            return False
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, self.path)
+        self._dirty = False
+        self.last_write = now
+        self.writes += 1
+        return True
+
+
+def write_network_link(path=LINK_PATH, href=DOC_URL, refresh_s=REFRESH_S, name="RF Detections (live)"):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(f'''<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+  <NetworkLink>
+    <name>{escape(name)}</name>
+    <refreshVisibility>0</refreshVisibility>
+    <Link>
+      <href>{escape(href)}</href>
+      <refreshMode>onInterval</refreshMode>
+      <refreshInterval>{refresh_s}</refreshInterval>
+    </Link>
+  </NetworkLink>
+</kml>
+''')
+    return path
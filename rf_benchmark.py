@@ -0,0 +1,417 @@
+# rf_benchmark.py
+#
+# End-to-end pipeline benchmark. Drives the waterfall/detection pipeline from a
+# recorded (.sigmf-meta, see rf_iq_source.py) or synthetic IQ stream and times
+# every stage: FFT, log-magnitude, decimation, spike detection, waterfall
+# update, and the per-detection outputs (snapshot, KML, CoT, CSV).
+#
+#   python3 rf_benchmark.py                       # synthetic IQ, all pipelines
+#   python3 rf_benchmark.py --iq scan.sigmf-meta --frames 200 -o bench.json
+#   python3 rf_benchmark.py --compare bench.json  # show change vs an earlier run
+#
+# "legacy" reproduces the rf_waterfall_plot_v10.py loop as it was before the
+# capture/DSP rework, "current" uses the modules the scanners use today.
+# Results are JSON (stdout or -o) so runs can be diffed between versions.
+
+import os
+import sys
+import csv
+import copy
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from rf_capture import iq_bytes_to_complex
+from rf_iq_source import ReplaySource
+from rf_spectrum import SpectralEngine
+from rf_waterfall import WaterfallRing
+from rf_cfar import CfarDetector
+from rf_peaks import peaks_from_rows
+from rf_tracker import Tracker
+from kml_publisher import KmlPublisher
+from cot_broadcaster_v3 import CotBroadcaster
+from detection_store import DetectionStore
+from rf_snapshot import render_png
+
+# ===== Settings =====
+BLOCK_SAMPLES = 256 * 1024
+SAMPLE_RATE = 2.4e6
+CENTER_FREQ = 915e6
+WATERFALL_DEPTH = 100
+THRESHOLD_DB = -40   # legacy fixed threshold
+LAT, LON = 37.823, -122.441
+HOP_FRAMES = 3       # synthetic hopping emitter dwell, in frames
+
+FRAME_STAGES = ["fft", "log_magnitude", "decimation", "spike_detection", "waterfall_update"]
+EVENT_STAGES = ["snapshot", "kml_generation", "cot_send", "csv_append"]
+STAGES = FRAME_STAGES + EVENT_STAGES
+
+
+# ===== IQ input =====
+
+def synthetic_iq(num_samples, sample_rate=SAMPLE_RATE, seed=0, tones=((0.1e6, 0.3), (-0.6e6, 0.05))):
+    # Noise plus a few carriers, as raw uint8 IQ like the dongle produces
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_samples) / sample_rate
+    iq = 0.02 * (rng.standard_normal(num_samples) + 1j * rng.standard_normal(num_samples))
+    for freq, amp in tones:
+        iq += amp * np.exp(2j * np.pi * freq * t)
+    raw = np.empty(2 * num_samples, dtype=np.uint8)
+    raw[0::2] = np.clip(iq.real * 127.5 + 127.5, 0, 255)
+    raw[1::2] = np.clip(iq.imag * 127.5 + 127.5, 0, 255)
+    return raw
+
+
+def iq_blocks(path, frames, block_samples):
+    if path:
+        src = ReplaySource(path, realtime=False, loop=True)
+        for _ in range(frames):
+            yield iq_bytes_to_complex(src.read_bytes(2 * block_samples))
+        return
+    # A handful of distinct synthetic blocks, cycled, plus a hopping emitter
+    # that moves every HOP_FRAMES frames so tracks keep starting and ending
+    blocks = [iq_bytes_to_complex(synthetic_iq(block_samples, seed=i)) for i in range(4)]
+    t = np.arange(block_samples) / SAMPLE_RATE
+    for i in range(frames):
+        hop_hz = ((i // HOP_FRAMES) * 0.173e6) % 2.0e6 - 1.0e6
+        yield blocks[i % len(blocks)] + (0.1 * np.exp(2j * np.pi * hop_hz * t)).astype(np.complex64)
+
+
+# ===== Timing =====
+
+class StageTimer:
+
+    def __init__(self, track_allocations=False):
+        self.track_allocations = track_allocations
+        self.durations = defaultdict(list)
+        self.alloc_peak = defaultdict(list)
+
+    @contextmanager
+    def __call__(self, stage):
+        if self.track_allocations:
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            yield
+            _, peak = tracemalloc.get_traced_memory()
+            self.alloc_peak[stage].append(max(0, peak - base))
+            return
+        t0 = time.perf_counter_ns()
+        yield
+        self.durations[stage].append(time.perf_counter_ns() - t0)
+
+
+def summarize(values_ns):
+    ms = np.asarray(values_ns, dtype=np.float64) / 1e6
+    total_s = ms.sum() / 1e3
+    return {
+        "calls": len(ms),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "throughput_per_s": round(len(ms) / total_s, 2) if total_s > 0 else None,
+    }
+
+
+# ===== Pipelines =====
+
+class OutputStages:
+    # Per-detection outputs shared by the pipelines (writes go to a temp dir,
+    # CoT goes to a local UDP port nobody listens on)
+
+    def __init__(self, outdir):
+        self.outdir = outdir
+        self.csv_path = os.path.join(outdir, "detections_log.csv")
+        self.cot_addr = ("127.0.0.1", 4242)
+        self.events = 0
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+            self.fig, self.ax = plt.subplots()
+            self.image = self.ax.imshow(np.zeros((WATERFALL_DEPTH, 1024)), aspect='auto',
+                                        origin='lower', cmap='viridis')
+        except ImportError:
+            self.fig = None
+
+    def close(self):
+        if self.fig is not None:
+            import matplotlib.pyplot as plt
+            plt.close(self.fig)
+
+    def kml(self, freq_mhz, power_db, stamp, uid=None):
+        path = os.path.join(self.outdir, f"rf_event_{stamp}.kml")
+        with open(path, 'w') as f:
+            f.write(f'''<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+  <Placemark>
+    <name>RF Spike {freq_mhz:.2f} MHz</name>
+    <description>Power: {power_db:.2f} dBm</description>
+    <Point>
+      <coordinates>{LON},{LAT},0</coordinates>
+    </Point>
+  </Placemark>
+</kml>''')
+
+    def cot(self, freq_mhz, power_db, uid=None):
+        import cot_broadcaster_v2
+        cot_broadcaster_v2.ATAK_BROADCAST_IP, cot_broadcaster_v2.ATAK_BROADCAST_PORT = self.cot_addr
+        cot_broadcaster_v2.send_event(LAT, LON, freq_mhz, power_db)
+
+    def csv_row(self, freq_mhz, power_db, stamp):
+        with open(self.csv_path, 'a', newline='') as f:
+            csv.writer(f).writerow([stamp, f"{freq_mhz:.3f}", f"{power_db:.2f}"])
+
+    def snapshot(self, waterfall, stamp):
+        if self.fig is None:
+            return
+        self.image.set_data(waterfall)
+        fig_copy = copy.deepcopy(self.fig)
+        fig_copy.savefig(os.path.join(self.outdir, f"event_{stamp}.png"))
+
+    def run(self, t, waterfall, freq_mhz, power_db, uid=None):
+        stamp = f"{self.events:06d}"
+        self.events += 1
+        with t("snapshot"):
+            self.snapshot(waterfall, stamp)
+        with t("kml_generation"):
+            self.kml(freq_mhz, power_db, stamp, uid)
+        with t("cot_send"):
+            self.cot(freq_mhz, power_db, uid)
+        with t("csv_append"):
+            self.csv_row(freq_mhz, power_db, stamp)
+
+
+class CurrentOutputStages(OutputStages):
+    # Outputs as the reworked scanners do them: LUT + zlib PNG snapshot
+    # (rendered inline here so its cost is measured), rolling KML document,
+    # queued CoT, SQLite detection log (timed under csv_append for comparison)
+
+    def __init__(self, outdir):
+        super().__init__(outdir)
+        self.kml_doc = KmlPublisher(os.path.join(outdir, "rf_detections.kml"), LAT, LON, min_interval_s=0)
+        self.broadcaster = CotBroadcaster(*self.cot_addr).start()
+        self.store = DetectionStore(os.path.join(outdir, "detections.db")).start()
+
+    def kml(self, freq_mhz, power_db, stamp, uid=None):
+        now = time.time()
+        self.kml_doc.upsert(uid or stamp, freq_mhz, power_db, now, now)
+        self.kml_doc.publish(now)
+
+    def snapshot(self, waterfall, stamp):
+        with open(os.path.join(self.outdir, f"event_{stamp}.png"), 'wb') as f:
+            f.write(render_png(waterfall))
+
+    def cot(self, freq_mhz, power_db, uid=None):
+        self.broadcaster.send_event(LAT, LON, freq_mhz, power_db, uid)
+
+    def csv_row(self, freq_mhz, power_db, stamp):
+        self.store.add(time.time(), freq_mhz, power_db)
+
+    def close(self):
+        # Before the temp dir goes: the store's writer thread still has the DB open
+        self.broadcaster.close()
+        self.store.close()
+        super().close()
+
+
+class LegacyPipeline:
+    # rf_waterfall_plot_v10.py before the rework: one full-block FFT on
+    # complex128, strided to 1024 bins, list-of-rows waterfall
+
+    name = "legacy"
+
+    def __init__(self, outdir):
+        self.outputs = OutputStages(outdir)
+        self.waterfall = []
+        self.freq_axis = np.linspace(CENTER_FREQ - SAMPLE_RATE / 2, CENTER_FREQ + SAMPLE_RATE / 2, 1024) / 1e6
+        self.rows = 0
+
+    def run_frame(self, samples, t):
+        samples = samples.astype(np.complex128)  # read_samples() returned complex128
+        with t("fft"):
+            spec = np.fft.fft(samples)
+        with t("log_magnitude"):
+            spectrum = 20 * np.log10(np.abs(np.fft.fftshift(spec)))
+        with t("decimation"):
+            row = spectrum[::int(len(spectrum) / 1024)]
+        with t("spike_detection"):
+            spikes = np.where(row > THRESHOLD_DB)[0]
+        with t("waterfall_update"):
+            self.waterfall.append(row)
+            if len(self.waterfall) > WATERFALL_DEPTH:
+                self.waterfall.pop(0)
+            image = np.asarray(self.waterfall)  # what imshow did with the list every frame
+        self.rows += 1
+        if len(spikes):
+            self.outputs.run(t, image, self.freq_axis[spikes[0]], row[spikes[0]])
+
+
+class CurrentPipeline:
+    # rf_spectrum.SpectralEngine rows, rf_cfar + rf_peaks detection, rf_tracker
+    # events driving the outputs, rf_waterfall.WaterfallRing
+
+    name = "current"
+
+    def __init__(self, outdir):
+        self.outputs = CurrentOutputStages(outdir)
+        self.engine = SpectralEngine(sample_rate=SAMPLE_RATE)
+        self.waterfall = WaterfallRing(WATERFALL_DEPTH, self.engine.fft_size)
+        self.freq_axis = self.engine.freq_axis(CENTER_FREQ)
+        self.detector = CfarDetector(looks=self.engine.effective_averages())
+        self.tracker = Tracker()
+        self.frame_time = 0.0
+        self.rows = 0
+
+    def run_frame(self, samples, t):
+        with t("fft"):
+            power = self.engine.segment_power(samples)
+        with t("decimation"):
+            averaged = self.engine.average_rows(power)
+        with t("log_magnitude"):
+            rows = self.engine.to_db(averaged)
+        # Capture time of the block, so track timeouts behave as they would live
+        self.frame_time += len(samples) / SAMPLE_RATE
+        with t("spike_detection"):
+            peaks = peaks_from_rows(rows, self.detector, self.freq_axis)
+            events = self.tracker.update(peaks, self.frame_time)
+        with t("waterfall_update"):
+            self.waterfall.push_rows(rows)
+        self.rows += len(rows)
+        for event, track in events:
+            if event != "end":
+                self.outputs.run(t, self.waterfall.view(), track.center_mhz, track.peak_db, track.uid)
+
+
+PIPELINES = {p.name: p for p in (LegacyPipeline, CurrentPipeline)}
+
+
+# ===== Runner =====
+
+def run_pipeline(cls, iq_path, frames, warmup, alloc_frames, block_samples):
+    with tempfile.TemporaryDirectory(prefix="rf_bench_") as outdir:
+        pipe = cls(outdir)
+        try:
+            timer = StageTimer()
+            frame_ns = []
+            for i, samples in enumerate(iq_blocks(iq_path, warmup + frames, block_samples)):
+                t = timer if i >= warmup else StageTimer()
+                t0 = time.perf_counter_ns()
+                pipe.run_frame(samples, t)
+                if i >= warmup:
+                    frame_ns.append(time.perf_counter_ns() - t0)
+            rows = pipe.rows
+            events = len(timer.durations.get("csv_append", []))
+
+            alloc = StageTimer(track_allocations=True)
+            if alloc_frames:
+                tracemalloc.start()
+                try:
+                    for samples in iq_blocks(iq_path, alloc_frames, block_samples):
+                        pipe.run_frame(samples, alloc)
+                finally:
+                    tracemalloc.stop()
+        finally:
+            pipe.outputs.close()
+
+    frame_s = np.sum(frame_ns) / 1e9
+    core_ns = np.sum([timer.durations[s] for s in FRAME_STAGES if s in timer.durations], axis=0)
+    stages = {}
+    for stage in STAGES:
+        if not timer.durations.get(stage):
+            continue
+        stats = summarize(timer.durations[stage])
+        if alloc.alloc_peak.get(stage):
+            stats["alloc_peak_kb"] = round(float(np.mean(alloc.alloc_peak[stage])) / 1024, 1)
+        stages[stage] = stats
+    return {
+        "frames": frames,
+        "events": events,
+        "frames_per_second": round(frames / frame_s, 2),
+        "rows_per_second": round(rows * frames / max(1, warmup + frames) / frame_s, 2),
+        "frame_latency_ms": summarize(frame_ns),
+        "dsp_latency_ms": summarize(core_ns),
+        "stages": stages,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_summary(report, baseline=None, out=sys.stderr):
+    for name, res in report["pipelines"].items():
+        print(f"\n📊 {name}: {res['frames_per_second']} frames/s, {res['rows_per_second']} rows/s, "
+              f"{res['events']} events", file=out)
+        print(f"   {'stage':<18}{'p50 ms':>10}{'p99 ms':>10}{'calls/s':>12}{'alloc KB':>10}", file=out)
+        base = (baseline or {}).get("pipelines", {}).get(name, {}).get("stages", {})
+        for stage, s in res["stages"].items():
+            line = (f"   {stage:<18}{s['p50_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+                    f"{s['throughput_per_s'] or 0:>12.1f}{s.get('alloc_peak_kb', 0):>10.1f}")
+            if stage in base and base[stage]["p50_ms"] > 0:
+                line += f"   x{s['p50_ms'] / base[stage]['p50_ms']:.2f} vs baseline"
+            print(line, file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RF pipeline benchmark")
+    parser.add_argument("--iq", help="SigMF recording to replay (default: synthetic IQ)")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--alloc-frames", type=int, default=5, help="frames run under tracemalloc (0 = skip)")
+    parser.add_argument("--block-samples", type=int, default=BLOCK_SAMPLES)
+    parser.add_argument("--pipeline", choices=["all"] + list(PIPELINES), default="all")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    args = parser.parse_args(argv)
+
+    names = list(PIPELINES) if args.pipeline == "all" else [args.pipeline]
+    report = {
+        "benchmark": "rf_pipeline",
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "git_rev": git_revision(),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "iq": args.iq or "synthetic",
+        "block_samples": args.block_samples,
+        "sample_rate": SAMPLE_RATE,
+        "pipelines": {},
+    }
+    for name in names:
+        print(f"⏱️ Running {name} pipeline...", file=sys.stderr)
+        report["pipelines"][name] = run_pipeline(PIPELINES[name], args.iq, args.frames, args.warmup,
+                                                 args.alloc_frames, args.block_samples)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_summary(report, baseline)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+        print(f"\n✅ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
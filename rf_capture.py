@@ -0,0 +1,174 @@
+# rf_capture.py
+#
+# Decoupled SDR capture stage. A background thread keeps the dongle streaming
+# (read_bytes_async, or a read_bytes loop as fallback) into a preallocated ring
+# of raw uint8 IQ blocks, so the FFT / plotting / upload work in the main loop
+# no longer stops the radio from being read.
+
+import threading
+import time
+import numpy as np
+
+# ===== Settings =====
+BLOCK_SAMPLES = 256 * 1024   # complex samples per block (same as the old read_samples call)
+RING_BLOCKS = 16             # ~1.7 s of IQ at 2.4 MS/s
+
+
+def iq_bytes_to_complex(raw, out=None):
+    # Convert interleaved unsigned 8-bit I/Q to complex64 in [-1, 1)
+    n = len(raw) // 2
+    if out is None:
+        out = np.empty(n, dtype=np.complex64)
+    view = out[:n].view(np.float32)
+    np.subtract(raw[:2 * n], 127.5, out=view, dtype=np.float32)
+    view *= 1.0 / 127.5
+    return out[:n]
+
+
+class SampleRing:
+    # Fixed-size ring of raw IQ blocks with one writer (capture thread) and one
+    # reader (processing loop). The reader converts its block (and takes its
+    # timestamp) under the lock, so the writer, dropping the oldest blocks
+    # when full, can never overwrite one mid-conversion. That holds the
+    # capture thread up for ~1 ms per block at most.
+
+    def __init__(self, block_samples=BLOCK_SAMPLES, num_blocks=RING_BLOCKS, drop_oldest=True):
+        if num_blocks < 2:
+            raise ValueError("SampleRing needs at least 2 blocks")
+        self.block_samples = block_samples
+        self.block_bytes = block_samples * 2
+        self.num_blocks = num_blocks
+        # drop_oldest=False makes the writer wait for space instead (lossless,
+        # used when replaying recordings faster than real time)
+        self.drop_oldest = drop_oldest
+        self.buffer = np.empty((num_blocks, self.block_bytes), dtype=np.uint8)
+        self.timestamps = np.zeros(num_blocks, dtype=np.float64)
+        self._iq = np.empty(block_samples, dtype=np.complex64)
+
+        self._cond = threading.Condition()
+        self.write_seq = 0
+        self.read_seq = 0
+        self._behind = False
+        self._closed = False
+
+        # Stats
+        self.overruns = 0         # times the writer caught up with the reader
+        self.dropped_blocks = 0   # blocks overwritten before they were processed
+        self.short_blocks = 0     # partial reads from the dongle
+
+    def write(self, data, timestamp=None):
+        data = np.frombuffer(data, dtype=np.uint8)
+        if len(data) != self.block_bytes:
+            self.short_blocks += 1
+            data = data[:self.block_bytes]
+        with self._cond:
+            if not self.drop_oldest:
+                self._cond.wait_for(lambda: self.write_seq - self.read_seq < self.num_blocks or self._closed)
+                if self._closed:
+                    return
+            if self.write_seq - self.read_seq >= self.num_blocks:
+                # Ring is full: drop the oldest unread block
+                self.read_seq += 1
+                self.dropped_blocks += 1
+                if not self._behind:
+                    self.overruns += 1
+                    self._behind = True
+            else:
+                self._behind = False
+            slot = self.write_seq % self.num_blocks
+            self.buffer[slot, :len(data)] = data
+            if len(data) < self.block_bytes:
+                self.buffer[slot, len(data):] = 127  # pad with zero-level IQ
+            self.timestamps[slot] = time.time() if timestamp is None else timestamp
+            self.write_seq += 1
+            self._cond.notify_all()
+
+    def read(self, timeout=None):
+        # Returns (seq, timestamp, complex64 samples) or None on timeout/close.
+        # The sample array is reused between calls; copy it if you keep it.
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.write_seq > self.read_seq or self._closed, timeout):
+                return None
+            if self.write_seq <= self.read_seq:
+                return None
+            seq = self.read_seq
+            slot = seq % self.num_blocks
+            iq_bytes_to_complex(self.buffer[slot], out=self._iq)
+            timestamp = float(self.timestamps[slot])
+            self.read_seq += 1
+            self._cond.notify_all()
+        return seq, timestamp, self._iq
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return self.write_seq - self.read_seq
+
+    def stats(self):
+        with self._cond:
+            return {
+                "blocks_written": self.write_seq,
+                "blocks_read": self.read_seq - self.dropped_blocks,
+                "pending": self.write_seq - self.read_seq,
+                "overruns": self.overruns,
+                "dropped_blocks": self.dropped_blocks,
+                "short_blocks": self.short_blocks,
+            }
+
+
+class CaptureThread(threading.Thread):
+    # Streams blocks from an RtlSdr (or any rf_iq_source source) into a
+    # SampleRing until stop() is called or a replay source runs out.
+
+    def __init__(self, sdr, ring, use_async=True):
+        super().__init__(name="sdr-capture", daemon=True)
+        self.sdr = sdr
+        self.ring = ring
+        self.use_async = use_async and hasattr(sdr, "read_bytes_async")
+        self._stop_event = threading.Event()
+        self.error = None
+
+    def _on_bytes(self, values, context):
+        if self._stop_event.is_set():
+            self.sdr.cancel_read_async()
+            return
+        self.ring.write(values)
+
+    def run(self):
+        try:
+            if self.use_async:
+                # Blocks inside librtlsdr until cancel_read_async()
+                self.sdr.read_bytes_async(self._on_bytes, self.ring.block_bytes)
+            else:
+                while not self._stop_event.is_set():
+                    self.ring.write(self.sdr.read_bytes(self.ring.block_bytes))
+        except EOFError:
+            print("⏹️ End of IQ recording")
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self.error = e
+                print(f"❌ Capture thread stopped: {e}")
+        finally:
+            self.ring.close()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        self.ring.close()
+        if self.use_async:
+            try:
+                self.sdr.cancel_read_async()
+            except Exception:
+                pass
+        self.join(timeout)
+
+
+def start_capture(sdr, block_samples=BLOCK_SAMPLES, num_blocks=RING_BLOCKS, use_async=True):
+    # Unpaced replays must not lose blocks, so they get a lossless ring
+    ring = SampleRing(block_samples, num_blocks, drop_oldest=getattr(sdr, "realtime", True))
+    capture = CaptureThread(sdr, ring, use_async=use_async)
+    capture.start()
+    return ring, capture
@@ -1,26 +1,391 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-
-def analyze_rf_data(csv_file):
-    df = pd.read_csv(csv_file)
-    # Example structure, adapt depending on your rtl_power format:
-    frequencies = df['frequency']  
-    signal_strengths = df['signal_strength']
-
-    plt.plot(frequencies, signal_strengths)
-    plt.title('RF Signal Scan')
-    plt.xlabel('Frequency (Hz)')
-    plt.ylabel('Signal Strength (dB)')
-    plt.show()
-
-    # Simple threshold-based detection
-    threshold = -40  # Example: detect strong signals
-    detections = df[df['signal_strength'] > threshold]
-    if not detections.empty:
-        print("🚨 Potential Drone Activity Detected!")
-        print(detections)
+# rf_detect.py
+#
+# Streaming analyzer for rtl_power CSV scans. rtl_power writes one line per
+# hop and sweep:
+#
+#   date, time, hz_low, hz_high, hz_step, samples, db, db, db, ...
+#
+# where the dB values are bins of hz_step starting at hz_low. Overnight scans
+# run to several GB, so the file is read in CHUNK_BYTES pieces (cut at a line
+# end). The numeric part of a whole chunk is split and converted to float in
+# one numpy call, and the per-line bin arrays are expanded into flat (time, freq, dB) arrays
+# with index arithmetic, never a Python loop over bins. Memory stays at a few
+# chunks, whatever the file size.
+#
+# Detection runs on every chunk as it goes. Bins above THRESHOLD_DB are
+# counted, and contiguous runs of them in a hop are reported as detections
+# (optionally streamed to a CSV). The result is a table of per-band stats
+# (BAND_MHZ wide): mean, noise floor and median from a fixed dB histogram,
+# the maximum with its frequency and time, occupancy and the detection count.
+#
+#   python3 rf_detect.py drone_scan.csv
+#   python3 rf_detect.py scan.csv --threshold -35 --band-mhz 0.5 --detections hits.csv
+
+import os
+import sys
+import csv
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+# ===== Settings =====
+THRESHOLD_DB = -40           # bins above this count as activity
+BAND_MHZ = 1.0               # width of the summary bands
+CHUNK_BYTES = 4 << 20        # read size; memory use is a small multiple of this
+HIST_MIN_DB = -140.0         # per-band dB histogram (floor / median estimates)
+HIST_MAX_DB = 40.0
+HIST_STEP_DB = 0.5
+FLOOR_PERCENTILE = 10        # noise floor estimate
+FIXED_FIELDS = 6             # date, time, hz_low, hz_high, hz_step, samples
+
+HIST_BINS = int((HIST_MAX_DB - HIST_MIN_DB) / HIST_STEP_DB)
+
+
+def read_chunks(path, chunk_bytes=CHUNK_BYTES):
+    # Blocks of whole lines (bytes)
+    with open(path, 'rb') as f:
+        tail = b""
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                break
+            data = tail + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                tail = data
+                continue
+            tail = data[cut:]
+            yield data[:cut]
+        if tail.strip():
+            yield tail
+
+
+def parse_numbers(text):
+    # Comma-separated floats (split in C, converted by numpy in one pass);
+    # None if any field isn't a number
+    try:
+        return np.array(text.split(b","), dtype=np.float64)
+    except ValueError:
+        return None
+
+
+class ChunkParser:
+    # rtl_power lines -> flat arrays: per value its line index, frequency and
+    # dB, plus per-line timestamp / hz_low / hz_step
+
+    def __init__(self):
+        self._times = {}            # "date, time" -> epoch (one entry per sweep)
+        self.lines = 0
+        self.bad_lines = 0
+
+    def _timestamp(self, date, clock):
+        key = date + clock
+        ts = self._times.get(key)
+        if ts is None:
+            try:
+                ts = datetime.strptime(f"{date.strip().decode()} {clock.strip().decode()}",
+                                       "%Y-%m-%d %H:%M:%S").timestamp()
+            except ValueError:
+                ts = float("nan")
+            if len(self._times) > 10000:
+                self._times.clear()
+            self._times[key] = ts
+        return ts
+
+    def parse(self, chunk):
+        times, rests, counts = [], [], []
+        for line in chunk.splitlines():
+            parts = line.split(b",", 2)
+            if len(parts) < 3:
+                if line.strip():
+                    self.bad_lines += 1
+                continue
+            n = parts[2].count(b",") + 1
+            if n <= FIXED_FIELDS - 2:
+                self.bad_lines += 1
+                continue
+            times.append(self._timestamp(parts[0], parts[1]))
+            rests.append(parts[2])
+            counts.append(n)
+        if not rests:
+            return None
+        counts = np.array(counts)
+        flat = parse_numbers(b",".join(rests))
+        if flat is None or len(flat) != counts.sum():
+            # A malformed line somewhere: fall back to line-by-line for this chunk
+            parsed = [parse_numbers(rest) for rest in rests]
+            keep = [i for i, v in enumerate(parsed) if v is not None and len(v) == counts[i]]
+            self.bad_lines += len(rests) - len(keep)
+            if not keep:
+                return None
+            counts = counts[keep]
+            times = [times[i] for i in keep]
+            flat = np.concatenate([parsed[i] for i in keep])
+
+        self.lines += len(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        hz_low = flat[starts]
+        hz_step = flat[starts + 2]
+        nbins = counts - (FIXED_FIELDS - 2)
+
+        # Expand: which line every dB value belongs to, and its bin number there
+        line = np.repeat(np.arange(len(counts)), nbins)
+        first = starts + (FIXED_FIELDS - 2)
+        offsets = np.concatenate(([0], np.cumsum(nbins)[:-1]))
+        bin_index = np.arange(len(line)) - offsets[line]
+        db = flat[first[line] + bin_index]
+        freq = hz_low[line] + (bin_index + 0.5) * hz_step[line]
+        return {
+            "line": line,
+            "bin": bin_index,
+            "freq_hz": freq,
+            "db": db,
+            "time": np.asarray(times)[line],
+            "hz_step": hz_step,
+        }
+
+
+class BandStats:
+    # Per-band accumulators, grown as new bands appear (bounded by the scanned range)
+
+    def __init__(self, band_hz, threshold_db):
+        self.band_hz = band_hz
+        self.threshold_db = threshold_db
+        self.keys = np.empty(0, dtype=np.int64)   # sorted band numbers
+        self.count = np.empty(0)
+        self.sum_db = np.empty(0)
+        self.above = np.empty(0)
+        self.detections = np.empty(0)
+        self.max_db = np.empty(0)
+        self.max_freq = np.empty(0)
+        self.max_time = np.empty(0)
+        self.first_time = np.empty(0)
+        self.last_time = np.empty(0)
+        self.hist = np.empty((0, HIST_BINS))
+
+    def _rows(self, keys):
+        # Accumulator rows for (sorted, unique) band keys, adding new ones
+        new = np.setdiff1d(keys, self.keys, assume_unique=True)
+        if len(new):
+            merged = np.union1d(self.keys, new)
+            pos = np.searchsorted(merged, self.keys)
+            n = len(merged)
+
+            def grow(a, fill):
+                out = np.full((n,) + a.shape[1:], fill, dtype=a.dtype)
+                out[pos] = a
+                return out
+
+            self.count = grow(self.count, 0.0)
+            self.sum_db = grow(self.sum_db, 0.0)
+            self.above = grow(self.above, 0.0)
+            self.detections = grow(self.detections, 0.0)
+            self.max_db = grow(self.max_db, -np.inf)
+            self.max_freq = grow(self.max_freq, np.nan)
+            self.max_time = grow(self.max_time, np.nan)
+            self.first_time = grow(self.first_time, np.inf)
+            self.last_time = grow(self.last_time, -np.inf)
+            self.hist = grow(self.hist, 0.0)
+            self.keys = merged
+        return np.searchsorted(self.keys, keys)
+
+    def _band_index(self, freq_hz):
+        # Band number relative to the lowest in this chunk: (index, lowest key, span)
+        keys = np.floor(freq_hz / self.band_hz).astype(np.int64)
+        kmin = int(keys.min())
+        keys -= kmin
+        return keys, kmin, int(keys.max()) + 1
+
+    def add(self, freq_hz, db, times):
+        if not len(freq_hz):
+            return
+        inv, kmin, n = self._band_index(freq_hz)
+        count = np.bincount(inv, minlength=n)
+        present = np.flatnonzero(count)
+        rows = self._rows(kmin + present)
+        self.count[rows] += count[present]
+        self.sum_db[rows] += np.bincount(inv, weights=db, minlength=n)[present]
+        self.above[rows] += np.bincount(inv, weights=db > self.threshold_db, minlength=n)[present]
+        h = ((db - HIST_MIN_DB) * (1.0 / HIST_STEP_DB)).astype(np.int64)
+        np.clip(h, 0, HIST_BINS - 1, out=h)
+        h += inv * HIST_BINS
+        self.hist[rows] += np.bincount(h, minlength=n * HIST_BINS).reshape(n, HIST_BINS)[present]
+
+        # Max / time span per run of values in one band from one hop line,
+        # then per band over those few segments
+        seg = np.flatnonzero(np.concatenate(([True], (inv[1:] != inv[:-1]) | (times[1:] != times[:-1]))))
+        seg_band = inv[seg]
+        seg_max = np.maximum.reduceat(db, seg)
+        seg_time = times[seg]
+        t_min = np.full(n, np.inf)
+        np.fmin.at(t_min, seg_band, seg_time)   # fmin/fmax skip unparseable (NaN) times
+        t_max = np.full(n, -np.inf)
+        np.fmax.at(t_max, seg_band, seg_time)
+        self.first_time[rows] = np.fmin(self.first_time[rows], t_min[present])
+        self.last_time[rows] = np.fmax(self.last_time[rows], t_max[present])
+
+        # New per-band maxima, and where / when they happened
+        peak = np.full(n, -np.inf)
+        np.maximum.at(peak, seg_band, seg_max)
+        better = np.zeros(n, dtype=bool)
+        better[present] = peak[present] > self.max_db[rows]
+        if better.any():
+            hit = np.flatnonzero(better[seg_band] & (seg_max == peak[seg_band]))
+            bands, first = np.unique(seg_band[hit], return_index=True)
+            ends = np.concatenate((seg[1:], [len(db)]))
+            for band, k in zip(bands, hit[first]):
+                at = seg[k] + int(np.argmax(db[seg[k]:ends[k]]))
+                row = rows[np.searchsorted(present, band)]
+                self.max_db[row] = db[at]
+                self.max_freq[row] = freq_hz[at]
+                self.max_time[row] = times[at]
+
+    def add_detections(self, center_hz):
+        inv, kmin, n = self._band_index(center_hz)
+        count = np.bincount(inv, minlength=n)
+        present = np.flatnonzero(count)
+        self.detections[self._rows(kmin + present)] += count[present]
+
+    def _percentile(self, row, q):
+        cdf = np.cumsum(self.hist[row])
+        if cdf[-1] == 0:
+            return float("nan")
+        return HIST_MIN_DB + (np.searchsorted(cdf, cdf[-1] * q / 100.0) + 0.5) * HIST_STEP_DB
+
+    def summary(self):
+        bands = []
+        for row, key in enumerate(self.keys):
+            n = self.count[row]
+            bands.append({
+                "start_mhz": round(key * self.band_hz / 1e6, 3),
+                "stop_mhz": round((key + 1) * self.band_hz / 1e6, 3),
+                "values": int(n),
+                "mean_db": round(self.sum_db[row] / n, 2),
+                "floor_db": self._percentile(row, FLOOR_PERCENTILE),
+                "median_db": self._percentile(row, 50),
+                "max_db": round(float(self.max_db[row]), 2),
+                "max_mhz": round(self.max_freq[row] / 1e6, 4),
+                "max_time": self.max_time[row],
+                "occupancy_pct": round(100.0 * self.above[row] / n, 3),
+                "detections": int(self.detections[row]),
+                "first_time": self.first_time[row],
+                "last_time": self.last_time[row],
+            })
+        return bands
+
+
+def find_runs(above, new_line):
+    # Runs of True within one hop line: (start, stop) indices into the flat
+    # arrays, stop exclusive. new_line marks each line's first bin.
+    prev = np.concatenate(([False], above[:-1])) & ~new_line
+    nxt = np.concatenate((above[1:], [False])) & ~np.concatenate((new_line[1:], [True]))
+    return np.flatnonzero(above & ~prev), np.flatnonzero(above & ~nxt) + 1
+
+
+def analyze_rf_data(csv_file, threshold_db=THRESHOLD_DB, band_mhz=BAND_MHZ, detections_csv=None,
+                    chunk_bytes=CHUNK_BYTES, progress=True):
+    parser = ChunkParser()
+    bands = BandStats(band_mhz * 1e6, threshold_db)
+    total_bytes = os.path.getsize(csv_file)
+    done_bytes = 0
+    values_seen = 0
+    detections = 0
+    t0 = time.perf_counter()
+
+    out = open(detections_csv, 'w', newline='') if detections_csv else None
+    writer = csv.writer(out) if out else None
+    if writer:
+        writer.writerow(["Timestamp", "Frequency_MHz", "Peak_dB", "Bandwidth_kHz"])
+    try:
+        for chunk in read_chunks(csv_file, chunk_bytes):
+            done_bytes += len(chunk)
+            values = parser.parse(chunk)
+            if values is None:
+                continue
+            db = values["db"]
+            ok = np.isfinite(db)
+            if ok.all():
+                bands.add(values["freq_hz"], db, values["time"])
+            elif ok.any():
+                bands.add(values["freq_hz"][ok], db[ok], values["time"][ok])
+            values_seen += int(ok.sum())
+
+            above = ok & (db > threshold_db)      # +inf is a bad value, not a detection
+            if above.any():
+                starts, stops = find_runs(above, values["bin"] == 0)
+                # Bins between runs are below threshold, so masking by `above`
+                # makes each reduceat span exactly one run
+                peak_db = np.maximum.reduceat(np.where(above, db, -np.inf), starts)
+                weight = np.zeros_like(db)
+                weight[above] = 10.0 ** (db[above] / 10.0)
+                center = (np.add.reduceat(weight * values["freq_hz"], starts) /
+                          np.add.reduceat(weight, starts))
+                bands.add_detections(center)
+                detections += len(starts)
+                if writer:
+                    width_khz = (stops - starts) * values["hz_step"][values["line"][starts]] / 1e3
+                    for ts, f, p, w in zip(values["time"][starts], center, peak_db, width_khz):
+                        writer.writerow([datetime.fromtimestamp(ts).strftime("%Y-%m-%dT%H:%M:%S")
+                                         if np.isfinite(ts) else "", f"{f / 1e6:.4f}", f"{p:.2f}", f"{w:.1f}"])
+
+            if progress:
+                rate = done_bytes / 1e6 / max(time.perf_counter() - t0, 1e-9)
+                print(f"\r⏳ {100.0 * done_bytes / max(total_bytes, 1):5.1f}%  {rate:6.1f} MB/s",
+                      end="", file=sys.stderr, flush=True)
+    finally:
+        if out:
+            out.close()
+    if progress:
+        print(file=sys.stderr)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "file": csv_file,
+        "bytes": total_bytes,
+        "lines": parser.lines,
+        "bad_lines": parser.bad_lines,
+        "values": values_seen,
+        "detections": detections,
+        "threshold_db": threshold_db,
+        "elapsed_s": round(elapsed, 2),
+        "mb_per_s": round(total_bytes / 1e6 / elapsed, 1) if elapsed > 0 else None,
+        "bands": bands.summary(),
+    }
+
+
+def format_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%m-%d %H:%M:%S") if np.isfinite(ts) else "-"
+
+
+def print_summary(result):
+    print(f"📊 {result['file']}: {result['lines']} lines, {result['values']} values, "
+          f"{result['bad_lines']} bad lines, {result['elapsed_s']} s ({result['mb_per_s']} MB/s)")
+    print(f"{'Band (MHz)':>19} {'mean':>7} {'floor':>7} {'median':>7} {'max':>7} {'at MHz':>10} "
+          f"{'at time':>15} {'occ %':>7} {'hits':>7}")
+    for b in result["bands"]:
+        print(f"{b['start_mhz']:9.3f}-{b['stop_mhz']:<9.3f} {b['mean_db']:7.1f} {b['floor_db']:7.1f} "
+              f"{b['median_db']:7.1f} {b['max_db']:7.1f} {b['max_mhz']:10.4f} {format_time(b['max_time']):>15} "
+              f"{b['occupancy_pct']:7.2f} {b['detections']:7d}")
+    active = [b for b in result["bands"] if b["detections"]]
+    if active:
+        print(f"🚨 Potential Drone Activity Detected! {result['detections']} detections above "
+              f"{result['threshold_db']} dB in {len(active)} bands")
+
 
 if __name__ == "__main__":
-    analyze_rf_data("drone_scan.csv")
+    ap = argparse.ArgumentParser(description="Summarize an rtl_power CSV scan per band")
+    ap.add_argument("csv_file", nargs="?", default="drone_scan.csv")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD_DB, help="detection threshold (dB)")
+    ap.add_argument("--band-mhz", type=float, default=BAND_MHZ, help="summary band width (MHz)")
+    ap.add_argument("--detections", help="write every detection to this CSV")
+    ap.add_argument("--json", help="write the summary as JSON")
+    args = ap.parse_args()
 
-pip install pyrtlsdr
\ No newline at end of file
+    result = analyze_rf_data(args.csv_file, args.threshold, args.band_mhz, args.detections)
+    print_summary(result)
+    if args.json:
+        import json
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2, default=float)
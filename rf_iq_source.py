@@ -0,0 +1,266 @@
+# rf_iq_source.py
+#
+# IQ sources that all look like an RtlSdr to the rest of the pipeline
+# (read_bytes / read_samples / read_bytes_async / cancel_read_async / close,
+# plus center_freq, sample_rate and gain attributes):
+#
+#   RtlSdrSource  - live dongle (pyrtlsdr imported only when used)
+#   IQRecorder    - wraps another source and tees raw uint8 IQ to a SigMF
+#                   style recording (.sigmf-data + .sigmf-meta JSON sidecar)
+#   ReplaySource  - memory-maps a recording and plays it back, either paced
+#                   at the recorded sample rate or as fast as possible
+#
+# open_source("rtlsdr") / open_source("rtlsdr:1") / open_source("scan.sigmf-meta")
+
+import os
+import json
+import time
+import threading
+import numpy as np
+from datetime import datetime, timezone
+
+from rf_capture import iq_bytes_to_complex
+
+DATA_EXT = ".sigmf-data"
+META_EXT = ".sigmf-meta"
+
+
+def recording_paths(path):
+    base = path
+    for ext in (DATA_EXT, META_EXT):
+        if base.endswith(ext):
+            base = base[:-len(ext)]
+    return base + DATA_EXT, base + META_EXT
+
+
+class RtlSdrSource:
+
+    def __init__(self, center_freq=915e6, sample_rate=2.4e6, gain='auto', device_index=0, serial=None):
+        from rtlsdr import RtlSdr
+        if serial is not None:
+            device_index = RtlSdr.get_device_index_by_serial(serial)
+        self.device_index = device_index
+        self.serial = serial
+        self.realtime = True
+        self.sdr = RtlSdr(device_index)
+        self.sdr.sample_rate = sample_rate
+        self.sdr.center_freq = center_freq
+        self.sdr.gain = gain
+
+    @property
+    def center_freq(self):
+        return self.sdr.center_freq
+
+    @center_freq.setter
+    def center_freq(self, value):
+        self.sdr.center_freq = value
+
+    @property
+    def sample_rate(self):
+        return self.sdr.sample_rate
+
+    @sample_rate.setter
+    def sample_rate(self, value):
+        self.sdr.sample_rate = value
+
+    @property
+    def gain(self):
+        return self.sdr.gain
+
+    @gain.setter
+    def gain(self, value):
+        self.sdr.gain = value
+
+    def read_bytes(self, num_bytes):
+        return self.sdr.read_bytes(num_bytes)
+
+    def read_samples(self, num_samples):
+        return self.sdr.read_samples(num_samples)
+
+    def read_bytes_async(self, callback, num_bytes, context=None):
+        self.sdr.read_bytes_async(callback, num_bytes, context)
+
+    def cancel_read_async(self):
+        self.sdr.cancel_read_async()
+
+    def close(self):
+        self.sdr.close()
+
+
+class ReplaySource:
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.data_path, self.meta_path = recording_paths(path)
+        self.meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        glob = self.meta.get("global", {})
+        if glob.get("core:datatype", "cu8") != "cu8":
+            raise ValueError(f"Unsupported datatype {glob['core:datatype']} (only cu8)")
+        captures = self.meta.get("captures") or [{}]
+        self.sample_rate = float(glob.get("core:sample_rate", 2.4e6))
+        self.center_freq = float(captures[0].get("core:frequency", 915e6))
+        self.gain = glob.get("rf:gain", "auto")
+        self.realtime = realtime
+        self.loop = loop
+
+        self.data = np.memmap(self.data_path, dtype=np.uint8, mode='r')
+        self.data = self.data[:len(self.data) // 2 * 2]
+        if len(self.data) == 0:
+            raise ValueError(f"Empty recording: {self.data_path}")
+        self.position = 0        # byte offset into the recording
+        self.bytes_served = 0
+        self._t0 = None
+        self._cancel = threading.Event()
+
+    @property
+    def num_samples(self):
+        return len(self.data) // 2
+
+    def _pace(self):
+        if not self.realtime:
+            return
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+            return
+        due = self._t0 + (self.bytes_served // 2) / self.sample_rate
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def read_bytes(self, num_bytes):
+        # Zero-copy view into the memory-mapped file where possible
+        num_bytes -= num_bytes % 2
+        if self.position + num_bytes > len(self.data):
+            if not self.loop:
+                if self.position >= len(self.data):
+                    raise EOFError("End of IQ recording")
+                num_bytes = len(self.data) - self.position
+            elif num_bytes > len(self.data):
+                raise ValueError("Block larger than looped recording")
+            else:
+                self.position = 0
+        self._pace()
+        block = self.data[self.position:self.position + num_bytes]
+        self.position += num_bytes
+        self.bytes_served += num_bytes
+        return block
+
+    def read_samples(self, num_samples):
+        return iq_bytes_to_complex(self.read_bytes(2 * num_samples))
+
+    def read_bytes_async(self, callback, num_bytes, context=None):
+        self._cancel.clear()
+        while not self._cancel.is_set():
+            callback(self.read_bytes(num_bytes), context)
+
+    def cancel_read_async(self):
+        self._cancel.set()
+
+    def rewind(self):
+        self.position = 0
+        self.bytes_served = 0
+        self._t0 = None
+
+    def close(self):
+        self._cancel.set()
+        self.data = None
+
+
+class IQRecorder:
+    # Tees everything read from `source` into a SigMF-style recording.
+
+    def __init__(self, source, path, description="RF scanner capture"):
+        self.source = source
+        self.data_path, self.meta_path = recording_paths(path)
+        folder = os.path.dirname(self.data_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.description = description
+        self.realtime = getattr(source, "realtime", True)
+        self._file = open(self.data_path, 'wb')
+        self.samples_written = 0
+        self.captures = []
+        self._add_capture()
+        self._write_meta()
+
+    def __getattr__(self, name):
+        # sample_rate, gain, ... fall through to the wrapped source
+        return getattr(self.source, name)
+
+    @property
+    def center_freq(self):
+        return self.source.center_freq
+
+    @center_freq.setter
+    def center_freq(self, value):
+        self.source.center_freq = value
+        self._add_capture()
+
+    def _add_capture(self):
+        self.captures.append({
+            "core:sample_start": self.samples_written,
+            "core:frequency": float(self.source.center_freq),
+            "core:datetime": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        })
+
+    def _write_meta(self):
+        meta = {
+            "global": {
+                "core:datatype": "cu8",
+                "core:sample_rate": float(self.source.sample_rate),
+                "core:version": "1.0.0",
+                "core:description": self.description,
+                "core:recorder": "rf_iq_source.IQRecorder",
+                "rf:gain": self.source.gain,
+            },
+            "captures": self.captures,
+            "annotations": [],
+        }
+        with open(self.meta_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def _record(self, data):
+        data = np.frombuffer(data, dtype=np.uint8)
+        self._file.write(data.tobytes())
+        self.samples_written += len(data) // 2
+
+    def read_bytes(self, num_bytes):
+        data = self.source.read_bytes(num_bytes)
+        self._record(data)
+        return data
+
+    def read_samples(self, num_samples):
+        return iq_bytes_to_complex(np.frombuffer(self.read_bytes(2 * num_samples), dtype=np.uint8))
+
+    def read_bytes_async(self, callback, num_bytes, context=None):
+        def _tee(values, ctx):
+            self._record(values)
+            callback(values, ctx)
+        self.source.read_bytes_async(_tee, num_bytes, context)
+
+    def cancel_read_async(self):
+        self.source.cancel_read_async()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            self._write_meta()
+        self.source.close()
+
+
+def open_source(spec="rtlsdr", center_freq=915e6, sample_rate=2.4e6, gain='auto',
+                record=None, realtime=True, loop=False):
+    # "rtlsdr" / "rtlsdr:<index>" / "rtlsdr:<serial>" or a recording path
+    if spec is None or spec == "rtlsdr" or spec.startswith("rtlsdr:"):
+        dev = spec.split(":", 1)[1] if spec and ":" in spec else "0"
+        if dev.isdigit():
+            source = RtlSdrSource(center_freq, sample_rate, gain, device_index=int(dev))
+        else:
+            source = RtlSdrSource(center_freq, sample_rate, gain, serial=dev)
+    else:
+        source = ReplaySource(spec, realtime=realtime, loop=loop)
+    if record:
+        source = IQRecorder(source, record)
+    return source
@@ -0,0 +1,322 @@
+# rf_multi.py
+#
+# Multi-dongle scanning: one worker process per RTL-SDR (picked by index or
+# serial, each tuned to its own band), so coverage grows with the dongles
+# and cores on the Pi instead of one 2.4 MHz slice. Each worker runs the
+# usual capture -> SpectralEngine -> CFAR -> rf_peaks -> Tracker chain and
+# sends its track events, stamped with the capture time of their block, to
+# the parent over one multiprocessing queue.
+#
+# The parent merges them into a single time-ordered stream. Every block a
+# worker reports advances that device's watermark (even with no events), and
+# an event is released once every live device has reported past its
+# timestamp. A device that goes quiet for MAX_DELAY_S (stalled dongle,
+# crashed worker) stops holding the others back. Workers also send health
+# stats (rate, overruns, active tracks) every HEALTH_INTERVAL_S.
+#
+# Track uids carry the device name (rf-<name>-00001) so they stay unique in
+# the merged stream. With SPECTRUM_BUS each worker also publishes its rows to
+# its own spectrum bus ("rf_spectrum_<name>").
+#
+#   python3 rf_multi.py                              # DEVICES below
+#   python3 rf_multi.py rtlsdr:0@915 rtlsdr:1@868    # source@centre MHz, one worker each
+#   python3 rf_multi.py a.sigmf-meta b.sigmf-meta    # replays standing in for dongles
+
+import sys
+import time
+import heapq
+import queue
+import signal
+import multiprocessing as mp
+from collections import namedtuple
+
+from rf_capture import start_capture
+from rf_iq_source import open_source
+from rf_spectrum import SpectralEngine, notch_dc
+from rf_cfar import CfarDetector
+from rf_peaks import peaks_from_rows
+from rf_tracker import Tracker
+from spectrum_bus import SpectrumBusWriter, BUS_NAME
+from detection_store import DetectionStore
+
+# ===== Settings =====
+SAMPLE_RATE = 2.4e6
+GAIN = 'auto'
+FFT_SIZE = 1024
+FFT_OVERLAP = 0.5
+FFT_AVERAGES = 64
+CFAR_GUARD = 4
+CFAR_TRAIN = 64
+CFAR_PFA = 1e-6
+DC_NOTCH = True             # patch each dongle's LO-leakage spike at its centre
+MAX_DELAY_S = 2.0           # a device silent this long no longer holds back the merge
+HEALTH_INTERVAL_S = 5.0     # worker health reports
+SPECTRUM_BUS = False        # per-device shared-memory rows (rf_spectrum_<name>)
+
+# name, IQ source ("rtlsdr:<index|serial>" or a recording), centre frequency (Hz)
+Device = namedtuple("Device", "name source center_freq")
+
+DEVICES = [
+    Device("915", "rtlsdr:0", 915e6),       # 900 MHz ISM (control links)
+    Device("868", "rtlsdr:1", 868e6),       # EU 868 MHz
+    Device("433", "rtlsdr:2", 433.92e6),    # 433 MHz telemetry
+]
+
+
+def parse_device(index, spec):
+    # "rtlsdr:1@868" -> Device("868", "rtlsdr:1", 868e6); recordings keep their own tuning
+    source, _, mhz = spec.partition("@")
+    center = float(mhz) * 1e6 if mhz else None
+    return Device(mhz or f"dev{index}", source, center)
+
+
+# ===== Worker =====
+
+def run_device(device, out, stop, spectrum_bus=SPECTRUM_BUS):
+    # Child process: the parent handles Ctrl-C and tells us to stop via `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    name = device.name
+    try:
+        sdr = open_source(device.source, device.center_freq or 915e6, SAMPLE_RATE, GAIN)
+    except Exception as e:
+        out.put(("error", name, f"{type(e).__name__}: {e}"))
+        out.put(("done", name, time.time(), []))
+        return
+
+    ring, capture = start_capture(sdr)
+    engine = SpectralEngine(FFT_SIZE, FFT_OVERLAP, FFT_AVERAGES, sample_rate=sdr.sample_rate)
+    freq_axis = engine.freq_axis(sdr.center_freq)
+    detector = CfarDetector("ca", CFAR_GUARD, CFAR_TRAIN, CFAR_PFA, looks=engine.effective_averages())
+    tracker = Tracker(uid_prefix=f"rf-{name}")
+    bus = SpectrumBusWriter(freq_axis, name=f"{BUS_NAME}_{name}") if spectrum_bus else None
+
+    blocks = 0
+    block_time = time.time()
+    started = health_time = time.monotonic()
+
+    def health():
+        elapsed = time.monotonic() - started
+        ring_stats = ring.stats()
+        return {
+            "source": device.source,
+            "center_mhz": round(sdr.center_freq / 1e6, 3),
+            "blocks": blocks,
+            "blocks_per_s": round(blocks / elapsed, 2) if elapsed > 0 else None,
+            "overruns": ring_stats["overruns"],
+            "dropped_blocks": ring_stats["dropped_blocks"],
+            "active_tracks": len(tracker.active_tracks()),
+            "tracks_created": tracker.next_id - 1,
+            "last_block_time": float(block_time),
+        }
+
+    try:
+        while not stop.is_set():
+            block = ring.read(timeout=1.0)
+            if block is None:
+                if capture.is_alive():
+                    continue
+                break
+            _, block_time, samples = block
+            rows = engine.stft(samples)
+            if DC_NOTCH:
+                notch_dc(rows)
+            if bus is not None:
+                bus.publish(rows, block_time)
+            events = tracker.update(peaks_from_rows(rows, detector, freq_axis), block_time)
+            blocks += 1
+            # One message per block, events or not: it is this device's watermark
+            out.put(("block", name, block_time, events))
+            if time.monotonic() - health_time >= HEALTH_INTERVAL_S:
+                health_time = time.monotonic()
+                out.put(("health", name, health()))
+    except Exception as e:
+        out.put(("error", name, f"{type(e).__name__}: {e}"))
+    finally:
+        end_time = time.time()
+        events = tracker.flush(end_time)
+        capture.stop()
+        sdr.close()
+        if bus is not None:
+            bus.close()
+        out.put(("health", name, health()))
+        out.put(("done", name, end_time, events))
+
+
+# ===== Merge =====
+
+class EventMerger:
+    # Time-orders items from several per-device streams, each already in order
+
+    def __init__(self, devices, max_delay_s=MAX_DELAY_S):
+        self.max_delay_s = max_delay_s
+        self.watermark = {d: None for d in devices}   # latest timestamp reported per device
+        self.arrived = {d: time.monotonic() for d in devices}
+        self._heap = []
+        self._count = 0
+
+        # Stats
+        self.released = 0
+        self.late = 0               # released behind an item already out (after a stall)
+        self._last_out = None
+
+    def push(self, device, timestamp, items=()):
+        if self.watermark.get(device) is None or timestamp > self.watermark[device]:
+            self.watermark[device] = timestamp
+        self.arrived[device] = time.monotonic()
+        for item in items:
+            heapq.heappush(self._heap, (timestamp, self._count, device, item))
+            self._count += 1
+
+    def finish(self, device):
+        # The device's stream has ended; it no longer holds anything back
+        self.watermark.pop(device, None)
+        self.arrived.pop(device, None)
+
+    def pop_ready(self, flush=False):
+        # [(timestamp, device, item)] that no live device can still precede
+        now = time.monotonic()
+        live = [ts for d, ts in self.watermark.items() if now - self.arrived[d] < self.max_delay_s]
+        if flush or not live:
+            limit = float("inf")
+        elif None in live:
+            return []               # a live device hasn't reported yet
+        else:
+            limit = min(live)
+        ready = []
+        while self._heap and self._heap[0][0] <= limit:
+            ts, _, device, item = heapq.heappop(self._heap)
+            if self._last_out is not None and ts < self._last_out:
+                self.late += 1
+            self._last_out = ts
+            ready.append((ts, device, item))
+        self.released += len(ready)
+        return ready
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class MultiScanner:
+
+    def __init__(self, devices=DEVICES, max_delay_s=MAX_DELAY_S, spectrum_bus=SPECTRUM_BUS):
+        self.devices = list(devices)
+        names = [d.name for d in self.devices]
+        if len(set(names)) != len(names):
+            raise ValueError("device names must be unique")
+        self.spectrum_bus = spectrum_bus
+        self.merger = EventMerger(names, max_delay_s)
+        self._queue = mp.Queue()
+        self._stop = mp.Event()
+        self._procs = {}
+        self._done = set()
+        self.health = {name: {} for name in names}
+        self.errors = {}
+
+    def start(self):
+        for device in self.devices:
+            p = mp.Process(target=run_device, args=(device, self._queue, self._stop, self.spectrum_bus),
+                           name=f"rf-{device.name}", daemon=True)
+            p.start()
+            self._procs[device.name] = p
+        return self
+
+    @property
+    def running(self):
+        return len(self._done) < len(self._procs) or len(self.merger) > 0
+
+    def _handle(self, msg):
+        kind, name = msg[0], msg[1]
+        if kind == "block":
+            self.merger.push(name, msg[2], msg[3])
+        elif kind == "health":
+            self.health[name] = msg[2]
+        elif kind == "error":
+            self.errors[name] = msg[2]
+            print(f"❌ {name}: {msg[2]}")
+        elif kind == "done":
+            self.merger.push(name, msg[2], msg[3])
+            self.merger.finish(name)
+            self._done.add(name)
+
+    def poll(self, timeout=0.1):
+        # Handles worker messages for up to `timeout`, then returns the merged
+        # events now safe to release: [(timestamp, device, event, track)]
+        try:
+            self._handle(self._queue.get(timeout=timeout))
+            while True:
+                self._handle(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        for name, p in self._procs.items():
+            if name not in self._done and not p.is_alive():
+                # Died without saying goodbye (killed, segfault in the driver)
+                self.errors.setdefault(name, f"worker exited ({p.exitcode})")
+                self.merger.finish(name)
+                self._done.add(name)
+        return [(ts, device, event, track) for ts, device, (event, track) in self.merger.pop_ready()]
+
+    def stop(self, timeout=5.0):
+        # Stops the workers; returns every event still pending (their final
+        # track "end"s included), in time order
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        pending = []
+        while len(self._done) < len(self._procs) and time.monotonic() < deadline:
+            pending.extend(self.poll(0.1))
+        for p in self._procs.values():
+            p.join(max(0.0, deadline - time.monotonic()))
+            if p.is_alive():
+                p.terminate()
+        pending.extend((ts, device, event, track)
+                       for ts, device, (event, track) in self.merger.pop_ready(flush=True))
+        return pending
+
+    def stats(self):
+        now = time.time()
+        devices = {}
+        for name, p in self._procs.items():
+            h = dict(self.health[name])
+            last = h.get("last_block_time")
+            h["alive"] = p.is_alive()
+            h["lag_s"] = round(now - last, 2) if last else None
+            if name in self.errors:
+                h["error"] = self.errors[name]
+            devices[name] = h
+        return {
+            "devices": devices,
+            "merge": {"pending": len(self.merger), "released": self.merger.released, "late": self.merger.late},
+        }
+
+
+def print_event(ts, device, event, track):
+    if event == "end":
+        print(f"✅ [{device}] Track ended: {track.summary()}")
+    else:
+        print(f"🚨 [{device}] Track {event}: {track.uid} {track.center_mhz:.3f} MHz "
+              f"({track.bandwidth_khz:.0f} kHz, {track.peak_db:.1f} dB, SNR {track.snr_db:.1f} dB)")
+
+
+if __name__ == "__main__":
+    devices = [parse_device(i, spec) for i, spec in enumerate(sys.argv[1:])] or DEVICES
+    store = DetectionStore().start()
+    scanner = MultiScanner(devices).start()
+    print(f"🎯 Scanning with {len(devices)} devices: {', '.join(d.name for d in devices)}")
+    health_time = time.monotonic()
+    try:
+        while scanner.running:
+            for ts, device, event, track in scanner.poll(0.5):
+                print_event(ts, device, event, track)
+                store.add_track(event, track, ts)
+            if time.monotonic() - health_time >= HEALTH_INTERVAL_S:
+                health_time = time.monotonic()
+                for name, h in scanner.stats()["devices"].items():
+                    print(f"📊 [{name}] {h}")
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping multi-device scan...")
+    finally:
+        for ts, device, event, track in scanner.stop():
+            print_event(ts, device, event, track)
+            store.add_track(event, track, ts)
+        store.close()
+        print(f"📊 Detection log: {store.stats()}")
+        print(f"📊 Scanner: {scanner.stats()}")
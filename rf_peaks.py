@@ -0,0 +1,90 @@
+# rf_peaks.py
+#
+# Turns a detection mask into a list of emitters instead of just spikes[0].
+# Contiguous above-threshold runs are found with a run-length pass over the
+# mask (runs separated by <= merge_gap bins are joined, so a wide signal with
+# a dip is still one emitter), and every per-region quantity comes from
+# cumulative sums / reduceat, never a Python loop over bins.
+
+import numpy as np
+
+PEAK_DTYPE = np.dtype([
+    ("center_mhz", np.float64),     # power-weighted centroid
+    ("bandwidth_khz", np.float32),  # occupied width of the region
+    ("peak_db", np.float32),        # strongest bin
+    ("power_db", np.float32),       # integrated power over the region
+    ("snr_db", np.float32),         # peak over the noise floor at the peak bin
+    ("peak_mhz", np.float64),
+    ("start_bin", np.int32),
+    ("stop_bin", np.int32),         # exclusive
+])
+
+MERGE_GAP = 1    # join regions separated by at most this many bins
+MIN_BINS = 1     # drop regions narrower than this
+
+
+def find_regions(mask, merge_gap=MERGE_GAP, min_bins=MIN_BINS):
+    # (starts, stops) of contiguous True runs, stops exclusive
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    if len(starts) > 1 and merge_gap > 0:
+        keep = (starts[1:] - stops[:-1]) > merge_gap
+        starts = starts[np.concatenate(([True], keep))]
+        stops = stops[np.concatenate((keep, [True]))]
+    if min_bins > 1:
+        wide = (stops - starts) >= min_bins
+        starts, stops = starts[wide], stops[wide]
+    return starts, stops
+
+
+def extract_peaks(spectrum_db, mask, freq_axis, noise_db=None, merge_gap=MERGE_GAP, min_bins=MIN_BINS):
+    # spectrum_db / mask / noise_db: 1-D per-bin arrays; freq_axis in MHz.
+    # Returns a PEAK_DTYPE structured array, one entry per region, in
+    # frequency order.
+    spectrum_db = np.asarray(spectrum_db, dtype=np.float32)
+    mask = np.asarray(mask, dtype=bool)
+    starts, stops = find_regions(mask, merge_gap, min_bins)
+    peaks = np.zeros(len(starts), dtype=PEAK_DTYPE)
+    if len(starts) == 0:
+        return peaks
+
+    freq_axis = np.asarray(freq_axis, dtype=np.float64)
+    bin_khz = abs(freq_axis[1] - freq_axis[0]) * 1e3 if len(freq_axis) > 1 else 0.0
+    power = np.power(10.0, spectrum_db / 10.0, dtype=np.float64)
+    c_pow = np.concatenate(([0.0], np.cumsum(power)))
+    c_fpow = np.concatenate(([0.0], np.cumsum(power * freq_axis)))
+    region_pow = c_pow[stops] - c_pow[starts]
+
+    # Peak per region; merged gap bins are masked out so they can't win, and
+    # reduceat running on to the next start only adds more -inf bins
+    vals = np.where(mask, spectrum_db, -np.inf)
+    peak_db = np.maximum.reduceat(vals, starts)
+    idx = np.arange(len(mask))
+    region_id = np.searchsorted(starts, idx, side='right') - 1
+    rid = np.clip(region_id, 0, None)
+    inside = (region_id >= 0) & (idx < stops[rid])
+    peak_idx = np.flatnonzero(inside & (vals == peak_db[rid]))
+    _, first = np.unique(region_id[peak_idx], return_index=True)
+    peak_bin = peak_idx[first]
+
+    peaks["center_mhz"] = (c_fpow[stops] - c_fpow[starts]) / region_pow
+    peaks["bandwidth_khz"] = (stops - starts) * bin_khz
+    peaks["peak_db"] = peak_db
+    peaks["power_db"] = 10 * np.log10(region_pow + 1e-20)
+    peaks["peak_mhz"] = freq_axis[peak_bin]
+    peaks["start_bin"] = starts
+    peaks["stop_bin"] = stops
+    if noise_db is not None:
+        peaks["snr_db"] = peak_db - np.asarray(noise_db)[peak_bin]
+    return peaks
+
+
+def peaks_from_rows(rows_db, detector, freq_axis, merge_gap=MERGE_GAP, min_bins=MIN_BINS):
+    # Run a CfarDetector over a (rows, bins) block and extract peaks from the
+    # peak-hold spectrum, so a burst in any row of the block is reported
+    rows_db = np.atleast_2d(rows_db)
+    mask = detector.detect(rows_db).any(axis=0)
+    spectrum = rows_db.max(axis=0)
+    noise = detector.noise_db.mean(axis=0)
+    return extract_peaks(spectrum, mask, freq_axis, noise, merge_gap, min_bins)
@@ -1,95 +1,159 @@
 import os
+import sys
 import time
-import csv
-import numpy as np
-import matplotlib.pyplot as plt
-from rtlsdr import RtlSdr
-import cot_broadcaster  # Import our new CoT broadcaster
-
-# Initialize SDR
-sdr = RtlSdr()
-sdr.sample_rate = 2.4e6  # Hz
-sdr.center_freq = 915e6  # Hz (adjust if needed)
-sdr.gain = 'auto'
+from rf_capture import start_capture
+from rf_iq_source import open_source
+from rf_spectrum import SpectralEngine, notch_dc
+from rf_waterfall import WaterfallRing, WaterfallRenderer
+from waterfall_stream import WaterfallPublisher, VIEWER_PORT
+from spectrum_bus import SpectrumBusWriter
+from spectrum_archive import SpectrumArchiveWriter
+from rf_snapshot import SnapshotRenderer
+from rf_cfar import CfarDetector
+from rf_peaks import peaks_from_rows
+from rf_tracker import Tracker
+from cot_broadcaster_v3 import CotBroadcaster, TrackCotPublisher
+from cot_sender import CotTcpSender
+from detection_store import DetectionStore
+
+# Initialize SDR (or replay a recording: python3 rf_scanner_ATAK.py scan.sigmf-meta)
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+iq_source = args[0] if args else "rtlsdr"
+sdr = open_source(iq_source, center_freq=915e6, sample_rate=2.4e6, gain='auto')
+
+# Capture thread keeps the dongle streaming while we plot/broadcast
+ring, capture = start_capture(sdr)
+dropped_reported = 0
+
+# Headless (--headless, or no DISPLAY): no matplotlib, watch with rf_viewer.py
+HEADLESS = "--headless" in sys.argv or not os.environ.get("DISPLAY")
+VIEWER_HOST = "127.0.0.1"
 
 # Set your static location for now
 STATIC_LAT = 38.9072
 STATIC_LON = -77.0369
 
+# CoT out: UDP broadcast, or a reliable TCP stream to the TAK server
+# (spooled to disk while the server is unreachable)
+COT_TCP = False
+broadcaster = (CotTcpSender() if COT_TCP else CotBroadcaster()).start()
+# One ATAK marker per track, re-sent only on change or before it goes stale
+cot = TrackCotPublisher(broadcaster, STATIC_LAT, STATIC_LON)
+
 # Create output folders if they don't exist
 os.makedirs('detections', exist_ok=True)
 
+# Spectral engine (Welch-averaged STFT rows) and frequency axis
+engine = SpectralEngine(fft_size=1024, overlap=0.5, averages=64, sample_rate=sdr.sample_rate)
+freq_axis = engine.freq_axis(sdr.center_freq)  # MHz
+# Patch the dongle's LO-leakage spike at the centre, or it is a permanent track
+DC_NOTCH = True
+
 # Waterfall buffer
 waterfall_depth = 100
-waterfall = []
+waterfall = WaterfallRing(waterfall_depth, engine.fft_size)
+
+if HEADLESS:
+    renderer = None
+else:
+    import matplotlib.pyplot as plt
+    plt.ion()
+    fig, ax = plt.subplots()
+    renderer = WaterfallRenderer(ax, waterfall, freq_axis, title='📡 Tactical RF Waterfall (ATAK Broadcast)', xlim=(900, 930))
+
+# Live rows to the dashboard's /waterfall page (quantized, zlib, ~1 KB per row),
+# mirrored to rf_viewer.py
+waterfall_stream = WaterfallPublisher(freq_axis, also_to=[(VIEWER_HOST, VIEWER_PORT)])
+
+# Full-rate rows in shared memory for other processes (rf_viewer.py --bus, recorders)
+SPECTRUM_BUS = True
+bus = SpectrumBusWriter(freq_axis) if SPECTRUM_BUS else None
+
+# Spectrum history on disk, memory-mapped by time; peak-held and size/age capped (spectrum_archive.py)
+ARCHIVE = True
+archive = SpectrumArchiveWriter(freq_axis) if ARCHIVE else None
 
-plt.ion()
-fig, ax = plt.subplots()
+# Adaptive CFAR spike detection (replaces the fixed -40 dB threshold)
+detector = CfarDetector("ca", guard=4, train=64, pfa=1e-6, looks=engine.effective_averages())
 
-# Frequency axis setup
-freq_axis = np.linspace(sdr.center_freq - sdr.sample_rate/2,
-                        sdr.center_freq + sdr.sample_rate/2,
-                        1024) / 1e6  # MHz
+# Coalesce per-frame peaks into emitter tracks
+tracker = Tracker()
 
-# Threshold for spike detection
-threshold_dB = -40
+# Snapshot PNGs rendered from the waterfall array on a small worker pool
+snapshots = SnapshotRenderer()
 
-# Set up CSV logging
-csv_filename = "detections/detections_log.csv"
-if not os.path.exists(csv_filename):
-    with open(csv_filename, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Timestamp", "Frequency_MHz", "Power_dB"])
+# Detection log (SQLite, batched writes from a background thread)
+store = DetectionStore("detections/detections.db").start()
 
-print("🎯 Starting tactical RF ATAK broadcast scan...")
-frame_ready = False  # New flag to track if plot is drawn at least once
+print(f"🎯 Starting tactical RF ATAK broadcast scan{' (headless)' if HEADLESS else ''}...")
 
 try:
     while True:
-        samples = sdr.read_samples(256*1024)
-        power_spectrum = 20 * np.log10(np.abs(np.fft.fftshift(np.fft.fft(samples))))
-        downsampled = power_spectrum[::int(len(power_spectrum)/1024)]
-
-        waterfall.append(downsampled)
-        if len(waterfall) > waterfall_depth:
-            waterfall.pop(0)
-
-        ax.clear()
-        ax.imshow(waterfall, aspect='auto', extent=[freq_axis[0], freq_axis[-1], 0, waterfall_depth],
-                  origin='lower', cmap='viridis')
-        ax.set_title('📡 Tactical RF Waterfall (ATAK Broadcast)')
-        ax.set_xlabel('Frequency (MHz)')
-        ax.set_ylabel('Time (scrolling up)')
-        ax.set_xlim(900, 930)
-        ax.set_ylim(0, waterfall_depth)
-        plt.pause(0.05)
-
-        frame_ready = True
-
-        # Detect strong spikes and act
-        if frame_ready:
-            spikes_idx = np.where(downsampled > threshold_dB)[0]
-            if len(spikes_idx) > 0:
-                timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
-                dominant_freq = freq_axis[spikes_idx[0]]
-
-                # Send CoT packet to ATAK
-                cot_broadcaster.send_event(STATIC_LAT, STATIC_LON, dominant_freq, downsampled[spikes_idx[0]])
-                print(f"🚀 CoT Packet Sent: {dominant_freq:.2f} MHz, {downsampled[spikes_idx[0]]:.2f} dBm")
-
-                # Save snapshot
-                snapshot_filename = f"detections/event_{timestamp}.png"
-                fig.savefig(snapshot_filename)
-                print(f"🚨 Snapshot saved: {snapshot_filename}")
-
-                # Log to CSV
-                with open(csv_filename, mode='a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([timestamp, f"{dominant_freq:.3f}", f"{downsampled[spikes_idx[0]]:.2f}"])
+        block = ring.read(timeout=5.0)
+        if block is None:
+            print("⏹️ Capture ended")
+            break
+        _, block_time, samples = block
+        if ring.dropped_blocks != dropped_reported:
+            dropped_reported = ring.dropped_blocks
+            print(f"⚠️ Capture overrun: {ring.overruns} overruns, {dropped_reported} blocks dropped")
+
+        rows = engine.stft(samples)
+        if DC_NOTCH:
+            notch_dc(rows)
+        waterfall.push_rows(rows)
+        waterfall_stream.push(rows, block_time)
+        if bus is not None:
+            bus.publish(rows, block_time)
+        if archive is not None:
+            archive.append(rows, block_time)
+        if renderer is not None:
+            renderer.update()
+
+        # Detect every emitter in the block, act on track changes only
+        peaks = peaks_from_rows(rows, detector, freq_axis)
+        events = tracker.update(peaks, block_time)
+        for track in cot.publish(tracker.active_tracks(), block_time):
+            print(f"🚀 CoT Packet Queued ({track.uid}): {track.center_mhz:.2f} MHz, "
+                  f"{track.peak_db:.2f} dBm, {track.bandwidth_khz:.0f} kHz, SNR {track.snr_db:.1f} dB")
+        if events:
+            timestamp = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime(block_time))
+
+            for event, track in events:
+                store.add_track(event, track, block_time)
+                if event == "end":
+                    print(f"✅ Track ended: {track.summary()}")
+                    continue
+
+                # Save snapshot when a new emitter shows up
+                if event == "start":
+                    snapshot_filename = f"detections/event_{timestamp}_{track.uid}.png"
+                    peak = track.last_peak
+                    snapshots.submit(waterfall.view(), snapshot_filename,
+                                     range(peak["start_bin"], peak["stop_bin"]))
+                    print(f"🚨 Snapshot queued: {snapshot_filename}")
 
 except KeyboardInterrupt:
     print("\n🛑 Stopping tactical ATAK scan...")
 finally:
+    end_time = time.time()
+    for event, track in tracker.flush(end_time):
+        store.add_track(event, track, end_time)
+        print(f"✅ Track ended: {track.summary()}")
+    broadcaster.close()
+    store.close()
+    print(f"📊 Detection log: {store.stats()}")
+    snapshots.close()
+    print(f"📊 Snapshots: {snapshots.stats()}")
+    print(f"📊 CoT: {cot.stats()} {broadcaster.stats()}")
+    waterfall_stream.close()
+    if bus is not None:
+        bus.close()
+    if archive is not None:
+        archive.close()
+        print(f"📊 Archive: {archive.stats()}")
+    capture.stop()
     sdr.close()
-    plt.close()
+    if renderer is not None:
+        plt.close()
 
@@ -0,0 +1,169 @@
+# rf_snapshot.py
+#
+# Detection snapshots straight from the waterfall array, no matplotlib:
+# the rows are scaled to 0..255, colour-mapped through a precomputed
+# 256-entry viridis LUT (one fancy-indexing op) and encoded as a PNG with
+# zlib + struct. Replaces save_snapshot(), which deep-copied the live figure
+# and started an unbounded thread per detection.
+#
+# SnapshotRenderer.submit() copies the array and returns immediately; a
+# fixed pool of worker threads renders from a bounded queue. When a burst
+# fills the queue the oldest pending snapshot is dropped (the newest view of
+# the emitter is the useful one). stats() reports rendered vs dropped.
+
+import os
+import time
+import zlib
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+
+from rf_waterfall import DB_MIN, DB_MAX
+
+# ===== Settings =====
+WORKERS = 2
+QUEUE_SIZE = 8              # pending snapshots before the oldest is dropped
+ROW_SCALE = 3               # output pixels per waterfall row (100 rows -> 300 px)
+PNG_LEVEL = 1               # zlib level (noise barely compresses; 1 is ~3x faster than 6)
+
+# viridis sampled every 1/16 (RGB), interpolated to 256 entries
+_VIRIDIS_ANCHORS = [
+    (68, 1, 84), (72, 24, 106), (71, 45, 123), (66, 64, 134), (59, 82, 139), (51, 99, 141),
+    (44, 114, 142), (38, 130, 142), (33, 145, 140), (31, 160, 136), (40, 174, 128), (63, 188, 115),
+    (94, 201, 98), (132, 212, 75), (173, 220, 48), (216, 226, 25), (253, 231, 37),
+]
+
+
+def make_lut(anchors=_VIRIDIS_ANCHORS, size=256):
+    anchors = np.asarray(anchors, dtype=np.float64)
+    x = np.linspace(0, len(anchors) - 1, size)
+    lut = np.stack([np.interp(x, np.arange(len(anchors)), anchors[:, c]) for c in range(3)], axis=1)
+    return np.round(lut).astype(np.uint8)
+
+
+VIRIDIS = make_lut()
+
+
+def colorize(rows, db_min=DB_MIN, db_max=DB_MAX, lut=VIRIDIS):
+    # (rows, bins) dB (or uint8 already quantized) -> (rows, bins, 3) uint8
+    rows = np.asarray(rows)
+    if rows.dtype != np.uint8:
+        q = (rows.astype(np.float32) - db_min) * (255.0 / (db_max - db_min))
+        rows = np.clip(q, 0, 255, out=q).astype(np.uint8)
+    return lut[rows]
+
+
+def _chunk(kind, data):
+    return (struct.pack(">I", len(data)) + kind + data +
+            struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+
+def encode_png(rgb, level=PNG_LEVEL):
+    # (height, width, 3) uint8 -> PNG bytes (8-bit RGB). Every scanline uses
+    # the "Up" filter: waterfall rows change little from one to the next (and
+    # repeated rows become all zeros), which is what zlib compresses best.
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8).reshape(rgb.shape[0], -1)
+    height, width = rgb.shape[0], rgb.shape[1] // 3
+    raw = np.empty((height, 1 + 3 * width), dtype=np.uint8)
+    raw[:, 0] = 2
+    raw[0, 1:] = rgb[0]
+    np.subtract(rgb[1:], rgb[:-1], out=raw[1:, 1:])
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", ihdr) +
+            _chunk(b"IDAT", zlib.compress(raw.tobytes(), level)) + _chunk(b"IEND", b""))
+
+
+def render_png(rows, db_min=DB_MIN, db_max=DB_MAX, row_scale=ROW_SCALE, mark_bins=None, level=PNG_LEVEL):
+    # Oldest row first in `rows` (WaterfallRing.view()); newest ends up on
+    # top like the live plot. mark_bins: columns to tick along the top edge.
+    rgb = colorize(rows[::-1], db_min, db_max)
+    if row_scale > 1:
+        rgb = np.repeat(rgb, row_scale, axis=0)
+    if mark_bins is not None and len(mark_bins):
+        rgb[:max(4, 2 * row_scale), np.asarray(mark_bins)] = 255
+    return encode_png(rgb, level)
+
+
+class SnapshotRenderer:
+
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, db_min=DB_MIN, db_max=DB_MAX,
+                 row_scale=ROW_SCALE, on_saved=None):
+        self.db_min = db_min
+        self.db_max = db_max
+        self.row_scale = row_scale
+        self.queue_size = queue_size
+        self.on_saved = on_saved          # callback(path) after each write, e.g. upload
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._threads = [threading.Thread(target=self._run, name=f"snapshot-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+        # Stats
+        self.submitted = 0
+        self.rendered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.render_time_s = 0.0
+
+    def submit(self, rows, path, mark_bins=None):
+        # Copies `rows` (the live ring view changes under us) and returns at once
+        job = (np.array(rows, copy=True), path, mark_bins)
+        with self._cond:
+            self.submitted += 1
+            if len(self._queue) >= self.queue_size:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(job)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stop:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                rows, path, mark_bins = self._queue.popleft()
+            t0 = time.perf_counter()
+            try:
+                png = render_png(rows, self.db_min, self.db_max, self.row_scale, mark_bins)
+                tmp = path + ".tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(png)
+                os.replace(tmp, path)
+                ok = True
+            except Exception as e:
+                ok = False
+                print(f"❌ Error saving snapshot {os.path.basename(path)}: {e}")
+            with self._cond:
+                self.render_time_s += time.perf_counter() - t0
+                if ok:
+                    self.rendered += 1
+                else:
+                    self.failed += 1
+            if ok and self.on_saved is not None:
+                self.on_saved(path)
+
+    def close(self, timeout=5.0):
+        # Finishes what is queued, then stops the workers
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    def stats(self):
+        done = self.rendered + self.failed
+        return {
+            "submitted": self.submitted,
+            "rendered": self.rendered,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": len(self._queue),
+            "avg_render_ms": round(1e3 * self.render_time_s / done, 2) if done else None,
+        }
@@ -0,0 +1,143 @@
+# rf_spectrum.py
+#
+# Welch / STFT spectral engine. Instead of one huge 262,144-point FFT that is
+# then strided down to 1024 bins, the block is cut into overlapping windowed
+# FFT_SIZE segments, transformed in one batched call (scipy.fft with worker
+# threads when available, its plan cache is reused between calls) and the
+# segment powers are averaged into one PSD or several waterfall rows.
+
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import scipy.fft as _fft
+    HAVE_SCIPY_FFT = True
+except ImportError:
+    _fft = np.fft
+    HAVE_SCIPY_FFT = False
+
+# ===== Settings =====
+FFT_SIZE = 1024
+OVERLAP = 0.5        # fraction of FFT_SIZE shared between neighbouring segments
+AVERAGES = 64        # segments averaged into each STFT row
+WINDOW = "hann"
+DC_NOTCH_BINS = 1    # bins patched each side of the centre (the window's main lobe)
+
+
+def make_window(name, size):
+    if name in ("hann", "hanning"):
+        return np.hanning(size)
+    if name == "hamming":
+        return np.hamming(size)
+    if name == "blackman":
+        return np.blackman(size)
+    if name in ("rect", "boxcar", None):
+        return np.ones(size)
+    raise ValueError(f"Unknown window: {name}")
+
+
+def notch_dc(rows_db, half_width=DC_NOTCH_BINS):
+    # Patch the RTL-SDR DC / LO-leakage spike in the centre of fftshifted rows
+    # (in place), interpolating between the bins on either side. Without it
+    # the spike at the tuned frequency passes CFAR every block.
+    c = rows_db.shape[-1] // 2
+    lo, hi = c - half_width - 1, c + half_width + 1
+    t = np.arange(1, hi - lo, dtype=np.float32) / (hi - lo)
+    left, right = rows_db[..., lo, np.newaxis], rows_db[..., hi, np.newaxis]
+    rows_db[..., lo + 1:hi] = left + (right - left) * t
+    return rows_db
+
+
+class SpectralEngine:
+
+    def __init__(self, fft_size=FFT_SIZE, overlap=OVERLAP, averages=AVERAGES,
+                 window=WINDOW, sample_rate=2.4e6, workers=None):
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap must be in [0, 1)")
+        if averages < 1:
+            raise ValueError("averages must be >= 1")
+        self.fft_size = fft_size
+        self.overlap = overlap
+        self.step = max(1, int(round(fft_size * (1 - overlap))))
+        self.averages = averages
+        self.sample_rate = sample_rate
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+        self.window = make_window(window, fft_size).astype(np.float32)
+        # Scale so a full-scale tone reads ~0 dBFS regardless of window/size
+        self._scale = np.float32(1.0 / (self.window.sum() ** 2))
+        self._work = None
+        self._power = None
+
+    def num_segments(self, num_samples):
+        if num_samples < self.fft_size:
+            return 0
+        return (num_samples - self.fft_size) // self.step + 1
+
+    def _buffers(self, n):
+        if self._work is None or self._work.shape[0] < n:
+            self._work = np.empty((n, self.fft_size), dtype=np.complex64)
+            self._power = np.empty((n, self.fft_size), dtype=np.float32)
+        return self._work[:n], self._power[:n]
+
+    def segment_power(self, samples, max_segments=None):
+        # Linear power of every windowed segment, shape (segments, fft_size),
+        # not yet fftshifted. The returned array is reused between calls.
+        n = self.num_segments(len(samples))
+        if max_segments is not None:
+            n = min(n, max_segments)
+        if n == 0:
+            raise ValueError(f"Need at least {self.fft_size} samples, got {len(samples)}")
+        segments = sliding_window_view(samples, self.fft_size)[::self.step][:n]
+        work, power = self._buffers(n)
+        np.multiply(segments, self.window, out=work)
+        if HAVE_SCIPY_FFT:
+            spec = _fft.fft(work, axis=1, workers=self.workers, overwrite_x=True)
+        else:
+            spec = _fft.fft(work, axis=1)
+        np.abs(spec, out=power)
+        np.square(power, out=power)
+        return power
+
+    def to_db(self, power):
+        # fftshift + scale linear power to dBFS (float32)
+        power = np.fft.fftshift(power, axes=-1)
+        return (10.0 * np.log10(power * self._scale + 1e-20)).astype(np.float32)
+
+    def average_rows(self, power):
+        # Average groups of `averages` segments into rows (still linear, unshifted).
+        # Blocks shorter than one full average still produce a single row.
+        rows = len(power) // self.averages
+        if rows == 0:
+            return power.mean(axis=0)[np.newaxis, :]
+        return power[:rows * self.averages].reshape(rows, self.averages, self.fft_size).mean(axis=1)
+
+    def welch(self, samples):
+        # One averaged PSD row (dBFS) over all segments in the block
+        return self.to_db(self.segment_power(samples).mean(axis=0))
+
+    def stft(self, samples):
+        # Waterfall rows (dBFS), each the average of `averages` segments
+        return self.to_db(self.average_rows(self.segment_power(samples)))
+
+    def effective_averages(self):
+        # Equivalent number of independent looks per row. Overlapping windows
+        # are correlated, so this is below `averages` (Welch 1967); CFAR
+        # thresholds use it to get the requested false-alarm rate.
+        w2 = self.window.astype(np.float64) ** 2
+        corr = 0.0
+        for j in range(1, self.averages):
+            shift = j * self.step
+            if shift >= self.fft_size:
+                break
+            rho = np.dot(self.window[:-shift], self.window[shift:]) / w2.sum()
+            corr += (1 - j / self.averages) * rho ** 2
+        return self.averages / (1 + 2 * corr)
+
+    def rows_per_block(self, num_samples):
+        return max(1, self.num_segments(num_samples) // self.averages)
+
+    def freq_axis(self, center_freq):
+        # Bin centres in MHz, matching the fftshifted output
+        return (center_freq + np.fft.fftshift(np.fft.fftfreq(self.fft_size, 1.0 / self.sample_rate))) / 1e6
@@ -0,0 +1,185 @@
+# rf_sweep.py
+#
+# Wideband sweep mode (like rtl_power, but in-process). The dongle only sees
+# ~2.4 MHz at a time, so the band plan is tiled into retune steps. After each
+# retune the first SETTLE_SAMPLES are thrown away (PLL settling + stale USB
+# buffers), the rest is turned into a Welch PSD, cropped to the flat middle
+# of the passband and written into a preallocated panorama row.
+#
+# 2.4 GHz and 5.8 GHz are above the R820T's range: those bands need an
+# lo_offset for a block downconverter (tuned freq = RF freq - lo_offset).
+# Bands that still land outside TUNER_RANGE are skipped (with a warning), so
+# out of the box only 900 MHz is swept. Retune + settling latency, not the
+# IQ itself, sets the sweep rate; stats() reports the measured rate.
+#
+#   python3 rf_sweep.py                      # live dongle, default band plan
+#   python3 rf_sweep.py scan.sigmf-meta      # replay (every step sees the same IQ)
+
+import sys
+import time
+import numpy as np
+
+from rf_iq_source import open_source
+from rf_spectrum import SpectralEngine, notch_dc
+
+# ===== Settings =====
+SAMPLE_RATE = 2.4e6
+GAIN = 'auto'
+FFT_SIZE = 256
+USABLE_FRACTION = 0.8     # keep the middle 80% of each step (edges roll off)
+SETTLE_SAMPLES = 2048     # discarded after every retune
+DWELL_SAMPLES = 4096      # averaged per step (31 segments at FFT_SIZE=256)
+TUNER_RANGE = (24e6, 1766e6)   # R820T / R828D tuning range (Hz)
+DC_NOTCH = True           # patch the RTL-SDR DC spike in the centre bin
+
+# (name, start Hz, stop Hz, lo_offset Hz) - set lo_offset to the downconverter
+# LO for the bands above ~1.7 GHz
+BAND_PLAN = [
+    ("900 MHz ISM", 900e6, 930e6, 0),
+    ("2.4 GHz", 2400e6, 2483.5e6, 0),
+    ("5.8 GHz", 5725e6, 5875e6, 0),
+]
+
+
+class SweepPlan:
+    # Precomputes every retune step and where its cropped bins land in the
+    # panorama row, so a sweep is just retune/read/FFT/copy per step.
+
+    def __init__(self, bands=BAND_PLAN, sample_rate=SAMPLE_RATE, fft_size=FFT_SIZE,
+                 usable_fraction=USABLE_FRACTION, tuner_range=TUNER_RANGE):
+        lo_hz, hi_hz = tuner_range
+        # Bands the tuner can't reach (after the downconverter offset) are left out
+        self.skipped = [name for name, start, stop, lo in bands if start - lo < lo_hz or stop - lo > hi_hz]
+        self.bands = [band for band in bands if band[0] not in self.skipped]
+        if not self.bands:
+            raise ValueError(f"no band is inside the tuner range {lo_hz / 1e6:.0f}-{hi_hz / 1e6:.0f} MHz "
+                             f"(set lo_offset for a downconverter)")
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        keep = int(fft_size * usable_fraction) // 2 * 2
+        self.crop = slice((fft_size - keep) // 2, (fft_size - keep) // 2 + keep)
+        self.bins_per_step = keep
+        bin_hz = sample_rate / fft_size
+        step_hz = keep * bin_hz
+
+        self.steps = []          # (tuned centre Hz, panorama slice)
+        self.band_slices = []    # (name, panorama slice)
+        freqs = []
+        offset = 0
+        bin_offsets = (np.arange(fft_size) - fft_size // 2)[self.crop] * bin_hz
+        for name, start, stop, lo in self.bands:
+            n_steps = max(1, int(np.ceil((stop - start) / step_hz)))
+            band_start = offset
+            for k in range(n_steps):
+                centre = start + step_hz / 2 + k * step_hz
+                self.steps.append((centre - lo, slice(offset, offset + keep)))
+                freqs.append(centre + bin_offsets)
+                offset += keep
+            self.band_slices.append((name, slice(band_start, offset)))
+        self.num_bins = offset
+        self.freq_axis = np.concatenate(freqs) / 1e6   # MHz (RF, not tuned)
+
+    def __len__(self):
+        return len(self.steps)
+
+
+class Sweeper:
+
+    def __init__(self, source, plan=None, settle_samples=SETTLE_SAMPLES, dwell_samples=DWELL_SAMPLES,
+                 dc_notch=DC_NOTCH, workers=1):
+        self.source = source
+        self.plan = plan or SweepPlan(sample_rate=source.sample_rate)
+        self.settle_bytes = 2 * settle_samples
+        self.read_bytes = 2 * (settle_samples + dwell_samples)
+        self.engine = SpectralEngine(self.plan.fft_size, overlap=0.5, averages=1,
+                                     sample_rate=self.plan.sample_rate, workers=workers)
+        self.dc_notch = dc_notch
+        self.row = np.empty(self.plan.num_bins, dtype=np.float32)
+        self._iq = np.empty(dwell_samples, dtype=np.complex64)
+        self.sweeps = 0
+        self.retunes = 0
+        self.last_sweep_s = 0.0
+        self.sweep_time_s = 0.0
+        self.retune_time_s = 0.0
+
+    def _measure(self, centre_hz):
+        if self.source.center_freq != centre_hz:
+            t0 = time.perf_counter()
+            self.source.center_freq = centre_hz
+            self.retune_time_s += time.perf_counter() - t0
+            self.retunes += 1
+        # One USB read for settle + dwell, the settle part is just sliced off
+        raw = np.frombuffer(self.source.read_bytes(self.read_bytes), dtype=np.uint8)
+        dwell = raw[self.settle_bytes:]
+        n = len(dwell) // 2
+        iq = self._iq[:n].view(np.float32)
+        np.subtract(dwell[:2 * n], 127.5, out=iq, dtype=np.float32)
+        iq *= 1.0 / 127.5
+        return self.engine.welch(self._iq[:n])
+
+    def sweep(self):
+        # One full pass over the band plan. Returns the panorama row (dBFS);
+        # the array is reused, copy it if you keep it.
+        t0 = time.perf_counter()
+        crop = self.plan.crop
+        for centre_hz, dest in self.plan.steps:
+            psd = self._measure(centre_hz)
+            if self.dc_notch:
+                notch_dc(psd, half_width=0)
+            self.row[dest] = psd[crop]
+        self.sweeps += 1
+        self.last_sweep_s = time.perf_counter() - t0
+        self.sweep_time_s += self.last_sweep_s
+        return self.row
+
+    def run(self, callback, max_sweeps=None):
+        while max_sweeps is None or self.sweeps < max_sweeps:
+            callback(self.sweep(), time.time())
+
+    def stats(self):
+        return {
+            "steps": len(self.plan),
+            "bins": self.plan.num_bins,
+            "sweeps": self.sweeps,
+            "skipped_bands": self.plan.skipped,
+            "retunes": self.retunes,
+            "avg_retune_ms": round(1e3 * self.retune_time_s / self.retunes, 2) if self.retunes else None,
+            "last_sweep_s": round(self.last_sweep_s, 4),
+            # Measured over every sweep so far (retune + settle + dwell + DSP)
+            "sweeps_per_s": round(self.sweeps / self.sweep_time_s, 2) if self.sweep_time_s else None,
+        }
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from rf_waterfall import WaterfallRing, WaterfallRenderer
+
+    spec = sys.argv[1] if len(sys.argv) > 1 else "rtlsdr"
+    sdr = open_source(spec, BAND_PLAN[0][1], SAMPLE_RATE, GAIN, loop=True)
+    sweeper = Sweeper(sdr)
+    plan = sweeper.plan
+    for name in plan.skipped:
+        print(f"⚠️ Skipping {name}: outside the tuner range (set its lo_offset for a downconverter)")
+    print(f"🛰️ Sweeping {len(plan)} steps / {plan.num_bins} bins across {len(plan.bands)} bands")
+
+    waterfall = WaterfallRing(100, plan.num_bins)
+    plt.ion()
+    fig, ax = plt.subplots(figsize=(12, 5))
+    renderer = WaterfallRenderer(ax, waterfall, [0, plan.num_bins], title='📡 Wideband Sweep')
+    # Bands are not contiguous, so label the band boundaries instead of a linear MHz axis
+    ax.set_xticks([s.start for _, s in plan.band_slices])
+    ax.set_xticklabels([name for name, _ in plan.band_slices])
+    ax.set_xlabel('Band')
+    fig.canvas.draw()
+
+    try:
+        while True:
+            waterfall.push(sweeper.sweep())
+            renderer.update()
+            if sweeper.sweeps % 10 == 0:
+                print(f"🔁 {sweeper.stats()}")
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping sweep...")
+    finally:
+        sdr.close()
+        plt.close()
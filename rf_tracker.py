@@ -0,0 +1,200 @@
+# rf_tracker.py
+#
+# Coalesces per-frame peaks (rf_peaks.PEAK_DTYPE) into emitter tracks so the
+# expensive outputs (PNG, KML, upload, CoT, CSV) fire per emitter instead of
+# per frame. Peaks are associated to tracks by frequency (within a gate, or
+# inside the track's occupied bandwidth) and time (a track closes after
+# CLOSE_AFTER_S without a hit).
+#
+# Track lifecycle:  open -> active -> closed
+#   open    seen, but fewer than CONFIRM_HITS times (no output yet)
+#   active  confirmed; "start" event, then "update" events only on a
+#           significant change in frequency or power
+#   closed  no hit for CLOSE_AFTER_S; "end" event with a summary
+#
+# Tracker.update(peaks, timestamp) returns a list of (event, track) tuples.
+
+import time
+import numpy as np
+
+# ===== Settings =====
+FREQ_GATE_MHZ = 0.05       # max centre-frequency distance for association
+CONFIRM_HITS = 2           # hits before a track is reported
+CLOSE_AFTER_S = 3.0        # silence before a track is closed
+FREQ_CHANGE_MHZ = 0.1      # centre drift that triggers an update
+POWER_CHANGE_DB = 6.0      # power change that triggers an update
+SMOOTHING = 0.3            # EMA weight of new measurements
+UID_PREFIX = "rf-track"    # uids are <prefix>-00001 ... (one prefix per device when several run)
+
+OPEN, ACTIVE, CLOSED = "open", "active", "closed"
+
+
+class Track:
+
+    def __init__(self, track_id, peak, timestamp, uid_prefix=UID_PREFIX):
+        self.track_id = track_id
+        self.uid = f"{uid_prefix}-{track_id:05d}"
+        self.state = OPEN
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+        self.center_mhz = float(peak["center_mhz"])
+        self.bandwidth_khz = float(peak["bandwidth_khz"])
+        self.peak_db = float(peak["peak_db"])
+        self.snr_db = float(peak["snr_db"])
+        self.max_db = self.peak_db
+        self.min_mhz = self.max_mhz = self.center_mhz
+        self._power_sum = self.peak_db
+        self.last_peak = peak
+        # What was last reported downstream (start/update)
+        self.reported_mhz = None
+        self.reported_db = None
+        self.reported_at = None
+
+    def add(self, peak, timestamp, smoothing=SMOOTHING):
+        self.hits += 1
+        self.last_seen = timestamp
+        self.last_peak = peak
+        a = smoothing
+        self.center_mhz += a * (float(peak["center_mhz"]) - self.center_mhz)
+        self.bandwidth_khz += a * (float(peak["bandwidth_khz"]) - self.bandwidth_khz)
+        self.peak_db = float(peak["peak_db"])
+        self.snr_db = float(peak["snr_db"])
+        self.max_db = max(self.max_db, self.peak_db)
+        self.min_mhz = min(self.min_mhz, float(peak["center_mhz"]))
+        self.max_mhz = max(self.max_mhz, float(peak["center_mhz"]))
+        self._power_sum += self.peak_db
+
+    def mark_reported(self, timestamp):
+        self.reported_mhz = self.center_mhz
+        self.reported_db = self.peak_db
+        self.reported_at = timestamp
+
+    @property
+    def duration_s(self):
+        return self.last_seen - self.first_seen
+
+    def summary(self):
+        return {
+            "uid": self.uid,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "duration_s": round(self.duration_s, 2),
+            "hits": self.hits,
+            "center_mhz": round(self.center_mhz, 4),
+            "min_mhz": round(self.min_mhz, 4),
+            "max_mhz": round(self.max_mhz, 4),
+            "bandwidth_khz": round(self.bandwidth_khz, 1),
+            "mean_db": round(self._power_sum / self.hits, 2),
+            "max_db": round(self.max_db, 2),
+        }
+
+    def __repr__(self):
+        return f"Track({self.uid}, {self.state}, {self.center_mhz:.3f} MHz, {self.peak_db:.1f} dB, hits={self.hits})"
+
+
+class Tracker:
+
+    def __init__(self, freq_gate_mhz=FREQ_GATE_MHZ, confirm_hits=CONFIRM_HITS, close_after_s=CLOSE_AFTER_S,
+                 freq_change_mhz=FREQ_CHANGE_MHZ, power_change_db=POWER_CHANGE_DB, smoothing=SMOOTHING,
+                 uid_prefix=UID_PREFIX):
+        self.freq_gate_mhz = freq_gate_mhz
+        self.confirm_hits = confirm_hits
+        self.close_after_s = close_after_s
+        self.freq_change_mhz = freq_change_mhz
+        self.power_change_db = power_change_db
+        self.smoothing = smoothing
+        self.uid_prefix = uid_prefix
+        self.tracks = []          # open + active
+        self.next_id = 1
+        self.peaks_in = 0
+        self.events_out = 0
+
+    def _associate(self, peaks):
+        # Greedy nearest-first assignment on a (peaks x tracks) distance matrix.
+        # A peak may match a track within the gate or within half the
+        # track's occupied bandwidth (wide emitters wander more).
+        if not self.tracks or len(peaks) == 0:
+            return {}
+        track_f = np.array([t.center_mhz for t in self.tracks])
+        track_bw = np.array([t.bandwidth_khz for t in self.tracks]) / 2e3
+        dist = np.abs(peaks["center_mhz"][:, None] - track_f[None, :])
+        gate = np.maximum(self.freq_gate_mhz, track_bw)[None, :]
+        dist = np.where(dist <= gate, dist, np.inf)
+        pairs = {}
+        used_tracks = set()
+        for flat in np.argsort(dist, axis=None):
+            p, t = np.unravel_index(flat, dist.shape)
+            if not np.isfinite(dist[p, t]):
+                break
+            if p in pairs or t in used_tracks:
+                continue
+            pairs[p] = t
+            used_tracks.add(t)
+        return pairs
+
+    def _changed(self, track):
+        return (abs(track.center_mhz - track.reported_mhz) > self.freq_change_mhz or
+                abs(track.peak_db - track.reported_db) > self.power_change_db)
+
+    def update(self, peaks, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        self.peaks_in += len(peaks)
+        events = []
+        pairs = self._associate(peaks)
+
+        for p, t in pairs.items():
+            track = self.tracks[t]
+            track.add(peaks[p], timestamp, self.smoothing)
+            if track.state == OPEN and track.hits >= self.confirm_hits:
+                track.state = ACTIVE
+                track.mark_reported(timestamp)
+                events.append(("start", track))
+            elif track.state == ACTIVE and self._changed(track):
+                track.mark_reported(timestamp)
+                events.append(("update", track))
+
+        for p in range(len(peaks)):
+            if p not in pairs:
+                track = Track(self.next_id, peaks[p], timestamp, self.uid_prefix)
+                self.next_id += 1
+                self.tracks.append(track)
+                if self.confirm_hits <= 1:
+                    track.state = ACTIVE
+                    track.mark_reported(timestamp)
+                    events.append(("start", track))
+
+        events.extend(self._expire(timestamp))
+        self.events_out += len(events)
+        return events
+
+    def _expire(self, timestamp, force=False):
+        events = []
+        alive = []
+        for track in self.tracks:
+            if force or timestamp - track.last_seen > self.close_after_s:
+                if track.state == ACTIVE:
+                    events.append(("end", track))
+                track.state = CLOSED
+            else:
+                alive.append(track)
+        self.tracks = alive
+        return events
+
+    def flush(self, timestamp=None):
+        # Close every track (e.g. on shutdown)
+        events = self._expire(time.time() if timestamp is None else timestamp, force=True)
+        self.events_out += len(events)
+        return events
+
+    def active_tracks(self):
+        return [t for t in self.tracks if t.state == ACTIVE]
+
+    def stats(self):
+        return {
+            "open": sum(t.state == OPEN for t in self.tracks),
+            "active": sum(t.state == ACTIVE for t in self.tracks),
+            "tracks_created": self.next_id - 1,
+            "peaks_in": self.peaks_in,
+            "events_out": self.events_out,
+        }
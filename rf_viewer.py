@@ -0,0 +1,134 @@
+# rf_viewer.py
+#
+# Stand-alone waterfall window for a scanner running headless. The scanner
+# mirrors its waterfall_stream frames (one quantized row per frame) to
+# VIEWER_PORT; this process decodes them and draws with the same blitting
+# WaterfallRenderer the scanners used in-process.
+#
+# Start and close it whenever you like: the scanner never waits for it. If
+# drawing falls behind, datagrams queue (and eventually drop) in this
+# process's socket buffer, so the detection rate no longer depends on how
+# fast matplotlib can paint. Run it on the Pi's desktop or on a laptop (set
+# VIEWER_HOST in the scanner to the laptop's address):
+#   python3 rf_viewer.py [port]
+#
+# On the scanner's own machine, --bus reads every row (not just the ~20/s
+# the stream carries) straight from the shared-memory spectrum bus instead:
+#   python3 rf_viewer.py --bus
+
+import sys
+import time
+import select
+import socket
+import numpy as np
+import matplotlib.pyplot as plt
+from rf_waterfall import WaterfallRing, WaterfallRenderer, DB_MIN, DB_MAX
+from waterfall_stream import VIEWER_PORT, FrameDecoder
+from spectrum_bus import SpectrumBusReader
+
+# ===== Settings =====
+WATERFALL_DEPTH = 100
+IDLE_S = 0.05        # keep the window responsive while no frames arrive
+
+USE_BUS = "--bus" in sys.argv
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+port = int(args[0]) if args else VIEWER_PORT
+
+plt.ion()
+fig, ax = plt.subplots()
+fig.canvas.draw()
+
+waterfall = None
+renderer = None
+layout = None        # (bins, db_min, db_max, start_mhz, stop_mhz) of the current stream
+
+
+def open_waterfall(layout):
+    # (Re)build the ring and image for a new stream layout (scanner restarted/retuned)
+    bins, db_min, db_max, start_mhz, stop_mhz = layout
+    ring = WaterfallRing(WATERFALL_DEPTH, bins, db_min=db_min, db_max=db_max)
+    ax.clear()
+    return ring, WaterfallRenderer(ax, ring, np.linspace(start_mhz, stop_mhz, bins),
+                                   title='📡 Tactical RF Waterfall (viewer)')
+
+
+def run_stream():
+    global waterfall, renderer, layout
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("0.0.0.0", port))
+    sock.setblocking(False)
+    decoder = FrameDecoder()
+    print(f"📺 Waiting for waterfall frames on UDP {port}...")
+    try:
+        while plt.fignum_exists(fig.number):
+            if not select.select([sock], [], [], IDLE_S)[0]:
+                fig.canvas.flush_events()
+                continue
+
+            # Drain whatever queued up while we were drawing, then draw once
+            rows = []
+            while True:
+                try:
+                    frame = sock.recv(65536)
+                except BlockingIOError:
+                    break
+                decoded = decoder.decode(frame)
+                if decoded is not None:
+                    header, row = decoded
+                    key = (header["bins"], header["db_min"], header["db_max"],
+                           header["start_mhz"], header["stop_mhz"])
+                    if key != layout:
+                        layout = key
+                        waterfall, renderer = open_waterfall(layout)
+                        rows = []
+                    rows.append(row)
+
+            if rows:
+                q = np.asarray(rows, dtype=np.float32)
+                waterfall.push_rows(q * ((waterfall.db_max - waterfall.db_min) / 255.0) + waterfall.db_min)
+                renderer.update()
+            else:
+                fig.canvas.flush_events()
+    finally:
+        sock.close()
+        print(f"📊 Viewer: {decoder.stats()}, {renderer.frames if renderer else 0} redraws")
+
+
+def run_bus():
+    global waterfall, renderer, layout
+    print("📺 Waiting for the spectrum bus...")
+    while plt.fignum_exists(fig.number):
+        try:
+            bus = SpectrumBusReader()
+        except FileNotFoundError:
+            plt.pause(1.0)
+            continue
+        layout = (bus.bins, DB_MIN, DB_MAX, bus.start_mhz, bus.stop_mhz)
+        waterfall, renderer = open_waterfall(layout)
+        try:
+            while plt.fignum_exists(fig.number) and not bus.writer_closed:
+                # Everything since the last redraw (rows are copied into the ring)
+                block = bus.read(timeout=IDLE_S)
+                if block is None:
+                    fig.canvas.flush_events()
+                    continue
+                while block is not None:
+                    waterfall.push_rows(block.rows)
+                    block = bus.read(timeout=0)
+                renderer.update()
+        finally:
+            print(f"📊 Viewer: {bus.stats()}, {renderer.frames} redraws")
+            bus.close()
+        time.sleep(1.0)   # scanner restarting
+
+
+try:
+    if USE_BUS:
+        run_bus()
+    else:
+        run_stream()
+except KeyboardInterrupt:
+    pass
+finally:
+    plt.close()
@@ -0,0 +1,115 @@
+# rf_waterfall.py
+#
+# Fixed-size waterfall history plus a blitting renderer. The ring stores rows
+# twice (at i and i + depth) so the chronological view is always one
+# contiguous slice, no list juggling or re-conversion per frame. The renderer
+# keeps a single AxesImage alive and only redraws that artist.
+
+import numpy as np
+
+# ===== Settings =====
+WATERFALL_DEPTH = 100
+DB_MIN = -90.0    # colour scale limits (also the uint8 quantization range)
+DB_MAX = -10.0
+
+
+class WaterfallRing:
+
+    def __init__(self, depth=WATERFALL_DEPTH, bins=1024, dtype=np.float32,
+                 db_min=DB_MIN, db_max=DB_MAX):
+        self.depth = depth
+        self.bins = bins
+        self.dtype = np.dtype(dtype)
+        self.db_min = db_min
+        self.db_max = db_max
+        fill = 0 if self.dtype == np.uint8 else db_min
+        self.buffer = np.full((2 * depth, bins), fill, dtype=self.dtype)
+        self.write_index = 0
+        self.rows_written = 0
+        if self.dtype == np.uint8:
+            self._q_scale = 255.0 / (db_max - db_min)
+
+    @property
+    def vmin(self):
+        return 0 if self.dtype == np.uint8 else self.db_min
+
+    @property
+    def vmax(self):
+        return 255 if self.dtype == np.uint8 else self.db_max
+
+    def quantize(self, rows_db):
+        q = (np.asarray(rows_db, dtype=np.float32) - self.db_min) * self._q_scale
+        return np.clip(q, 0, 255, out=q).astype(np.uint8)
+
+    def push(self, row_db):
+        self.push_rows(np.asarray(row_db)[np.newaxis, :])
+
+    def push_rows(self, rows_db):
+        rows_db = np.asarray(rows_db)
+        if len(rows_db) > self.depth:
+            rows_db = rows_db[-self.depth:]
+        rows = self.quantize(rows_db) if self.dtype == np.uint8 else rows_db
+        n = len(rows)
+        idx = (self.write_index + np.arange(n)) % self.depth
+        self.buffer[idx] = rows
+        self.buffer[idx + self.depth] = rows
+        self.write_index = (self.write_index + n) % self.depth
+        self.rows_written += n
+
+    def view(self):
+        # Oldest row first, newest last. Zero-copy; valid until the next push.
+        return self.buffer[self.write_index:self.write_index + self.depth]
+
+    def latest(self):
+        return self.buffer[(self.write_index - 1) % self.depth]
+
+    def to_db(self, rows):
+        if self.dtype != np.uint8:
+            return rows
+        return rows.astype(np.float32) / self._q_scale + self.db_min
+
+
+class WaterfallRenderer:
+    # Updates one AxesImage with set_data() and blits it. Falls back to
+    # draw_idle() on backends without blitting support.
+
+    def __init__(self, ax, ring, freq_axis, title="📡 Tactical RF Waterfall",
+                 xlim=None, cmap="viridis"):
+        self.ax = ax
+        self.fig = ax.figure
+        self.canvas = self.fig.canvas
+        self.ring = ring
+        self.blit = getattr(self.canvas, "supports_blit", False)
+        # Animated artists are skipped by normal draws, so only when blitting
+        self.image = ax.imshow(
+            ring.view(), aspect='auto', origin='lower', cmap=cmap,
+            extent=[freq_axis[0], freq_axis[-1], 0, ring.depth],
+            vmin=ring.vmin, vmax=ring.vmax, interpolation='nearest', animated=self.blit)
+        ax.set_title(title)
+        ax.set_xlabel('Frequency (MHz)')
+        ax.set_ylabel('Time (scrolling up)')
+        if xlim is not None:
+            ax.set_xlim(*xlim)
+        ax.set_ylim(0, ring.depth)
+
+        self._background = None
+        self.frames = 0
+        if self.blit:
+            # Re-grab the static background whenever a full draw happens (resize etc.)
+            self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.draw()
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.image)
+
+    def update(self):
+        self.image.set_data(self.ring.view())
+        if self.blit and self._background is not None:
+            self.canvas.restore_region(self._background)
+            self.ax.draw_artist(self.image)
+            self.canvas.blit(self.ax.bbox)
+        else:
+            self.canvas.draw_idle()
+        self.canvas.flush_events()
+        self.frames += 1
@@ -1,28 +1,60 @@
 # rf_waterfall_plot_v10.py
+#
+#   python3 rf_waterfall_plot_v10.py [iq_source] [--headless]
+#
+# Headless (--headless, or no DISPLAY, e.g. from cron) runs capture, DSP and
+# detection without importing matplotlib; watch it with rf_viewer.py.
 
 import os
+import sys
 import time
-import csv
-import numpy as np
-import matplotlib.pyplot as plt
-from rtlsdr import RtlSdr
-import threading
-import copy
-import paramiko
-from datetime import datetime, timedelta
+from rf_capture import start_capture
+from rf_iq_source import open_source
+from rf_spectrum import SpectralEngine, notch_dc
+from rf_waterfall import WaterfallRing, WaterfallRenderer
+from waterfall_stream import WaterfallPublisher, VIEWER_PORT
+from spectrum_bus import SpectrumBusWriter
+from spectrum_archive import SpectrumArchiveWriter
+from rf_snapshot import SnapshotRenderer
+from rf_cfar import CfarDetector
+from rf_peaks import peaks_from_rows
+from rf_tracker import Tracker
+from auto_upload_kml_v3 import SftpUploader
+from kml_publisher import KmlPublisher, write_network_link
+from detection_store import DetectionStore
+from datetime import datetime
 
 # ===== Settings =====
 CENTER_FREQ = 915e6
 SAMPLE_RATE = 2.4e6
 GAIN = 'auto'
 WATERFALL_DEPTH = 100
-THRESHOLD_DB = -40
+CFAR_GUARD = 4       # CFAR guard cells each side
+CFAR_TRAIN = 64      # CFAR training cells each side (~150 kHz at 1024 bins)
+CFAR_PFA = 1e-6      # false-alarm probability per bin per row
+FFT_SIZE = 1024      # bins per waterfall row
+FFT_OVERLAP = 0.5
+FFT_AVERAGES = 64    # segments averaged per row (511 segments -> 7 rows per 256k-sample block)
+DC_NOTCH = True      # patch the dongle's LO-leakage spike at the centre frequency
+
+# IQ source: "rtlsdr", "rtlsdr:<index|serial>" or a .sigmf-meta recording to replay
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+IQ_SOURCE = args[0] if args else "rtlsdr"
+IQ_RECORD = None     # e.g. "recordings/scan" to record raw IQ while scanning
+
+# No plot window: the loop runs as fast as capture + DSP allow
+HEADLESS = "--headless" in sys.argv or not os.environ.get("DISPLAY")
+VIEWER_HOST = "127.0.0.1"   # where rf_viewer.py runs (frames are mirrored there)
+STATUS_INTERVAL_S = 60      # headless: pipeline rate printout
+SPECTRUM_BUS = True         # every row into shared memory for other processes (spectrum_bus.py)
+ARCHIVE = True              # peak-held rows to disk, size/age capped (spectrum_archive.py)
 
 # KML Upload settings
 scp_server = "134.199.213.125"
 scp_username = "sk123"
 scp_password = "9uBQxP@fPsV5#D0p#k2BrJ#gdrK3QrcM4%DuYKvM!8w"
 scp_remote_folder = "/home/sk123/uploads/"
+kml_public_url = "http://134.199.213.125/uploads/rf_detections.kml"  # where the uploaded KML is served
 
 # Default fallback location
 default_lat = 37.823
@@ -31,122 +63,143 @@ default_lon = -122.441
 # Folders
 DETECTIONS_FOLDER = "detections"
 os.makedirs(DETECTIONS_FOLDER, exist_ok=True)
-csv_filename = os.path.join(DETECTIONS_FOLDER, "detections_log.csv")
-
-# ===== Helper Functions =====
-
-def save_snapshot(fig, filename):
-    try:
-        fig_copy = copy.deepcopy(fig)
-        def _save():
-            fig_copy.savefig(filename)
-        threading.Thread(target=_save).start()
-    except Exception as e:
-        print(f"\u274c Error saving snapshot: {e}")
-
-def generate_kml(filepath, lat, lon, freq_mhz, power_dbm):
-    kml_data = f'''<?xml version="1.0" encoding="UTF-8"?>
-<kml xmlns="http://www.opengis.net/kml/2.2">
-  <Placemark>
-    <name>RF Spike {freq_mhz:.2f} MHz</name>
-    <description>Power: {power_dbm:.2f} dBm</description>
-    <Point>
-      <coordinates>{lon},{lat},0</coordinates>
-    </Point>
-  </Placemark>
-</kml>'''
-    with open(filepath, 'w') as f:
-        f.write(kml_data)
-
-def upload_kml_file(filepath):
-    try:
-        if not os.path.exists(filepath):
-            print(f"\u274c No file to upload: {filepath}")
-            return
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(scp_server, username=scp_username, password=scp_password)
-
-        sftp = ssh.open_sftp()
-        remote_path = os.path.join(scp_remote_folder, os.path.basename(filepath))
-        sftp.put(filepath, remote_path)
-
-        sftp.close()
-        ssh.close()
-        print(f"\u2705 SCP Upload Successful: {os.path.basename(filepath)}")
-    except Exception as e:
-        print(f"\u274c SCP Upload Failed: {e}")
+db_filename = os.path.join(DETECTIONS_FOLDER, "detections.db")
+
+# Snapshot PNGs rendered from the waterfall array on a small worker pool
+snapshots = SnapshotRenderer()
+
+# Persistent SFTP connection + background upload queue
+uploader = SftpUploader(scp_server, scp_username, scp_password, scp_remote_folder).start()
+
+# One rolling KML document for all emitters + a NetworkLink clients poll
+kml = KmlPublisher(os.path.join(DETECTIONS_FOLDER, "rf_detections.kml"), default_lat, default_lon)
+uploader.submit(write_network_link(os.path.join(DETECTIONS_FOLDER, "rf_detections_link.kml"), kml_public_url))
 
 # ===== Initialize SDR =====
-sdr = RtlSdr()
-sdr.sample_rate = SAMPLE_RATE
-sdr.center_freq = CENTER_FREQ
-sdr.gain = GAIN
+sdr = open_source(IQ_SOURCE, CENTER_FREQ, SAMPLE_RATE, GAIN, record=IQ_RECORD)
+
+# Capture thread keeps the dongle streaming while we plot/upload
+ring, capture = start_capture(sdr)
+dropped_reported = 0
+
+# Spectral engine (Welch-averaged STFT rows)
+engine = SpectralEngine(FFT_SIZE, FFT_OVERLAP, FFT_AVERAGES, sample_rate=sdr.sample_rate)
+freq_axis = engine.freq_axis(sdr.center_freq)  # MHz
+
+# Adaptive detector (noise floor tracked per bin, independent of gain)
+detector = CfarDetector("ca", CFAR_GUARD, CFAR_TRAIN, CFAR_PFA, looks=engine.effective_averages())
+
+# Emitter tracks: outputs fire on track start / significant change / end only
+tracker = Tracker()
 
 # Waterfall data
-waterfall = []
+waterfall = WaterfallRing(WATERFALL_DEPTH, FFT_SIZE)
 
 # Plotting setup
-plt.ion()
-fig, ax = plt.subplots()
+if HEADLESS:
+    renderer = None
+else:
+    import matplotlib.pyplot as plt
+    plt.ion()
+    fig, ax = plt.subplots()
+    renderer = WaterfallRenderer(ax, waterfall, freq_axis, title='📡 Tactical RF Waterfall', xlim=(900, 930))
+
+# Live rows to the dashboard's /waterfall page (quantized, zlib, ~1 KB per row),
+# mirrored to rf_viewer.py
+waterfall_stream = WaterfallPublisher(freq_axis, also_to=[(VIEWER_HOST, VIEWER_PORT)])
+
+# Full-rate rows for local consumers (rf_viewer.py --bus, recorders, detectors)
+bus = SpectrumBusWriter(freq_axis) if SPECTRUM_BUS else None
 
-freq_axis = np.linspace(
-    sdr.center_freq - sdr.sample_rate / 2,
-    sdr.center_freq + sdr.sample_rate / 2,
-    1024
-) / 1e6  # MHz
+# Spectrum history on disk (~350 MB/day, 2 GB / 7 days max; spectrum_archive.py png <start> <end> out.png)
+archive = SpectrumArchiveWriter(freq_axis) if ARCHIVE else None
 
-# Initialize CSV if needed
-if not os.path.exists(csv_filename):
-    with open(csv_filename, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Timestamp", "Frequency_MHz", "Power_dBm"])
+# Detection log (SQLite, batched writes from a background thread)
+store = DetectionStore(db_filename).start()
 
-print("\n\ud83c\udfaf Starting tactical RF waterfall scan...")
+print(f"\n🎯 Starting tactical RF waterfall scan{' (headless)' if HEADLESS else ''}...")
+blocks = 0
+started = status_time = time.monotonic()
 
 # ===== Main Loop =====
 try:
     while True:
-        samples = sdr.read_samples(256*1024)
-        spectrum = 20 * np.log10(np.abs(np.fft.fftshift(np.fft.fft(samples))))
-        downsampled = spectrum[::int(len(spectrum)/1024)]
-
-        waterfall.append(downsampled)
-        if len(waterfall) > WATERFALL_DEPTH:
-            waterfall.pop(0)
-
-        ax.clear()
-        ax.imshow(waterfall, aspect='auto', extent=[freq_axis[0], freq_axis[-1], 0, WATERFALL_DEPTH],
-                  origin='lower', cmap='viridis')
-        ax.set_title('\ud83d\udce1 Tactical RF Waterfall')
-        ax.set_xlabel('Frequency (MHz)')
-        ax.set_ylabel('Time (scrolling up)')
-        ax.set_xlim(900, 930)
-        ax.set_ylim(0, WATERFALL_DEPTH)
-        plt.pause(0.05)
-
-        spikes = np.where(downsampled > THRESHOLD_DB)[0]
-        if len(spikes) > 0:
-            timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H-%M-%SZ")
-            freq_mhz = freq_axis[spikes[0]]
-            power_dbm = downsampled[spikes[0]]
-
-            png_path = os.path.join(DETECTIONS_FOLDER, f"event_{timestamp}.png")
-            kml_path = os.path.join(DETECTIONS_FOLDER, f"rf_event_{timestamp}.kml")
-
-            save_snapshot(fig, png_path)
-            generate_kml(kml_path, default_lat, default_lon, freq_mhz, power_dbm)
-            upload_kml_file(kml_path)
-
-            print(f"\ud83d\udea8 Detection saved: {freq_mhz:.2f} MHz!")
-
-            with open(csv_filename, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([timestamp, f"{freq_mhz:.3f}", f"{power_dbm:.2f}"])
+        block = ring.read(timeout=5.0)
+        if block is None:
+            print("⏹️ Capture ended")
+            break
+        _, block_time, samples = block
+        if ring.dropped_blocks != dropped_reported:
+            dropped_reported = ring.dropped_blocks
+            print(f"⚠️ Capture overrun: {ring.overruns} overruns, {dropped_reported} blocks dropped")
+
+        rows = engine.stft(samples)
+        if DC_NOTCH:
+            notch_dc(rows)
+        waterfall.push_rows(rows)
+        waterfall_stream.push(rows, block_time)
+        if bus is not None:
+            bus.publish(rows, block_time)
+        if archive is not None:
+            archive.append(rows, block_time)
+        if renderer is not None:
+            renderer.update()
+        blocks += 1
+
+        # Every emitter in the block (peak-hold over its rows, so short bursts count)
+        peaks = peaks_from_rows(rows, detector, freq_axis)
+        events = tracker.update(peaks, block_time)
+        if events:
+            timestamp = datetime.utcfromtimestamp(block_time).strftime("%Y-%m-%dT%H-%M-%SZ")
+            for event, track in events:
+                kml.update_track(event, track)
+                if event == "end":
+                    store.add_track(event, track, block_time)
+                    print(f"✅ Track ended: {track.summary()}")
+                    continue
+                freq_mhz = track.center_mhz
+                if event == "start":
+                    png_path = os.path.join(DETECTIONS_FOLDER, f"event_{timestamp}_{track.uid}.png")
+                    peak = track.last_peak
+                    snapshots.submit(waterfall.view(), png_path, range(peak["start_bin"], peak["stop_bin"]))
+                print(f"🚨 Track {event}: {track.uid} {freq_mhz:.3f} MHz "
+                      f"({track.bandwidth_khz:.0f} kHz, {track.peak_db:.1f} dB, SNR {track.snr_db:.1f} dB)")
+                store.add_track(event, track, block_time)
+
+        # Rewrites (rate-limited) only when an emitter changed; upload coalesces
+        if kml.publish(block_time):
+            uploader.submit(kml.path)
+
+        if HEADLESS and time.monotonic() - status_time >= STATUS_INTERVAL_S:
+            status_time = time.monotonic()
+            print(f"📊 {blocks / (status_time - started):.1f} blocks/s, "
+                  f"{len(tracker.active_tracks())} active tracks, {ring.dropped_blocks} blocks dropped")
 
 except KeyboardInterrupt:
-    print("\n\ud83d\uded1 Stopping tactical scan...")
+    print("\n🛑 Stopping tactical scan...")
 
 finally:
+    end_time = time.time()
+    for event, track in tracker.flush(end_time):
+        kml.update_track(event, track)
+        store.add_track(event, track, end_time)
+        print(f"✅ Track ended: {track.summary()}")
+    if kml.publish(force=True):
+        uploader.submit(kml.path)
+    waterfall_stream.close()
+    if bus is not None:
+        bus.close()
+    if archive is not None:
+        archive.close()
+        print(f"📊 Archive: {archive.stats()}")
+    snapshots.close()
+    print(f"📊 Snapshots: {snapshots.stats()}")
+    store.close()
+    print(f"📊 Detection log: {store.stats()}")
+    capture.stop()
     sdr.close()
-    plt.close()
+    uploader.stop()
+    print(f"📊 Uploads: {uploader.stats()}")
+    print(f"📊 Pipeline: {blocks} blocks, {blocks / max(time.monotonic() - started, 1e-9):.1f} blocks/s")
+    if renderer is not None:
+        plt.close()
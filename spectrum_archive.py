@@ -0,0 +1,358 @@
+# spectrum_archive.py
+#
+# Continuous spectrum history on disk. Every waterfall row is stored,
+# quantized to uint8 over DB_MIN..DB_MAX (1 byte per bin, the same scale as
+# WaterfallRing / waterfall_stream) or as float16 dB, in fixed-size segment
+# files that are memory-mapped for both writing and reading:
+#
+#   seg_<first ms>.rows   (ROWS_PER_SEGMENT, bins) array, preallocated
+#   seg_<first ms>.ts     float64 capture time per row, appended
+#   seg_<first ms>.json   layout: bins, dtype, dB scale, frequency span
+#
+# The .ts sidecar is the time index and the commit point: a row counts once
+# its timestamp is written, so readers can open the segment being written.
+# Timestamps never go backwards, which keeps a lookup O(log n): bisect over
+# the segments' first times, then searchsorted inside one .ts file. Reads
+# return slices of the memory maps (no copy).
+#
+# At 1024 bins a uint8 row is ~1 KB with its timestamp. By default rows are
+# peak-held to one per ROW_INTERVAL_S (0.25 s -> ~350 MB a day, easy on an SD
+# card); ROW_INTERVAL_S = 0 keeps every row (~6 GB a day at the scanner's full
+# rate). Each time a segment is opened, the oldest segments are deleted
+# beyond MAX_BYTES or once older than MAX_AGE_S.
+#
+#   python3 spectrum_archive.py info
+#   python3 spectrum_archive.py png <start> <end> out.png [max_rows]    (epoch or ISO times)
+
+import os
+import sys
+import json
+import time
+import bisect
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+
+from rf_waterfall import DB_MIN, DB_MAX
+
+# ===== Settings =====
+ARCHIVE_DIR = os.path.join("detections", "archive")
+ROWS_PER_SEGMENT = 65536       # 64 MB at 1024 uint8 bins (~15 min at full rate)
+DTYPE = "uint8"                # "uint8" (quantized) or "float16" (dB, 2 bytes per bin)
+MAX_BYTES = 2 << 30            # oldest segments are deleted beyond this
+MAX_AGE_S = 7 * 86400          # ...and once older than this (0: no age limit)
+ROW_INTERVAL_S = 0.25          # > 0: peak-hold and keep one row per interval (0: every row)
+
+DATA_EXT = ".rows"
+INDEX_EXT = ".ts"
+META_EXT = ".json"
+DTYPES = ("uint8", "float16")
+
+ArchiveSlice = namedtuple("ArchiveSlice", "segment timestamps rows")
+
+
+def parse_time(text):
+    # Epoch seconds or ISO 8601 ("2025-04-27T08:08:22Z"; naive means UTC)
+    try:
+        return float(text)
+    except ValueError:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def segment_bases(folder):
+    # Segment paths without extension, oldest first (names sort by first time)
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, name[:-len(META_EXT)]) for name in sorted(os.listdir(folder))
+            if name.startswith("seg_") and name.endswith(META_EXT)]
+
+
+def segment_first_ts(base):
+    # seg_<first ms>[_...]
+    return int(os.path.basename(base)[4:19]) / 1000.0
+
+
+def segment_bytes(base):
+    return sum(os.path.getsize(base + ext) for ext in (DATA_EXT, INDEX_EXT, META_EXT)
+               if os.path.exists(base + ext))
+
+
+class SpectrumArchiveWriter:
+
+    def __init__(self, freq_axis, folder=ARCHIVE_DIR, dtype=DTYPE, rows_per_segment=ROWS_PER_SEGMENT,
+                 max_bytes=MAX_BYTES, max_age_s=MAX_AGE_S, row_interval_s=ROW_INTERVAL_S,
+                 db_min=DB_MIN, db_max=DB_MAX):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        freq_axis = np.asarray(freq_axis)
+        self.folder = folder
+        self.dtype = np.dtype(dtype)
+        self.bins = len(freq_axis)
+        self.start_mhz = float(freq_axis[0])
+        self.stop_mhz = float(freq_axis[-1])
+        self.rows_per_segment = rows_per_segment
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.row_interval_s = row_interval_s
+        self.db_min = db_min
+        self.db_max = db_max
+        self._scale = 255.0 / (db_max - db_min)
+        os.makedirs(folder, exist_ok=True)
+
+        self._base = None
+        self._rows = None          # memmap of the open segment
+        self._index = None         # its .ts file (unbuffered: readers see rows at once)
+        self._count = 0            # rows in the open segment
+        self._last_ts = -np.inf
+        self._hold = None
+        self._hold_start = None
+
+        # Stats
+        self.rows_in = 0
+        self.rows_written = 0
+        self.segments_opened = 0
+        self.segments_deleted = 0
+
+    def _encode(self, rows_db):
+        if self.dtype == np.uint8:
+            q = (rows_db - self.db_min) * self._scale
+            return np.clip(q, 0, 255, out=q).astype(np.uint8)
+        return rows_db.astype(np.float16)
+
+    def _open_segment(self, ts):
+        self._close_segment()
+        base = os.path.join(self.folder, f"seg_{int(ts * 1000):015d}")
+        while os.path.exists(base + META_EXT):
+            base += "_"
+        meta = {"bins": self.bins, "dtype": self.dtype.name, "rows_per_segment": self.rows_per_segment,
+                "db_min": self.db_min, "db_max": self.db_max, "start_mhz": self.start_mhz,
+                "stop_mhz": self.stop_mhz, "first_ts": ts}
+        self._rows = np.memmap(base + DATA_EXT, dtype=self.dtype, mode="w+",
+                               shape=(self.rows_per_segment, self.bins))
+        self._index = open(base + INDEX_EXT, 'wb', buffering=0)
+        # Layout last: readers only pick up segments whose .json exists
+        with open(base + META_EXT + ".tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(base + META_EXT + ".tmp", base + META_EXT)
+        self._base = base
+        self._count = 0
+        self.segments_opened += 1
+        self._enforce_retention(ts)
+
+    def _close_segment(self):
+        if self._rows is not None:
+            self._rows.flush()
+            self._index.close()
+            self._rows = self._index = None
+
+    def _enforce_retention(self, now):
+        bases = segment_bases(self.folder)
+        sizes = [segment_bytes(b) for b in bases]
+        total = sum(sizes)
+        cutoff = now - self.max_age_s if self.max_age_s > 0 else -np.inf
+        for i, (base, size) in enumerate(zip(bases, sizes)):
+            if base == self._base or i + 1 == len(bases):
+                break
+            # A segment's last row is no later than the next one's first
+            if total <= self.max_bytes and segment_first_ts(bases[i + 1]) >= cutoff:
+                break
+            for ext in (META_EXT, INDEX_EXT, DATA_EXT):
+                try:
+                    os.remove(base + ext)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.segments_deleted += 1
+
+    def append(self, rows_db, timestamp=None):
+        # One row or a (rows, bins) block of dB values; returns rows stored
+        rows_db = np.asarray(rows_db, dtype=np.float32)
+        if rows_db.ndim == 1:
+            rows_db = rows_db[np.newaxis, :]
+        ts = time.time() if timestamp is None else float(timestamp)
+        self.rows_in += len(rows_db)
+        if self.row_interval_s > 0:
+            peak = rows_db.max(axis=0)
+            if self._hold is None:
+                self._hold, self._hold_start = peak, ts
+            else:
+                np.maximum(self._hold, peak, out=self._hold)
+            if ts - self._hold_start < self.row_interval_s:
+                return 0
+            rows_db, self._hold = self._hold[np.newaxis, :], None
+        ts = max(ts, self._last_ts)      # keep the index sorted
+        self._last_ts = ts
+
+        encoded = self._encode(rows_db)
+        done = 0
+        while done < len(encoded):
+            if self._rows is None or self._count == self.rows_per_segment:
+                self._open_segment(ts)
+            k = min(len(encoded) - done, self.rows_per_segment - self._count)
+            self._rows[self._count:self._count + k] = encoded[done:done + k]
+            self._index.write(np.full(k, ts).tobytes())    # rows first, then commit
+            self._count += k
+            done += k
+        self.rows_written += done
+        return done
+
+    def close(self):
+        self._close_segment()
+
+    def stats(self):
+        return {
+            "rows_in": self.rows_in,
+            "rows_written": self.rows_written,
+            "segments_opened": self.segments_opened,
+            "segments_deleted": self.segments_deleted,
+            "bytes_per_row": self.bins * self.dtype.itemsize + 8,
+        }
+
+
+class Segment:
+
+    def __init__(self, base):
+        self.base = base
+        with open(base + META_EXT) as f:
+            self.meta = json.load(f)
+        self.bins = self.meta["bins"]
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.first_ts = self.meta["first_ts"]
+        self.db_min = self.meta["db_min"]
+        self.db_max = self.meta["db_max"]
+        self._rows = None
+        self.timestamps = np.empty(0)
+        self.refresh()
+
+    def refresh(self):
+        # Picks up rows committed since the last look (the writer's open segment)
+        n = min(os.path.getsize(self.base + INDEX_EXT) // 8, self.meta["rows_per_segment"])
+        if n != len(self.timestamps):
+            self.timestamps = np.memmap(self.base + INDEX_EXT, dtype=np.float64, mode="r", shape=(n,))
+        return n
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = np.memmap(self.base + DATA_EXT, dtype=self.dtype, mode="r",
+                                   shape=(self.meta["rows_per_segment"], self.bins))
+        return self._rows[:len(self.timestamps)]
+
+    @property
+    def full(self):
+        return len(self.timestamps) == self.meta["rows_per_segment"]
+
+    @property
+    def last_ts(self):
+        return float(self.timestamps[-1]) if len(self.timestamps) else self.first_ts
+
+    def freq_axis(self):
+        return np.linspace(self.meta["start_mhz"], self.meta["stop_mhz"], self.bins)
+
+    def layout(self):
+        return (self.bins, self.dtype.name, self.db_min, self.db_max, self.meta["start_mhz"], self.meta["stop_mhz"])
+
+    def to_db(self, rows):
+        if self.dtype != np.uint8:
+            return rows.astype(np.float32)
+        return rows.astype(np.float32) * ((self.db_max - self.db_min) / 255.0) + self.db_min
+
+
+class SpectrumArchive:
+    # Reader; safe to use while a writer appends (call refresh() for new data)
+
+    def __init__(self, folder=ARCHIVE_DIR):
+        self.folder = folder
+        self.segments = []
+        self._firsts = []
+        self.refresh()
+
+    def refresh(self):
+        known = {s.base: s for s in self.segments}
+        segments = []
+        for base in segment_bases(self.folder):
+            seg = known.get(base)
+            try:
+                segments.append(seg if seg is not None else Segment(base))
+            except (OSError, ValueError):
+                continue          # deleted by retention while we looked
+        for seg in segments:
+            # Not only the last: the writer may have rolled over since we looked
+            if not seg.full:
+                seg.refresh()
+        self.segments = segments
+        self._firsts = [s.first_ts for s in segments]
+        return self
+
+    def range(self, start=None, end=None):
+        # [ArchiveSlice] covering start <= t < end, oldest first, zero-copy
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+        i = max(0, bisect.bisect_right(self._firsts, start) - 1)
+        out = []
+        for seg in self.segments[i:]:
+            if seg.first_ts >= end:
+                break
+            ts = seg.timestamps
+            lo = int(np.searchsorted(ts, start, "left"))
+            hi = int(np.searchsorted(ts, end, "left"))
+            if hi > lo:
+                out.append(ArchiveSlice(seg, ts[lo:hi], seg.rows[lo:hi]))
+        return out
+
+    def read(self, start=None, end=None, max_rows=None):
+        # (timestamps, rows) for the range as one array pair (copied), stored
+        # dtype kept; with max_rows, peak-held down to at most that many rows
+        slices = self.range(start, end)
+        if not slices:
+            return np.empty(0), None
+        if len({s.segment.layout() for s in slices}) > 1:
+            raise ValueError("spectrum layout changes within this range (scanner retuned)")
+        ts = np.concatenate([s.timestamps for s in slices])
+        rows = np.concatenate([s.rows for s in slices])
+        if max_rows and len(rows) > max_rows:
+            step = -(-len(rows) // max_rows)
+            starts = np.arange(0, len(rows), step)
+            rows = np.maximum.reduceat(rows, starts, axis=0)
+            ts = ts[starts]
+        return ts, rows
+
+    def stats(self):
+        rows = sum(len(s.timestamps) for s in self.segments)
+        return {
+            "segments": len(self.segments),
+            "rows": rows,
+            "bytes": sum(segment_bytes(s.base) for s in self.segments),
+            "first_ts": self.segments[0].first_ts if self.segments else None,
+            "last_ts": self.segments[-1].last_ts if self.segments else None,
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("info", "png") or (sys.argv[1] == "png" and len(sys.argv) < 5):
+        print("usage: spectrum_archive.py info | png <start> <end> out.png [max_rows]")
+        sys.exit(1)
+    archive = SpectrumArchive()
+    if sys.argv[1] == "info":
+        s = archive.stats()
+        print(f"📊 {archive.folder}: {s['segments']} segments, {s['rows']} rows, {s['bytes'] / 1e6:.1f} MB")
+        if s["rows"]:
+            fmt = "%Y-%m-%dT%H:%M:%SZ"
+            print(f"   {datetime.fromtimestamp(s['first_ts'], timezone.utc).strftime(fmt)} -> "
+                  f"{datetime.fromtimestamp(s['last_ts'], timezone.utc).strftime(fmt)}")
+    else:
+        from rf_snapshot import render_png
+        start, end = parse_time(sys.argv[2]), parse_time(sys.argv[3])
+        max_rows = int(sys.argv[5]) if len(sys.argv) > 5 else 1000
+        slices = archive.range(start, end)
+        if not slices:
+            print("⚠️ No archived rows in that range")
+            sys.exit(1)
+        seg = slices[0].segment
+        ts, rows = archive.read(start, end, max_rows)
+        with open(sys.argv[4], 'wb') as f:
+            f.write(render_png(rows if seg.dtype == np.uint8 else rows.astype(np.float32),
+                               seg.db_min, seg.db_max, row_scale=1))
+        print(f"✅ {len(rows)} rows -> {sys.argv[4]}")
@@ -0,0 +1,207 @@
+# spectrum_bus.py
+#
+# Shared-memory spectrum bus: the scanner writes every waterfall row (float32
+# dB) into a ring in multiprocessing.shared_memory, and any number of reader
+# processes (viewer, dashboard, recorder, extra detectors) attach by name and
+# read the rows in place. The writer never waits for anyone; a reader that
+# falls more than SLOTS rows behind has been lapped and skips ahead.
+#
+# Segment layout (all little-endian, numpy views straight onto the buffer):
+#
+#   0    header   magic, version, slots, bins, start_mhz, stop_mhz
+#   64   counters int64 [claimed, committed, closed]
+#   128  ts       float64 [slots]    capture time per row
+#   ...  rows     float32 [slots, bins]
+#
+# Row n (sequence number, from 0) lives in slot n % slots. publish() raises
+# `claimed` before it overwrites any slot and `committed` once the rows are
+# in, so rows [committed - slots, committed) are readable, and a row n the
+# reader is holding stays intact while n >= claimed - slots. A reader takes
+# zero-copy views, uses them, then asks valid() whether the writer got there
+# first (read(copy=True) does the copy + check + retry for you).
+
+import time
+import struct
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+# ===== Settings =====
+BUS_NAME = "rf_spectrum"
+SLOTS = 2048                # rows kept (~30 s at 7 rows x 9.2 blocks/s, 8 MB at 1024 bins)
+POLL_S = 0.005              # reader sleep while waiting for new rows
+
+MAGIC = b"RFSB"
+VERSION = 1
+# magic, version, slots, bins, start_mhz, stop_mhz
+HEADER = struct.Struct("<4sIIIdd")
+COUNTERS_OFFSET = 64
+TS_OFFSET = 128
+CLAIMED, COMMITTED, CLOSED = range(3)
+
+RowBlock = namedtuple("RowBlock", "seq timestamps rows")
+
+
+def _rows_offset(slots):
+    return (TS_OFFSET + 8 * slots + 63) // 64 * 64
+
+
+def _views(buf, slots, bins):
+    counters = np.ndarray(3, dtype=np.int64, buffer=buf, offset=COUNTERS_OFFSET)
+    timestamps = np.ndarray(slots, dtype=np.float64, buffer=buf, offset=TS_OFFSET)
+    rows = np.ndarray((slots, bins), dtype=np.float32, buffer=buf, offset=_rows_offset(slots))
+    return counters, timestamps, rows
+
+
+class SpectrumBusWriter:
+    # Scanner side. One writer per bus name; it owns (and unlinks) the segment.
+
+    def __init__(self, freq_axis, name=BUS_NAME, slots=SLOTS):
+        freq_axis = np.asarray(freq_axis)
+        self.name = name
+        self.slots = slots
+        self.bins = len(freq_axis)
+        size = _rows_offset(slots) + 4 * slots * self.bins
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a scanner that didn't shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._counters, self._timestamps, self._rows = _views(self.shm.buf, slots, self.bins)
+        self._counters[:] = 0
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, slots, self.bins,
+                         float(freq_axis[0]), float(freq_axis[-1]))
+
+        # Stats
+        self.published = 0
+
+    def publish(self, rows_db, timestamp=None):
+        # One row or a (rows, bins) block; every row gets the same timestamp
+        rows_db = np.asarray(rows_db, dtype=np.float32)
+        if rows_db.ndim == 1:
+            rows_db = rows_db[np.newaxis, :]
+        if len(rows_db) > self.slots:
+            rows_db = rows_db[-self.slots:]
+        n = len(rows_db)
+        seq = int(self._counters[COMMITTED])
+        self._counters[CLAIMED] = seq + n
+        start = seq % self.slots
+        first = min(n, self.slots - start)
+        self._rows[start:start + first] = rows_db[:first]
+        self._rows[:n - first] = rows_db[first:]
+        ts = time.time() if timestamp is None else timestamp
+        self._timestamps[start:start + first] = ts
+        self._timestamps[:n - first] = ts
+        self._counters[COMMITTED] = seq + n
+        self.published += n
+        return seq
+
+    def close(self):
+        self._counters[CLOSED] = 1
+        self._counters = self._timestamps = self._rows = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass        # row views still held somewhere; the mapping goes with them
+        self.shm.unlink()
+
+    def stats(self):
+        return {"name": self.name, "slots": self.slots, "bins": self.bins, "published": self.published}
+
+
+class SpectrumBusReader:
+    # Consumer side. Starts at the newest row (or the oldest kept, from_start=True).
+
+    def __init__(self, name=BUS_NAME, from_start=False):
+        self.name = name
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 registers attached segments with the resource
+            # tracker, which would unlink the writer's segment when we exit
+            self.shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        magic, version, self.slots, self.bins, self.start_mhz, self.stop_mhz = HEADER.unpack_from(self.shm.buf)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} is not a spectrum bus")
+        self._counters, self._timestamps, self._rows = _views(self.shm.buf, self.slots, self.bins)
+        committed = int(self._counters[COMMITTED])
+        self.next_seq = max(0, committed - self.slots) if from_start else committed
+
+        # Stats
+        self.rows_read = 0
+        self.lapped = 0             # rows overwritten before we got to them
+        self.laps = 0
+
+    def freq_axis(self):
+        return np.linspace(self.start_mhz, self.stop_mhz, self.bins)
+
+    @property
+    def writer_closed(self):
+        return bool(self._counters[CLOSED])
+
+    def pending(self):
+        return int(self._counters[COMMITTED]) - self.next_seq
+
+    def read(self, max_rows=None, timeout=None, copy=False):
+        # RowBlock of the next contiguous run of rows (views into the ring
+        # unless copy=True), or None if nothing new arrived within timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            committed = int(self._counters[COMMITTED])
+            oldest = int(self._counters[CLAIMED]) - self.slots
+            if self.next_seq < oldest:
+                self.lapped += oldest - self.next_seq
+                self.laps += 1
+                self.next_seq = oldest
+            n = committed - self.next_seq
+            if n > 0:
+                break
+            if self.writer_closed or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            time.sleep(POLL_S)
+
+        start = self.next_seq % self.slots
+        n = min(n, self.slots - start)
+        if max_rows is not None:
+            n = min(n, max_rows)
+        block = RowBlock(self.next_seq, self._timestamps[start:start + n], self._rows[start:start + n])
+        if copy:
+            block = RowBlock(block.seq, block.timestamps.copy(), block.rows.copy())
+            if not self.valid(block):
+                return self.read(max_rows, timeout, copy)   # lapped while copying; counted above
+        self.next_seq += n
+        self.rows_read += n
+        return block
+
+    def valid(self, block):
+        # True if no row of `block` has been overwritten since it was read
+        return block.seq >= int(self._counters[CLAIMED]) - self.slots
+
+    def latest(self, n=1):
+        # Copy of the newest n rows (oldest first), e.g. for a snapshot
+        committed = int(self._counters[COMMITTED])
+        n = min(n, committed, self.slots)
+        idx = np.arange(committed - n, committed) % self.slots
+        return self._rows[idx]
+
+    def close(self):
+        self._counters = self._timestamps = self._rows = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "rows_read": self.rows_read,
+            "pending": self.pending() if self._counters is not None else None,
+            "lapped": self.lapped,
+            "laps": self.laps,
+        }
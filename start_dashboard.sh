@@ -1,3 +1,3 @@
 #!/bin/bash
 cd ~/CV_Hackathon
-python3 dashboard_server_v2.py
+python3 dashboard_server_v3.py
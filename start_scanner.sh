@@ -1,5 +1,5 @@
 #!/bin/bash
 sleep 30
 cd /home/Sam/CV_Hackathon
-/usr/bin/python3 rf_waterfall_plot_v4.py
+/usr/bin/python3 rf_waterfall_plot_v10.py --headless
 
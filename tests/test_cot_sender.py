@@ -0,0 +1,131 @@
+import re
+import socket
+import threading
+import time
+
+import pytest
+
+from cot_sender import CotTcpSender
+
+
+class FakeTakServer:
+    # Local TCP listener collecting every event it receives, in order. Bound
+    # but not listening until listen() (connects are refused meanwhile).
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.events = []
+        self.connections = 0
+        self.drop_after = None          # close the first connection after this many events
+        self._buf = b""
+
+    def listen(self):
+        self.sock.listen(4)
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            with conn:
+                while True:
+                    chunk = conn.recv(1 << 16)
+                    if not chunk:
+                        break
+                    self._buf += chunk
+                    *done, self._buf = self._buf.split(b"</event>")
+                    self.events += [int(re.search(rb"\d+", e).group()) for e in done]
+                    if self.drop_after is not None and len(self.events) >= self.drop_after:
+                        self.drop_after = None
+                        self._buf = b""
+                        break
+
+    def wait_for(self, count, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while len(self.events) < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return self.events
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def server():
+    srv = FakeTakServer()
+    yield srv
+    srv.close()
+
+
+def make_sender(server, spool, **kwargs):
+    kwargs.setdefault("memory_events", 5)
+    return CotTcpSender("127.0.0.1", server.port, spool_path=str(spool), batch_events=4,
+                        backoff_start_s=0.05, backoff_max_s=0.2, **kwargs)
+
+
+def event(i):
+    return b"<event uid='%d'/></event>" % i
+
+
+def test_spools_while_down_and_replays_in_order(server, tmp_path):
+    sender = make_sender(server, tmp_path / "spool.bin").start()
+    for i in range(50):
+        sender.send_raw(event(i))
+    time.sleep(0.3)                    # a few refused connects
+    assert sender.sent == 0
+    assert sender.spilled > 0
+    server.listen()
+    assert server.wait_for(50) == list(range(50))
+    sender.close()
+    assert sender.stats()["pending_spool_bytes"] == 0
+
+
+def test_reconnects_after_server_drops_connection(server, tmp_path):
+    server.drop_after = 10
+    server.listen()
+    sender = make_sender(server, tmp_path / "spool.bin").start()
+    for i in range(40):
+        sender.send_raw(event(i))
+        time.sleep(0.005)
+    received = server.wait_for(40)
+    sender.close()
+    assert server.connections >= 2
+    assert sender.reconnects >= 1
+    # Nothing lost or reordered; a batch in flight when the peer went away may come twice
+    assert list(dict.fromkeys(received)) == list(range(40))
+
+
+def test_spool_left_by_previous_run_is_replayed_first(server, tmp_path):
+    spool = tmp_path / "spool.bin"
+    first = make_sender(server, spool).start()
+    for i in range(20):
+        first.send_raw(event(i))
+    first.close(drain=False, timeout=1.0)
+    assert spool.stat().st_size > 0
+
+    server.listen()
+    second = make_sender(server, spool)
+    assert second.replayed == 20
+    second.start()
+    for i in range(20, 25):
+        second.send_raw(event(i))
+    assert server.wait_for(25) == list(range(25))
+    second.close()
+
+
+def test_close_leaves_spool_to_a_stuck_worker(server, tmp_path):
+    sender = make_sender(server, tmp_path / "spool.bin")
+    release = threading.Event()
+    sender._run = lambda: (release.wait(5), CotTcpSender._run(sender))
+    sender.start()
+    sender.send_raw(event(1))
+    sender.close(drain=False, timeout=0.1)
+    assert not sender._spool.closed          # worker still running: not ours to close
+    release.set()
+    sender._thread.join(5)
+    assert sender._spool.closed
@@ -0,0 +1,35 @@
+import importlib
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # The dashboard opens detections/ relative to the working directory on import
+    folder = tmp_path_factory.mktemp("dashboard")
+    cwd = pytest.MonkeyPatch()
+    cwd.chdir(folder)
+    (folder / "detections").mkdir()
+    dashboard = importlib.import_module("dashboard_server_v3")
+    yield dashboard.app.test_client()
+    dashboard.index.stop()
+    dashboard.waterfall.stop()
+    cwd.undo()
+
+
+@pytest.mark.parametrize("path", ["/", "/api/snapshots"])
+def test_malformed_snapshot_cursor_is_a_400(client, path):
+    resp = client.get(f"{path}?before=garbage")
+    assert resp.status_code == 400
+    assert "bad cursor" in resp.get_json()["error"]
+
+
+def test_snapshot_cursor_round_trip(client):
+    resp = client.get("/api/snapshots?before=1700000000.0:event.png")
+    assert resp.status_code == 200
+    assert resp.get_json() == {"items": [], "next": None}
+
+
+def test_malformed_detection_cursor_is_a_400(client):
+    resp = client.get("/api/detections?freq_min=900&before=zz")
+    assert resp.status_code == 400
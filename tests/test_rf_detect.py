@@ -0,0 +1,33 @@
+from rf_detect import analyze_rf_data
+
+HOP = "2024-01-01, 10:00:{sec:02d}, 900000000, 901000000, 1000.0, 5, {values}\n"
+
+
+def write_scan(path, value_rows):
+    path.write_text("".join(HOP.format(sec=i, values=", ".join(row)) for i, row in enumerate(value_rows)))
+    return str(path)
+
+
+def test_chunk_of_nan_rows(tmp_path):
+    scan = write_scan(tmp_path / "nan.csv", [["nan", "-nan", "nan"], ["nan", "inf", "-inf"]])
+    result = analyze_rf_data(scan, progress=False)
+    assert result["values"] == 0
+    assert result["detections"] == 0
+    assert result["bands"] == []
+
+
+def test_blank_rows(tmp_path):
+    path = tmp_path / "blank.csv"
+    path.write_text("\n\n   \n")
+    result = analyze_rf_data(str(path), progress=False)
+    assert result["values"] == 0
+    assert result["bands"] == []
+
+
+def test_nan_chunk_before_good_rows(tmp_path):
+    # Small chunks so the all-NaN hop is a chunk of its own
+    scan = write_scan(tmp_path / "mixed.csv", [["nan", "nan", "nan"], ["-60", "-20", "-60"]])
+    result = analyze_rf_data(scan, chunk_bytes=64, progress=False)
+    assert result["values"] == 3
+    assert result["detections"] == 1
+    assert [band["detections"] for band in result["bands"]] == [1]
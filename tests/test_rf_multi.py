@@ -0,0 +1,112 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from rf_multi import Device, EventMerger, MultiScanner, parse_device
+
+
+# ===== EventMerger =====
+
+def test_merge_is_time_ordered_across_devices():
+    merger = EventMerger(["a", "b"])
+    merger.push("a", 1.0, ["a1"])
+    merger.push("a", 3.0, ["a3"])
+    merger.push("b", 2.0, ["b2"])
+    # b has only reported up to 2.0: a3 might still be preceded by b
+    assert merger.pop_ready() == [(1.0, "a", "a1"), (2.0, "b", "b2")]
+    merger.push("b", 4.0, ["b4"])
+    assert merger.pop_ready() == [(3.0, "a", "a3")]
+    assert merger.pop_ready(flush=True) == [(4.0, "b", "b4")]
+    assert merger.late == 0
+    assert merger.released == 4
+
+
+def test_waits_for_every_live_device_to_report():
+    merger = EventMerger(["a", "b"])
+    merger.push("a", 1.0, ["a1"])
+    assert merger.pop_ready() == []
+    # An empty block still advances b's watermark
+    merger.push("b", 1.5)
+    assert merger.pop_ready() == [(1.0, "a", "a1")]
+
+
+def test_finished_device_no_longer_holds_back():
+    merger = EventMerger(["a", "b"])
+    merger.push("a", 1.0, ["a1"])
+    merger.push("a", 5.0, ["a5"])
+    merger.push("b", 2.0, ["b2"])
+    merger.finish("b")
+    assert [item for _, _, item in merger.pop_ready()] == ["a1", "b2", "a5"]
+
+
+def test_stalled_device_is_dropped_and_late_items_counted():
+    merger = EventMerger(["a", "b"], max_delay_s=0.05)
+    merger.push("a", 1.0)
+    merger.push("b", 1.0)
+    merger.push("a", 2.0, ["a2"])
+    merger.push("a", 3.0)
+    assert merger.pop_ready() == []
+    time.sleep(0.1)
+    merger.push("a", 4.0)
+    # b has been silent past max_delay_s: a's events go out without it
+    assert merger.pop_ready() == [(2.0, "a", "a2")]
+    # b comes back with an event older than what was released
+    merger.push("b", 1.5, ["b1.5"])
+    merger.push("b", 4.0)
+    assert merger.pop_ready() == [(1.5, "b", "b1.5")]
+    assert merger.late == 1
+
+
+def test_parse_device():
+    assert parse_device(0, "rtlsdr:1@868") == Device("868", "rtlsdr:1", 868e6)
+    assert parse_device(2, "scan.sigmf-meta") == Device("dev2", "scan.sigmf-meta", None)
+
+
+# ===== Replays =====
+
+def write_recording(path, tone_hz, seconds=1.0, sample_rate=2.4e6, center_freq=915e6):
+    # cu8 recording of one strong tone over noise
+    rng = np.random.default_rng(0)
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    iq = 0.3 * np.exp(2j * np.pi * tone_hz * t) + 0.02 * (rng.standard_normal(n) + 1j * rng.standard_normal(n))
+    raw = np.empty(2 * n, dtype=np.uint8)
+    raw[0::2] = np.clip(127.5 + 127.5 * iq.real, 0, 255)
+    raw[1::2] = np.clip(127.5 + 127.5 * iq.imag, 0, 255)
+    raw.tofile(f"{path}.sigmf-data")
+    meta = {"global": {"core:datatype": "cu8", "core:sample_rate": sample_rate},
+            "captures": [{"core:sample_index": 0, "core:frequency": center_freq}]}
+    with open(f"{path}.sigmf-meta", "w") as f:
+        json.dump(meta, f)
+    return f"{path}.sigmf-meta"
+
+
+def test_replays_merge_into_one_ordered_stream(tmp_path):
+    devices = [Device("a", write_recording(tmp_path / "a", 300e3), None),
+               Device("b", write_recording(tmp_path / "b", -500e3), None)]
+    scanner = MultiScanner(devices).start()
+    merged = []
+    deadline = time.monotonic() + 30
+    try:
+        while scanner.running and time.monotonic() < deadline:
+            merged += scanner.poll(0.2)
+    finally:
+        merged += scanner.stop()
+    assert not scanner.errors
+    assert not scanner.running
+
+    times = [ts for ts, _, _, _ in merged]
+    assert times == sorted(times)
+    assert scanner.merger.late == 0
+
+    by_device = {}
+    for _, device, event, track in merged:
+        by_device.setdefault(device, []).append((event, track))
+    assert set(by_device) == {"a", "b"}
+    for device, offset_mhz in (("a", 0.3), ("b", -0.5)):
+        events = by_device[device]
+        assert events[0][0] == "start" and events[-1][0] == "end"
+        assert all(track.uid.startswith(f"rf-{device}-") for _, track in events)
+        assert events[0][1].center_mhz == pytest.approx(915 + offset_mhz, abs=0.01)
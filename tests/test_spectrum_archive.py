@@ -0,0 +1,38 @@
+import numpy as np
+
+from spectrum_archive import SpectrumArchive, SpectrumArchiveWriter, segment_bases
+
+FREQ_AXIS = np.linspace(914.0, 916.0, 64)
+
+
+def fill(writer, start, seconds, rows_per_s=4):
+    for i in range(int(seconds * rows_per_s)):
+        writer.append(np.full(len(FREQ_AXIS), -60.0), start + i / rows_per_s)
+
+
+def test_segments_older_than_max_age_are_deleted(tmp_path):
+    writer = SpectrumArchiveWriter(FREQ_AXIS, folder=str(tmp_path), rows_per_segment=400,
+                                   max_bytes=1 << 40, max_age_s=250, row_interval_s=0)
+    fill(writer, 1000.0, 1000)               # 10 segments of 100 s
+    writer.close()
+    archive = SpectrumArchive(str(tmp_path))
+    # Only segments with rows inside the last 250 s (plus the one being written) remain
+    assert len(archive.segments) == 4
+    assert archive.segments[0].first_ts == 1600.0
+    assert writer.segments_deleted == 6
+
+
+def test_size_cap_applies_without_age_limit(tmp_path):
+    writer = SpectrumArchiveWriter(FREQ_AXIS, folder=str(tmp_path), rows_per_segment=400,
+                                   max_bytes=3 * 400 * (64 + 8) + 1024, max_age_s=0, row_interval_s=0)
+    fill(writer, 1000.0, 1000)
+    writer.close()
+    assert len(segment_bases(str(tmp_path))) == 3
+
+
+def test_default_peak_hold_keeps_one_row_per_interval(tmp_path):
+    writer = SpectrumArchiveWriter(FREQ_AXIS, folder=str(tmp_path))
+    fill(writer, 1000.0, 10, rows_per_s=64)
+    writer.close()
+    assert writer.rows_in == 640
+    assert writer.rows_written <= 10 / writer.row_interval_s
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from auto_upload_kml_v3 import SftpUploader
+
+
+class FakeSftpServer:
+    # Stands in for the paramiko transport + SFTP client pair. Connects fail
+    # while `down`; the first `fail_puts` put()s raise.
+
+    def __init__(self):
+        self.down = False
+        self.fail_puts = 0
+        self.connects = 0
+        self.puts = []                  # (time, local_path, ok)
+        self.files = {}                 # remote_path -> bytes
+        self.transport = None
+
+    def connect(self, uploader):
+        if self.down:
+            raise OSError("connection refused")
+        self.connects += 1
+        self.transport = FakeTransport()
+        uploader._transport = self.transport
+        uploader._sftp = FakeSftp(self)
+
+
+class FakeTransport:
+
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def close(self):
+        self.active = False
+
+
+class FakeSftp:
+
+    def __init__(self, server):
+        self.server = server
+
+    def put(self, local_path, remote_path):
+        ok = self.server.fail_puts <= 0
+        self.server.puts.append((time.monotonic(), local_path, ok))
+        if not ok:
+            self.server.fail_puts -= 1
+            raise OSError("permission denied")
+        with open(local_path, "rb") as f:
+            self.server.files[remote_path] = f.read()
+        return SimpleNamespace(st_size=len(self.server.files[remote_path]))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def server():
+    return FakeSftpServer()
+
+
+def make_uploader(server, **kwargs):
+    kwargs.setdefault("backoff_start_s", 0.05)
+    kwargs.setdefault("backoff_max_s", 0.2)
+    uploader = SftpUploader(host="fake", remote_folder="/in", **kwargs)
+    uploader._connect = lambda: server.connect(uploader)
+    return uploader
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_reconnects_when_the_server_comes_back(server, tmp_path):
+    server.down = True
+    uploader = make_uploader(server).start()
+    try:
+        uploader.submit(write(tmp_path / "a.kml", "a"))
+        time.sleep(0.2)
+        assert uploader.uploaded == 0
+        server.down = False
+        assert wait_until(lambda: uploader.uploaded == 1)
+        assert server.files == {"/in/a.kml": b"a"}
+
+        # Link drops between uploads: the next file reconnects first
+        server.transport.active = False
+        uploader.submit(write(tmp_path / "b.kml", "b"))
+        assert wait_until(lambda: uploader.uploaded == 2)
+        assert server.connects == 2
+        assert uploader.reconnects == 1
+    finally:
+        uploader.stop()
+
+
+def test_failed_put_backs_off_and_gives_up(server, tmp_path):
+    server.fail_puts = 100
+    uploader = make_uploader(server, max_retries=4).start()
+    try:
+        uploader.submit(write(tmp_path / "a.kml", "a"))
+        assert wait_until(lambda: uploader.failed == 1)
+    finally:
+        uploader.stop()
+    assert len(server.puts) == 4
+    # Each retry waits at least half the (doubling, capped) backoff
+    gaps = [b[0] - a[0] for a, b in zip(server.puts, server.puts[1:])]
+    for gap, backoff in zip(gaps, (0.05, 0.1, 0.2)):
+        assert gap >= 0.5 * backoff
+
+
+def test_retry_keeps_one_queue_entry_per_file(server, tmp_path):
+    server.fail_puts = 3
+    uploader = make_uploader(server).start()
+    path = write(tmp_path / "live.kml", "v0")
+    depths = []
+    try:
+        uploader.submit(path)
+        # The scanner keeps rewriting the file while its upload is failing
+        for i in range(1, 30):
+            if uploader.uploaded:
+                break
+            write(tmp_path / "live.kml", f"v{i}")
+            uploader.submit(path)
+            depths.append(uploader.queue.qsize())
+            time.sleep(0.01)
+        assert wait_until(lambda: uploader.uploaded >= 1 and uploader.queue.empty())
+    finally:
+        uploader.stop()
+    assert max(depths) <= 1
+    assert uploader.failed == 0
+    assert uploader.coalesced > 0
+    assert [ok for _, _, ok in server.puts[:4]] == [False, False, False, True]
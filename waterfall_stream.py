@@ -0,0 +1,290 @@
+# waterfall_stream.py
+#
+# Live waterfall streaming as compact quantized rows instead of PNGs:
+#
+#   scanner    WaterfallPublisher.push(rows) - one row per block (peak-hold over
+#              the block's rows), quantized to uint8 over DB_MIN..DB_MAX,
+#              optionally delta-coded against the previous row and zlib
+#              compressed, sent as one UDP datagram to the dashboard
+#   dashboard  WaterfallRelay - receives the frames and fans the same bytes
+#              out to every viewer (SSE, base64); a viewer joining mid-stream
+#              first gets the frames since the last keyframe
+#   browser    inflates (DecompressionStream), un-deltas and paints the row
+#              onto a scrolling canvas
+#
+# A 1024-bin row is 1 KB before compression, against ~50 KB for a PNG.
+# The publisher can mirror every frame to more addresses (also_to), e.g.
+# rf_viewer.py on VIEWER_PORT, so a headless scanner can still be watched.
+#
+# Frame = FRAME_HEADER + payload. Flags: FLAG_DELTA (payload is row - previous
+# row, mod 256), FLAG_ZLIB (payload is zlib-compressed). Frames without
+# FLAG_DELTA are keyframes; one is sent every KEYFRAME_INTERVAL rows.
+
+import time
+import zlib
+import queue
+import socket
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+
+from rf_waterfall import DB_MIN, DB_MAX
+from detection_index import Subscription
+
+# ===== Settings =====
+STREAM_HOST = "127.0.0.1"      # dashboard (usually on the same Pi)
+STREAM_PORT = 5006
+VIEWER_PORT = 5007             # rf_viewer.py
+MAX_FPS = 20                   # rows per second sent, at most
+KEYFRAME_INTERVAL = 32         # rows between keyframes
+USE_DELTA = False              # delta-code rows against the previous row
+USE_ZLIB = True
+
+MAGIC = b"RFWF"
+VERSION = 1
+FLAG_DELTA = 1
+FLAG_ZLIB = 2
+# magic, version, flags, bins, seq, timestamp, db_min, db_max, start_mhz, stop_mhz
+FRAME_HEADER = struct.Struct("<4sBBHIdffff")
+
+
+class RowEncoder:
+
+    def __init__(self, bins, db_min=DB_MIN, db_max=DB_MAX, start_mhz=0.0, stop_mhz=0.0,
+                 delta=USE_DELTA, compress=USE_ZLIB, keyframe_interval=KEYFRAME_INTERVAL, level=6):
+        self.bins = bins
+        self.db_min = db_min
+        self.db_max = db_max
+        self.start_mhz = start_mhz
+        self.stop_mhz = stop_mhz
+        self.delta = delta
+        self.compress = compress
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self._scale = 255.0 / (db_max - db_min)
+        self._q = np.empty(bins, dtype=np.float32)
+        self._prev = np.zeros(bins, dtype=np.uint8)
+        self._diff = np.empty(bins, dtype=np.uint8)
+        self.seq = 0
+
+    def quantize(self, row_db):
+        q = np.subtract(row_db, self.db_min, out=self._q, dtype=np.float32)
+        q *= self._scale
+        np.clip(q, 0, 255, out=q)
+        return q.astype(np.uint8)
+
+    def encode(self, row_db, timestamp=None):
+        row = self.quantize(row_db)
+        flags = 0
+        payload = row
+        if self.delta and self.seq % self.keyframe_interval:
+            np.subtract(row, self._prev, out=self._diff)   # wraps mod 256
+            payload = self._diff
+            flags |= FLAG_DELTA
+        self._prev = row
+        payload = payload.tobytes()
+        if self.compress:
+            payload = zlib.compress(payload, self.level)
+            flags |= FLAG_ZLIB
+        header = FRAME_HEADER.pack(MAGIC, VERSION, flags, self.bins, self.seq,
+                                   time.time() if timestamp is None else timestamp,
+                                   self.db_min, self.db_max, self.start_mhz, self.stop_mhz)
+        self.seq += 1
+        return header + payload
+
+
+def decode_frame(frame, prev=None):
+    # Reference decoder (the browser does the same): (header dict, uint8 row)
+    magic, version, flags, bins, seq, ts, db_min, db_max, start, stop = FRAME_HEADER.unpack_from(frame)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a waterfall frame")
+    payload = frame[FRAME_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    row = np.frombuffer(payload, dtype=np.uint8)
+    if flags & FLAG_DELTA:
+        if prev is None:
+            raise ValueError("delta frame without a previous row")
+        row = row + prev          # uint8, wraps mod 256
+    header = {"seq": seq, "timestamp": ts, "flags": flags, "bins": bins, "db_min": db_min,
+              "db_max": db_max, "start_mhz": start, "stop_mhz": stop}
+    return header, row
+
+
+class FrameDecoder:
+    # Stateful decode_frame() for a receiver that may join mid-stream or lose
+    # datagrams: delta frames are skipped until the next keyframe after a gap
+
+    def __init__(self):
+        self._prev = None
+        self._next_seq = None
+
+        # Stats
+        self.decoded = 0
+        self.missed = 0
+        self.skipped = 0
+        self.bad_frames = 0
+
+    def decode(self, frame):
+        # (header dict, uint8 row), or None if the frame can't be used
+        if len(frame) < FRAME_HEADER.size or frame[:4] != MAGIC:
+            self.bad_frames += 1
+            return None
+        seq = FRAME_HEADER.unpack_from(frame)[4]
+        if self._next_seq is not None and seq != self._next_seq:
+            self.missed += max(0, seq - self._next_seq)
+            self._prev = None
+        self._next_seq = seq + 1
+        if frame[5] & FLAG_DELTA and self._prev is None:
+            self.skipped += 1
+            return None
+        try:
+            header, row = decode_frame(frame, self._prev)
+        except (ValueError, zlib.error):
+            self.bad_frames += 1
+            self._prev = None
+            return None
+        self._prev = row
+        self.decoded += 1
+        return header, row
+
+    def stats(self):
+        return {
+            "decoded": self.decoded,
+            "missed": self.missed,
+            "skipped": self.skipped,
+            "bad_frames": self.bad_frames,
+        }
+
+
+class WaterfallPublisher:
+    # Scanner side: never blocks, drops rows beyond MAX_FPS
+
+    def __init__(self, freq_axis, host=STREAM_HOST, port=STREAM_PORT, max_fps=MAX_FPS, also_to=(),
+                 **encoder_args):
+        freq_axis = np.asarray(freq_axis)
+        self.encoder = RowEncoder(len(freq_axis), start_mhz=float(freq_axis[0]),
+                                  stop_mhz=float(freq_axis[-1]), **encoder_args)
+        self.addrs = [(host, port)] + list(also_to)
+        self.min_interval_s = 1.0 / max_fps if max_fps else 0.0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self._hold = None
+        self._last_sent = 0.0
+
+        # Stats
+        self.rows_in = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.errors = 0
+
+    def push(self, rows_db, timestamp=None):
+        # rows_db: one row or a (rows, bins) block; peak-held until the next send
+        rows_db = np.asarray(rows_db)
+        peak = rows_db.max(axis=0) if rows_db.ndim > 1 else rows_db
+        self.rows_in += 1
+        self._hold = peak.copy() if self._hold is None else np.maximum(self._hold, peak, out=self._hold)
+        now = time.monotonic()
+        if now - self._last_sent < self.min_interval_s:
+            return False
+        frame = self.encoder.encode(self._hold, timestamp)
+        self._hold = None
+        self._last_sent = now
+        self.sent += 1
+        self.bytes_sent += len(frame)
+        for addr in self.addrs:
+            try:
+                self.sock.sendto(frame, addr)
+            except OSError:
+                self.errors += 1
+        return True
+
+    def close(self):
+        self.sock.close()
+
+    def stats(self):
+        return {
+            "rows_in": self.rows_in,
+            "sent": self.sent,
+            "errors": self.errors,
+            "avg_frame_bytes": round(self.bytes_sent / self.sent, 1) if self.sent else None,
+        }
+
+
+class WaterfallRelay:
+    # Dashboard side: UDP in, the same frame bytes out to every subscriber
+
+    def __init__(self, host="0.0.0.0", port=STREAM_PORT):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.settimeout(1.0)
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._since_key = deque(maxlen=4 * KEYFRAME_INTERVAL)   # frames since the last keyframe
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Stats
+        self.frames_in = 0
+        self.bad_frames = 0
+        self.lagged_subscribers = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="waterfall-relay", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                frame = self.sock.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if len(frame) < FRAME_HEADER.size or frame[:4] != MAGIC:
+                self.bad_frames += 1
+                continue
+            self.frames_in += 1
+            with self._lock:
+                if not frame[5] & FLAG_DELTA:
+                    self._since_key.clear()
+                self._since_key.append(frame)
+                for sub in self._subscribers:
+                    try:
+                        sub.queue.put_nowait(frame)
+                    except queue.Full:
+                        sub.lagged = True
+                lagged = [sub for sub in self._subscribers if sub.lagged]
+                for sub in lagged:
+                    self._subscribers.remove(sub)
+                self.lagged_subscribers += len(lagged)
+
+    def subscribe(self):
+        sub = Subscription()
+        with self._lock:
+            for frame in self._since_key:
+                sub.queue.put_nowait(frame)
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def stop(self):
+        self._stop.set()
+        self.sock.close()
+
+    def stats(self):
+        return {
+            "frames_in": self.frames_in,
+            "bad_frames": self.bad_frames,
+            "subscribers": len(self._subscribers),
+            "lagged_subscribers": self.lagged_subscribers,
+        }